@@ -1,54 +1,315 @@
-from flask import Blueprint, jsonify, request
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import db, User, Note
+from datetime import datetime, timedelta
+from flask import Blueprint, jsonify, request, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt, verify_jwt_in_request
+from aio import async_db, async_view
+from models import db, User, Note, NoteBlob, Job, note_record_serializer, user_serializer
+from jobs import start_job
+from serializers import json_response
+from cache import response_cache
+from events import change_position, note_event, note_events
+from principals import principal_cache
+from replicas import replica_router
+from notes import created_at_filter
+from params import encode_cursor, decode_cursor, parse_bool, parse_limit
+from transfer import EXPORT_FORMATS, render_chunks, stream_rows, streaming_response
 
 admin_bp = Blueprint('admin', __name__)
 
 def admin_required(fn):
     """Decorator to restrict access to admin users."""
     from functools import wraps
-    from flask import jsonify
     @wraps(fn)
     def wrapper(*args, **kwargs):
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        if not user or not user.is_admin:
-            return jsonify({'error': 'Admin access required'}), 403
+        forbidden = _admin_claim_forbidden()
+        if forbidden is None:
+            forbidden = _not_admin(principal_cache.load(get_jwt_identity()))
+        if forbidden:
+            return _admin_required_response()
         return fn(*args, **kwargs)
     return wrapper
 
+def _admin_claim_forbidden():
+    """
+    Zero-query path: with JWT_ADMIN_CLAIM, the token's is_admin claim decides
+    (True when the user is not an admin). None when the user must be looked up.
+    """
+    if current_app.config['JWT_ADMIN_CLAIM']:
+        is_admin = get_jwt().get('is_admin')
+        if is_admin is not None:
+            return not is_admin
+    return None
+
+def _not_admin(principal):
+    return not principal or not principal.is_admin
+
+def _admin_required_response():
+    return jsonify({'error': 'Admin access required'}), 403
+
+def _listing(query, model, serializer, root):
+    """
+    Serves an admin listing ordered by id: streamed in full when format= is
+    given, otherwise one keyset page (limit/cursor) at a time.
+    """
+    query = query.with_entities(*serializer.columns).order_by(model.id)
+
+    export_format = request.args.get('format')
+    if export_format:
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({'error': 'Invalid format. Use ndjson, csv or json.'}), 400
+        batch_size = current_app.config['NOTES_EXPORT_BATCH_SIZE']
+        records = (serializer.row(row) for row in stream_rows(query, batch_size))
+        chunks = render_chunks(records, serializer.fields, export_format, batch_size, root=root)
+        return streaming_response(chunks, export_format, f'{root}.{export_format}')
+
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        cursor = request.args.get('cursor')
+        if cursor:
+            (after_id,) = decode_cursor(cursor, int)
+            query = query.filter(model.id > after_id)
+    except ValueError as err:
+        return jsonify({'error': str(err)}), 400
+
+    rows = query.limit(limit + 1).all()
+    next_cursor = encode_cursor(rows[limit - 1].id) if len(rows) > limit else None
+    return json_response({root: serializer.rows(rows[:limit]), 'next_cursor': next_cursor}), 200
+
+
 @admin_bp.route('/users', methods=['GET'])
 @jwt_required()
 @admin_required
 def get_all_users():
-    users = User.query.all()
-    return jsonify({'users': [u.to_dict() for u in users]}), 200
+    return _listing(User.query, User, user_serializer, 'users')
+
+def _delete_user_data(user_id, chunk_size, job=None):
+    """
+    Deletes a user's notes with set-based DELETEs of chunk_size rows, one
+    short transaction each, then the user row itself. Never loads notes.
+    """
+    if job is not None:
+        job.total = db.session.scalar(db.select(db.func.count()).where(Note.user_id == user_id))
+        db.session.commit()
+
+    while True:
+        chunk = db.select(Note.id).where(Note.user_id == user_id).limit(chunk_size).scalar_subquery()
+        deleted = db.session.execute(
+            db.delete(Note).where(Note.id.in_(chunk)).execution_options(synchronize_session=False)
+        ).rowcount
+        if job is not None:
+            job.progress += deleted
+        db.session.commit()
+        if deleted < chunk_size:
+            break
+
+    # Notes created while the chunks ran are removed in the final transaction
+    db.session.execute(db.delete(Note).where(Note.user_id == user_id))
+    db.session.execute(db.delete(User).where(User.id == user_id))
+    db.session.commit()
+
+    response_cache.invalidate_user(user_id)
+    principal_cache.invalidate(user_id)
+
 
 @admin_bp.route('/users/<int:user_id>', methods=['DELETE'])
 @jwt_required()
 @admin_required
 def delete_user(user_id):
-    user = User.query.get(user_id)
+    """Add ?async=true to run the deletion as a background job and get 202 with its status URL."""
+    user = db.session.get(User, user_id)
     if not user:
         return jsonify({'error': 'User not found'}), 404
-    db.session.delete(user)
-    db.session.commit()
-    return jsonify({'message': f'User {user.username} deleted'}), 200
+    username = user.username
+    chunk_size = current_app.config['USER_DELETE_CHUNK_SIZE']
+
+    if request.args.get('async', '').lower() == 'true':
+        job = start_job(
+            current_app._get_current_object(), 'delete_user', user_id,
+            lambda job: _delete_user_data(user_id, chunk_size, job)
+        )
+        return jsonify({
+            'message': f'Deletion of user {username} started',
+            'job': job.to_dict(),
+            'status_url': f'/api/v1/admin/jobs/{job.id}'
+        }), 202
+
+    _delete_user_data(user_id, chunk_size)
+    return jsonify({'message': f'User {username} deleted'}), 200
+
+@admin_bp.route('/jobs/<int:job_id>', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_job(job_id):
+    job = db.session.get(Job, job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify({'job': job.to_dict()}), 200
 
 @admin_bp.route('/notes', methods=['GET'])
 @jwt_required()
 @admin_required
 def get_all_notes():
-    notes = Note.query.all()
-    return jsonify({'notes': [n.to_dict() for n in notes]}), 200
+    """Filters: user_id, archived=true|false, date=YYYY-MM-DD, from/to (half-open)."""
+    query = Note.live()
+    try:
+        if request.args.get('user_id'):
+            if not request.args['user_id'].isdigit():
+                raise ValueError('Invalid user_id. Use a numeric user id.')
+            query = query.filter_by(user_id=int(request.args['user_id']))
+        if request.args.get('archived') is not None:
+            query = query.filter_by(archived=parse_bool(request.args['archived'], 'archived'))
+        created_filter = created_at_filter(request.args)
+        if created_filter is not None:
+            query = query.filter(created_filter)
+    except ValueError as err:
+        return jsonify({'error': str(err)}), 400
+    return _listing(query, Note, note_record_serializer, 'notes')
 
 @admin_bp.route('/notes/<int:note_id>', methods=['DELETE'])
 @jwt_required()
 @admin_required
 def delete_note(note_id):
-    note = Note.query.get(note_id)
+    note = Note.live().filter_by(id=note_id).first()
     if not note:
         return jsonify({'error': 'Note not found'}), 404
-    db.session.delete(note)
+    note.mark_deleted()
     db.session.commit()
+    response_cache.invalidate_user(note.user_id)
+    replica_router.pin(note.user_id)  # The owner, not the admin, reads this change next
+    note_events.publish(note.user_id, [note_event('deleted', change_position(note.change_seq, note.id, note.updated_at))])
     return jsonify({'message': f'Note {note.id} deleted'}), 200
+
+@admin_bp.route('/cache', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_cache_stats():
+    return jsonify({'cache': response_cache.stats()}), 200
+
+def _byte_length(column):
+    """Storage size of a text column in bytes rather than characters."""
+    if db.engine.dialect.name == 'postgresql':
+        return db.func.octet_length(column)
+    return db.func.length(db.cast(column, db.LargeBinary))
+
+
+# get_stats() runs under gunicorn and get_stats_async() in the ASGI mode; both
+# build their statements with _stats_request() and answer with _stats_response(),
+# executing the statements in between through their own session.
+
+def _stats_request():
+    """
+    The statements of a stats request, (totals, user count, per-user page,
+    daily histogram), and its page size. Raises ValueError with a
+    client-facing message for bad parameters.
+    """
+    limit = parse_limit(request.args.get('limit'))
+    days = request.args.get('days', '30')
+    if not days.isdigit() or not 1 <= int(days) <= 366:
+        raise ValueError('Invalid days. Use a value between 1 and 366.')
+    cursor = request.args.get('cursor')
+    (after_id,) = decode_cursor(cursor, int) if cursor else (None,)
+    return _stats_statements(limit, int(days), after_id), limit
+
+
+def _stats_statements(limit, days, after_id):
+    live = Note.deleted_at.is_(None)
+    # Bytes a note occupies: title, inline text and its compressed blob, if any
+    storage = _byte_length(Note.title) + _byte_length(Note.content) + db.func.coalesce(NoteBlob.size, 0)
+    totals = (
+        db.select(
+            db.func.count().filter(live).label('notes'),
+            db.func.count().filter(live & Note.archived.is_(True)).label('archived'),
+            db.func.count().filter(~live).label('tombstones'),
+            db.func.coalesce(db.func.sum(storage), 0).label('storage_bytes'),
+        )
+        .select_from(Note)
+        .outerjoin(NoteBlob, NoteBlob.hash == Note.content_blob)
+    )
+    user_count = db.select(db.func.count()).select_from(User)
+
+    per_user = (
+        db.select(
+            User.id, User.username,
+            db.func.count(Note.id).label('notes'),
+            db.func.count(Note.id).filter(Note.archived.is_(True)).label('archived'),
+            db.func.coalesce(db.func.sum(storage), 0).label('storage_bytes'),
+            db.func.max(Note.updated_at).label('last_activity'),
+        )
+        .outerjoin(Note, (Note.user_id == User.id) & live)
+        .outerjoin(NoteBlob, NoteBlob.hash == Note.content_blob)
+        .group_by(User.id, User.username)
+        .order_by(User.id)
+    )
+    if after_id is not None:
+        per_user = per_user.where(User.id > after_id)
+
+    since = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days - 1)
+    day = db.func.date(Note.created_at)
+    histogram = (
+        db.select(day.label('day'), db.func.count().label('notes'))
+        .where(live, Note.created_at >= since)
+        .group_by(day)
+        .order_by(day)
+    )
+    return totals, user_count, per_user.limit(limit + 1), histogram
+
+
+def _stats_response(results, limit):
+    """The stats response from the rows of each _stats_request() statement."""
+    (totals,), ((user_count,),), rows, histogram = results
+    return jsonify({
+        'totals': {
+            'users': user_count,
+            'notes': totals.notes,
+            'archived': totals.archived,
+            'tombstones': totals.tombstones,
+            'storage_bytes': int(totals.storage_bytes),
+        },
+        'per_user': [
+            {
+                'user_id': row.id,
+                'username': row.username,
+                'notes': row.notes,
+                'archived': row.archived,
+                'storage_bytes': int(row.storage_bytes),
+                'last_activity': row.last_activity.isoformat() if row.last_activity else None,
+            }
+            for row in rows[:limit]
+        ],
+        'next_cursor': encode_cursor(rows[limit - 1].id) if len(rows) > limit else None,
+        'created_per_day': [{'day': str(row.day), 'notes': row.notes} for row in histogram],
+    }), 200
+
+
+@admin_bp.route('/stats', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_stats():
+    """
+    Totals, per-user note counts/storage (keyset paged by user id) and a daily
+    histogram of created notes over the last days= days, all computed in SQL.
+    """
+    try:
+        statements, limit = _stats_request()
+    except ValueError as err:
+        return jsonify({'error': str(err)}), 400
+
+    return _stats_response([db.session.execute(statement).all() for statement in statements], limit)
+
+
+@async_view('admin.get_stats')
+async def get_stats_async():
+    """get_stats() for the ASGI mode, awaiting its aggregate queries."""
+    verify_jwt_in_request()
+    session = async_db.session
+    forbidden = _admin_claim_forbidden()
+    if forbidden is None:
+        forbidden = _not_admin(await principal_cache.load_async(get_jwt_identity(), session))
+    if forbidden:
+        return _admin_required_response()
+
+    try:
+        statements, limit = _stats_request()
+    except ValueError as err:
+        return jsonify({'error': str(err)}), 400
+
+    return _stats_response([(await session.execute(statement)).all() for statement in statements], limit)
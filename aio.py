@@ -0,0 +1,91 @@
+from flask import Response, g
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from database import async_engine_options, async_engine_url, configure_engine
+from extensions import AppExtension
+from models import db
+from replicas import RoutingSession
+
+# Async views for the ASGI mode (asgi.py).
+# Under an ASGI server, the endpoints registered here run as coroutines on
+# the event loop in place of the Flask views of the same name: they await the
+# database through an async engine (aiosqlite or asyncpg) and wait for the
+# password hashing pool without holding a thread. Every other endpoint keeps
+# running as a regular Flask view in a thread pool. Served by gunicorn
+# (app:app), none of this is used.
+
+# Flask endpoint -> coroutine that serves it in the ASGI mode
+async_views = {}
+
+
+def async_view(endpoint):
+    """Registers a coroutine as the ASGI mode's implementation of a Flask endpoint."""
+    def decorator(fn):
+        async_views[endpoint] = fn
+        return fn
+    return decorator
+
+
+class AsyncStreamResponse(Response):
+    """Streamed response whose body is an async iterable of str or bytes chunks."""
+
+    def __init__(self, chunks, **kwargs):
+        # An empty generator marks the response as streamed for the after_request hooks
+        super().__init__((chunk for chunk in ()), **kwargs)
+        self.async_chunks = chunks
+
+
+class AsyncRoutingSession(RoutingSession):
+    """
+    The sync session inside each AsyncSession. Being a RoutingSession, its
+    flushes run the same hooks as db.session's (change sequence stamps,
+    search indexing, write tracking); every statement goes to the async
+    engine it was opened with.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(db, **kwargs)
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        return self.bind
+
+
+class AsyncDatabase:
+    """
+    Async engine for SQLALCHEMY_DATABASE_URI, with the same DB_* pool
+    settings as the sync one, and an AsyncSession per request. Reads are not
+    routed to DATABASE_REPLICA_URLS.
+    """
+
+    def __init__(self):
+        self.engine = None
+        self._sessions = None
+
+    def init_app(self, app):
+        url = app.config['SQLALCHEMY_DATABASE_URI']
+        self.engine = create_async_engine(async_engine_url(url), **async_engine_options(app.config, url))
+        with app.app_context():
+            configure_engine(self.engine.sync_engine, app.config, name='async')
+        # Objects stay readable after commit; async views cannot lazy-load attributes
+        self._sessions = async_sessionmaker(
+            self.engine, expire_on_commit=False, sync_session_class=AsyncRoutingSession
+        )
+
+    @property
+    def session(self):
+        """The current request's AsyncSession, opened on first use."""
+        if 'async_session' not in g:
+            g.async_session = self._sessions()
+        return g.async_session
+
+    async def remove(self):
+        """Closes the current request's session, returning its connection to the pool."""
+        session = g.pop('async_session', None)
+        if session is not None:
+            await session.close()
+
+    async def dispose(self):
+        if self.engine is not None:
+            await self.engine.dispose()
+
+
+async_db = AppExtension('async_db', AsyncDatabase)
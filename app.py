@@ -1,45 +1,140 @@
+import os
 from flask import Flask, jsonify
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
+from werkzeug.middleware.proxy_fix import ProxyFix
 from config import Config
 from models import db
-from auth import auth_bp
-from notes import notes_bp
-from admin import admin_bp
-
-# Initialize Flask app
-app = Flask(__name__)
-
-# Load configuration (secret keys, DB URI, etc.)
-app.config.from_object(Config)
-
-# Enable Cross-Origin Resource Sharing (CORS)
+from database import init_database
+from cache import response_cache
+from passwords import password_hasher
+from principals import principal_cache
+from metrics import metrics
+from tombstones import start_compaction_job
+from replicas import replica_router
+from ratelimit import rate_limiter
+from compression import compression
+from events import note_events
+from blobs import blob_codec
+
+# Enable Cross-Origin Resource Sharing (CORS) for these origins
 allowed_origins = [
     "https://journalq.netlify.app"
 ]
 
-CORS(app, resources={
-    r"/api/*": {"origins": allowed_origins}
-})
 
-# Initialize SQLAlchemy database
-db.init_app(app)
+def create_app(config_object=Config):
+    """
+    Builds the Flask app. Creating it does not touch the database: the
+    schema is created and upgraded by `flask --app app init-db`, run once
+    per deploy before the workers start. Nor does it start background
+    threads: each server process starts the compaction job itself (see
+    gunicorn.conf.py). Extension state lives in app.extensions, so apps
+    built side by side stay independent.
+    """
+    # Initialize Flask app
+    app = Flask(__name__)
+
+    # Load configuration (secret keys, DB URI, etc.)
+    app.config.from_object(config_object)
+
+    # Take the client address from X-Forwarded-For set by our own proxies
+    if app.config['TRUSTED_PROXY_COUNT']:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXY_COUNT'])
+
+    CORS(app, resources={
+        r"/api/*": {"origins": allowed_origins}
+    })
+
+    # Initialize request and SQL metrics (served at /metrics); engines report to it as they are configured
+    metrics.init_app(app)
+
+    # Initialize SQLAlchemy database with the tuned engine and pool
+    init_database(app)
+
+    # Initialize the response cache for note reads
+    response_cache.init_app(app)
+
+    # Initialize compressed storage for large note bodies
+    blob_codec.init_app(app)
+
+    # Initialize the password hashing pool
+    password_hasher.init_app(app)
+
+    # Initialize the authenticated-user cache
+    principal_cache.init_app(app)
+
+    # Initialize the note change bus behind the live stream
+    note_events.init_app(app)
+
+    jwt = JWTManager(app)
 
-# Initialize JWT Manager
-jwt = JWTManager(app)
+    # Per-IP and per-user token buckets for the auth, notes and admin blueprints
+    rate_limiter.init_app(app, jwt)
 
-# Ensure all database tables exist before serving requests
-with app.app_context():
-    db.create_all()
+    # Compress responses per Accept-Encoding; registered last so metrics include its time
+    compression.init_app(app)
+
+    register_blueprints(app)
+    register_commands(app)
+
+    app.add_url_rule('/', 'index', index)
+    app.register_error_handler(404, not_found)
+    app.register_error_handler(500, internal_error)
+    return app
+
+
+def register_blueprints(app):
+    """Imports the blueprints (modular endpoints) and mounts them."""
+    from auth import auth_bp
+    from notes import notes_bp
+    from transfer import transfer_bp
+    from admin import admin_bp
+
+    # Keeping URL prefixes consistent and descriptive
+    app.register_blueprint(auth_bp, url_prefix='/api/v1/auth')
+    app.register_blueprint(notes_bp, url_prefix='/api/v1/notes')
+    app.register_blueprint(transfer_bp, url_prefix='/api/v1/notes')
+    app.register_blueprint(admin_bp, url_prefix='/api/v1/admin')
+
+
+def register_commands(app):
+    """Flask CLI commands (flask --app app <command>)."""
+
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Create missing tables and upgrade the schema (run on each deploy)."""
+        from migrations import migrate
+        migrate()
+        print("Database schema is up to date")
+
+    @app.cli.command('purge-tombstones')
+    def purge_tombstones_command():
+        """Purge deleted-note tombstones older than TOMBSTONE_RETENTION_DAYS."""
+        from tombstones import purge_orphan_blobs, purge_tombstones
+        purged = purge_tombstones(
+            app.config['TOMBSTONE_RETENTION_DAYS'],
+            app.config['TOMBSTONE_PURGE_BATCH_SIZE']
+        )
+        blobs = purge_orphan_blobs(app.config['TOMBSTONE_PURGE_BATCH_SIZE'])
+        print(f"Purged {purged} note tombstones and {blobs} unreferenced note blobs")
+
+    @app.cli.command('compress-notes')
+    def compress_notes_command():
+        """Move existing bodies over NOTE_BLOB_THRESHOLD characters into compressed blobs."""
+        from migrations import compress_large_notes
+        converted = compress_large_notes(app.config['NOTE_BLOB_MIGRATION_BATCH_SIZE'])
+        print(f"Compressed {converted} large notes")
+
+    @app.cli.command('sync-replicas')
+    def sync_replicas_command():
+        """Copy the SQLite primary into the SQLite DATABASE_REPLICA_URLS (local testing only)."""
+        from replicas import copy_sqlite_replicas
+        written = copy_sqlite_replicas(db.engine.url, [engine.url for engine in replica_router.replicas])
+        print(f"Copied primary database to {len(written)} replicas")
 
-# Register Blueprints (modular endpoints)
-# Keeping URL prefixes consistent and descriptive
-app.register_blueprint(auth_bp, url_prefix='/api/v1/auth')
-app.register_blueprint(notes_bp, url_prefix='/api/v1/notes') 
-app.register_blueprint(admin_bp, url_prefix='/api/v1/admin')
 
 # Welcome route
-@app.route('/')
 def index():
     return jsonify({
         'message': 'Welcome to the Notes API',
@@ -57,36 +152,56 @@ def index():
                 'update': 'PUT /api/v1/notes/<id>',
                 'delete': 'DELETE /api/v1/notes/<id>',
                 'archive': 'PATCH /api/v1/notes/<id>/archive',
-                'unarchive': 'PATCH /api/v1/notes/<id>/unarchive'
+                'unarchive': 'PATCH /api/v1/notes/<id>/unarchive',
+                'batch': 'POST /api/v1/notes/batch',
+                'changes': 'GET /api/v1/notes/changes?since=<next_token>',
+                'export': 'GET /api/v1/notes/export?format=ndjson|csv|json',
+                'stream': 'GET /api/v1/notes/stream?ticket=<ticket> (text/event-stream; Last-Event-ID resumes)',
+                'stream_ticket': 'POST /api/v1/notes/stream/ticket',
+                'import': 'POST /api/v1/notes/import?format=ndjson|csv'
             },
             'filters': {
                 'by_date': 'GET /api/v1/notes?date=YYYY-MM-DD',
+                'by_range': 'GET /api/v1/notes?from=YYYY-MM-DD&to=YYYY-MM-DD',
                 'by_keyword': 'GET /api/v1/notes?keyword=your_keyword',
-                'by_archived': 'GET /api/v1/notes?archived=true|false'
+                'by_archived': 'GET /api/v1/notes?archived=true|false',
+                'by_search': 'GET /api/v1/notes?q=words+or+prefix*&sort=relevance|recent'
+            },
+            'metrics': 'GET /metrics',
+            'projection': {
+                'fields': 'GET /api/v1/notes?fields=id,title,created_at',
+                'summary': 'GET /api/v1/notes?view=summary'
+            },
+            'pagination': {
+                'page_size': 'GET /api/v1/notes?limit=50',
+                'next_page': 'GET /api/v1/notes?cursor=<next_cursor>'
             }
         }
     }), 200
 
 
 # Custom error handlers
-@app.errorhandler(404)
 def not_found(error):
     return jsonify({'error': 'Not found'}), 404
 
 
-@app.errorhandler(500)
 def internal_error(error):
     return jsonify({'error': 'Internal server error'}), 500
 
 
+# Module-level app for gunicorn (gunicorn app:app)
+app = create_app()
+
 # Entry point
 # Using port 10000 for Render
 # Setting debug=False for deployment.
 
-for rule in app.url_map.iter_rules():
-    print(rule)
-
 if __name__ == '__main__':
-    import os
+    # The local development server creates the schema itself
+    with app.app_context():
+        from migrations import migrate
+        migrate()
+    # Background purge of deleted-note tombstones past their retention window
+    start_compaction_job(app)
     port = int(os.getenv('PORT', 10000))
     app.run(host='0.0.0.0', port=port, debug=False)
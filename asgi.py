@@ -0,0 +1,196 @@
+import asyncio
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+from werkzeug.exceptions import HTTPException
+from werkzeug.middleware.proxy_fix import ProxyFix
+from app import app as flask_app
+from aio import async_db, async_views
+from tombstones import start_compaction_job
+
+# ASGI serving mode: uvicorn asgi:app (add --workers N for more processes).
+# Requests for endpoints with an async view (aio.async_views: register,
+# login, the live stream and admin stats) run as coroutines on the event
+# loop, with the async engine. Every other request runs the Flask app as
+# usual in a pool of ASGI_THREADS threads. Both paths go through the app's
+# request hooks (CORS, rate limits, metrics, compression) and error
+# handlers, so clients see the same responses as under gunicorn app:app.
+
+BODY_MEMORY_LIMIT = 1024 * 1024  # Request bodies larger than this (e.g. imports) are spooled to disk
+
+
+def _environ(scope, body, length):
+    """WSGI environ for an ASGI http scope and its request body (a file of length bytes)."""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    script_name = scope.get('root_path', '').encode('utf-8').decode('latin-1')
+    path = scope['path'].encode('utf-8').decode('latin-1')
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': script_name,
+        'PATH_INFO': path[len(script_name):] if path.startswith(script_name) else path,
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'CONTENT_LENGTH': str(length),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1')
+        if name == 'content-length':
+            continue
+        key = 'CONTENT_TYPE' if name == 'content-type' else 'HTTP_' + name.upper().replace('-', '_')
+        value = value.decode('latin-1')
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+def _headers(headers):
+    return [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+
+
+class NotesASGI:
+    """ASGI application around the Flask app; ASGI_THREADS sizes the thread pool."""
+
+    def __init__(self, app):
+        self.app = app
+        self._threads = ThreadPoolExecutor(app.config['ASGI_THREADS'], thread_name_prefix='asgi-wsgi')
+        # Async views see the client address the WSGI path gets from ProxyFix (see create_app)
+        proxies = app.config['TRUSTED_PROXY_COUNT']
+        self._fix_environ = ProxyFix(lambda environ, start_response: environ, x_for=proxies) if proxies else None
+        self._async_db = async_db.init_app(app)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            with SpooledTemporaryFile(BODY_MEMORY_LIMIT) as body:
+                environ = _environ(scope, body, await self._read_body(receive, body))
+                view = self._async_view(environ)
+                if view is not None:
+                    await self._run_async_view(view, environ, receive, send)
+                else:
+                    loop = asyncio.get_running_loop()
+                    await loop.run_in_executor(self._threads, self._run_wsgi, environ, send, loop)
+        else:
+            raise ValueError(f'Unsupported ASGI scope type {scope["type"]!r}')
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                # Hashing with PASSWORD_HASH_WORKERS=0 runs in the default executor; share the pool
+                asyncio.get_running_loop().set_default_executor(self._threads)
+                start_compaction_job(self.app)
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self._async_db.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _read_body(self, receive, body):
+        """Writes the request body into body; returns its length."""
+        length = 0
+        while True:
+            message = await receive()
+            if message['type'] != 'http.request':
+                break
+            length += body.write(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        body.seek(0)
+        return length
+
+    def _async_view(self, environ):
+        adapter = self.app.url_map.bind_to_environ(environ)
+        try:
+            endpoint, _ = adapter.match()
+        except HTTPException:  # No match, wrong method or a redirect: the Flask app answers
+            return None
+        return async_views.get(endpoint)
+
+    async def _run_async_view(self, view, environ, receive, send):
+        """Dispatches like Flask's wsgi_app(), awaiting the view instead of calling it."""
+        app = self.app
+        if self._fix_environ is not None:
+            environ = self._fix_environ(environ, None)
+        ctx = app.request_context(environ)
+        error = None
+        try:
+            ctx.push()
+            try:
+                try:
+                    response = app.preprocess_request()
+                    if response is None:
+                        response = await view(**ctx.request.view_args)
+                except Exception as e:
+                    response = app.handle_user_exception(e)
+                response = app.finalize_request(response)
+            except Exception as e:
+                error = e
+                response = app.handle_exception(e)
+            await self._send_response(response, receive, send)
+        finally:
+            await async_db.remove()
+            ctx.pop(error)
+
+    async def _send_response(self, response, receive, send):
+        await send({'type': 'http.response.start', 'status': response.status_code,
+                    'headers': _headers(response.headers.items())})
+        chunks = getattr(response, 'async_chunks', None)
+        if chunks is None:
+            await send({'type': 'http.response.body', 'body': response.get_data()})
+            return
+
+        disconnected = asyncio.ensure_future(receive())  # Resolves with http.disconnect
+        try:
+            async for chunk in chunks:
+                if disconnected.done():
+                    break
+                await send({'type': 'http.response.body', 'body': chunk.encode() if isinstance(chunk, str) else chunk,
+                            'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            disconnected.cancel()
+            await chunks.aclose()
+            response.close()  # Runs call_on_close callbacks, as WSGI servers do
+
+    def _run_wsgi(self, environ, send, loop):
+        """Runs the Flask app in a pool thread, handing its output to send on the loop."""
+        started = []
+
+        def start_response(status, headers, exc_info=None):
+            started[:] = [int(status.split(' ', 1)[0]), _headers(headers)]
+
+        def push(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        output = self.app.wsgi_app(environ, start_response)
+        try:
+            # Each chunk is sent once the next one exists, so the last goes out with more_body False
+            pending = None
+            for chunk in output:
+                if not chunk:
+                    continue
+                if pending is None:
+                    push({'type': 'http.response.start', 'status': started[0], 'headers': started[1]})
+                else:
+                    push({'type': 'http.response.body', 'body': pending, 'more_body': True})
+                pending = chunk
+            if pending is None:
+                push({'type': 'http.response.start', 'status': started[0], 'headers': started[1]})
+            push({'type': 'http.response.body', 'body': pending or b''})
+        finally:
+            if hasattr(output, 'close'):
+                output.close()
+
+
+app = NotesASGI(flask_app)
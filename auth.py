@@ -1,7 +1,10 @@
-from flask import Blueprint, request, jsonify
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from aio import async_db, async_view
 from models import db, User
+from passwords import password_hasher, HashingBusy
+from principals import principal_cache
+from replicas import replica_router
 from marshmallow import Schema, fields, validate, ValidationError
 from sqlalchemy.exc import IntegrityError
 
@@ -25,6 +28,65 @@ user_schema = UserSchema()
 login_schema = UserLoginSchema()
 
 
+def _issue_token(user):
+    """Creates the access token, embedding is_admin when JWT_ADMIN_CLAIM is on."""
+    claims = {'is_admin': bool(user.is_admin)} if current_app.config['JWT_ADMIN_CLAIM'] else None
+    return create_access_token(identity=str(user.id), additional_claims=claims)
+
+
+def _hashing_busy():
+    """503 with a retry hint when the password hashing pool is saturated."""
+    response = jsonify({'error': 'Server busy, please retry shortly'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+
+def _validation_failed(err):
+    return jsonify({'error': 'Validation failed', 'messages': err.messages}), 400
+
+
+# register() and login() below run under gunicorn; register_async() and
+# login_async() serve the same routes in the ASGI mode. Both share the
+# helpers here and differ only in awaiting the hashing pool and the database.
+
+def _registration_failed(error):
+    """Response for a registration that raised error; the session has been rolled back."""
+    if isinstance(error, ValidationError):
+        return _validation_failed(error)
+    if isinstance(error, IntegrityError):
+        # Handles duplicate username errors gracefully
+        return jsonify({'error': 'Username already exists'}), 400
+    if isinstance(error, HashingBusy):
+        return _hashing_busy()
+    # General error fallback with visible Render log for debugging
+    print(f"Error during registration: {error}")
+    return jsonify({'error': 'Internal server error', 'message': str(error)}), 500
+
+
+def _registered(user):
+    # The new account may not have reached the replicas yet
+    replica_router.pin(user.id)
+    return jsonify({
+        'message': 'User registered successfully',
+        'access_token': _issue_token(user)
+    }), 201
+
+
+def _user_by_name(username):
+    return db.select(User).filter_by(username=username).limit(1)
+
+
+def _login_failed():
+    return jsonify({'error': 'Invalid username or password'}), 401
+
+
+def _logged_in(user):
+    return jsonify({
+        'message': 'Login successful',
+        'access_token': _issue_token(user)
+    }), 200
+
+
 
 # Registration Endpoint
 
@@ -38,37 +100,33 @@ def register():
         # Validate input using Marshmallow
         data = user_schema.load(request.json)
 
-        # Hash password before storing
-        hashed_password = generate_password_hash(data['password'])
-        new_user = User(username=data['username'], password=hashed_password)
-
-        # Attempt database commit
+        # Hash password before storing (in the hashing pool)
+        new_user = User(username=data['username'], password=password_hasher.hash(data['password']))
         db.session.add(new_user)
         db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return _registration_failed(e)
 
-        # Generate JWT token for the new user
-        access_token = create_access_token (identity=str(new_user.id))
+    return _registered(new_user)
 
-        return jsonify({
-            'message': 'User registered successfully',
-            'access_token': access_token
-        }), 201
 
-    except ValidationError as err:
-        # Marshmallow validation failure
-        db.session.rollback()
-        return jsonify({'error': 'Validation failed', 'messages': err.messages}), 400
 
-    except IntegrityError:
-        # Handles duplicate username errors gracefully
-        db.session.rollback()
-        return jsonify({'error': 'Username already exists'}), 400
+@async_view('auth.register')
+async def register_async():
+    """register() for the ASGI mode: hashing and the insert are awaited, not waited on in a thread."""
+    session = async_db.session
+    try:
+        data = user_schema.load(request.json)
 
+        new_user = User(username=data['username'], password=await password_hasher.hash_async(data['password']))
+        session.add(new_user)
+        await session.commit()
     except Exception as e:
-        # General error fallback with visible Render log for debugging
-        db.session.rollback()
-        print(f"Error during registration: {e}")
-        return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
+        await session.rollback()
+        return _registration_failed(e)
+
+    return _registered(new_user)
 
 
 
@@ -82,21 +140,54 @@ def login():
     try:
         data = login_schema.load(request.json)
     except ValidationError as err:
-        return jsonify({'error': 'Validation failed', 'messages': err.messages}), 400
+        return _validation_failed(err)
 
-    # Query for user
-    user = User.query.filter_by(username=data['username']).first()
+    user = db.session.scalar(_user_by_name(data['username']))
 
     # Verify credentials
-    if not user or not check_password_hash(user.password, data['password']):
-        return jsonify({'error': 'Invalid username or password'}), 401
+    try:
+        if not user or not password_hasher.verify(user.password, data['password']):
+            return _login_failed()
+    except HashingBusy:
+        return _hashing_busy()
 
-    # Generate JWT token on success
-    access_token = create_access_token (identity=str(user.id))
-    return jsonify({
-        'message': 'Login successful',
-        'access_token': access_token
-    }), 200
+    # Upgrade the stored hash when the configured algorithm or cost changed
+    if password_hasher.needs_rehash(user.password):
+        try:
+            user.password = password_hasher.hash(data['password'])
+            db.session.commit()
+        except HashingBusy:
+            pass  # Not worth failing the login; the upgrade happens next time
+
+    return _logged_in(user)
+
+
+
+@async_view('auth.login')
+async def login_async():
+    """login() for the ASGI mode."""
+    try:
+        data = login_schema.load(request.json)
+    except ValidationError as err:
+        return _validation_failed(err)
+
+    session = async_db.session
+    user = await session.scalar(_user_by_name(data['username']))
+
+    try:
+        if not user or not await password_hasher.verify_async(user.password, data['password']):
+            return _login_failed()
+    except HashingBusy:
+        return _hashing_busy()
+
+    if password_hasher.needs_rehash(user.password):
+        try:
+            user.password = await password_hasher.hash_async(data['password'])
+            await session.commit()
+        except HashingBusy:
+            pass
+
+    return _logged_in(user)
 
 
 
@@ -109,8 +200,7 @@ def protected():
     A protected route to test token authentication.
     Only accessible with a valid JWT.
     """
-    current_user_id = int(get_jwt_identity())
-    user = User.query.get(current_user_id)
+    user = principal_cache.load(get_jwt_identity())
 
     if not user:
         return jsonify({'error': 'User not found'}), 404
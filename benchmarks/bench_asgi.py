@@ -0,0 +1,332 @@
+"""
+Serving mode benchmark: gunicorn (WSGI, gthread workers) against uvicorn
+(ASGI, asgi:app) at --connections concurrent keep-alive connections.
+
+Seeds a temporary SQLite database with --users users of --notes notes each,
+then for each mode starts the server with --workers processes and runs:
+
+  list     every connection fetches a notes page back to back for
+           --duration seconds: requests/s, latency percentiles and errors
+           (non-200 responses, resets and timeouts)
+  stream   every connection opens the live stream (GET /notes/stream) of
+           one user; reports how many were established within
+           --stream-timeout seconds, then creates a note and measures how
+           long the event takes to reach each open stream (fan-out)
+
+Peak memory is the largest summed VmRSS of the server process and all its
+children (workers, password hashing pools) sampled during the scenario.
+Linux only (/proc). The stream scenario uses the in-process event bus, so
+keep --workers 1 or export EVENTS_BACKEND=redis.
+
+Usage (from the repository root; needs gunicorn and uvicorn, greenlet and aiosqlite):
+    python benchmarks/bench_asgi.py
+    python benchmarks/bench_asgi.py --connections 1000 --duration 20 --threads 32 --modes gunicorn,uvicorn
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ['DATABASE_URL'] = f'sqlite:///{tempfile.mkdtemp()}/bench_asgi.db'
+os.environ.setdefault('JWT_SECRET_KEY', 'bench-secret-key-with-enough-length')
+os.environ.setdefault('TOMBSTONE_PURGE_INTERVAL', '0')
+os.environ.setdefault('RATELIMIT_ENABLED', 'false')
+os.environ.setdefault('CACHE_BACKEND', 'none')  # Every list request reaches the database
+os.environ.setdefault('SSE_HEARTBEAT_SECONDS', '5')
+os.environ.setdefault('SLOW_QUERY_MS', '60000')  # Queueing at 1k connections would flood the log
+
+from common import percentile  # noqa: E402
+from flask_jwt_extended import create_access_token  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+from app import app  # noqa: E402
+from migrations import migrate  # noqa: E402
+from models import db, Note, User  # noqa: E402
+
+
+def seed(users, notes):
+    start = datetime(2024, 1, 1)
+    db.session.execute(insert(User), [
+        {'id': user_id, 'username': f'bench{user_id}', 'password': 'x'} for user_id in range(1, users + 1)
+    ])
+    for user_id in range(1, users + 1):
+        db.session.execute(insert(Note), [
+            {'title': f'Meeting notes {i}', 'user_id': user_id, 'archived': False,
+             'content': f'Discussed item {i}: lorem ipsum dolor sit amet. ' * 3,
+             'created_at': start + timedelta(seconds=i), 'updated_at': start + timedelta(seconds=i)}
+            for i in range(notes)
+        ])
+    db.session.commit()
+
+
+# Servers
+
+def server_command(mode, port, args):
+    if mode == 'gunicorn':
+        # Each gthread worker keeps idle keep-alive connections out of its threads, up to worker-connections
+        return [sys.executable, '-m', 'gunicorn', '--worker-class', 'gthread', '--threads', str(args.threads),
+                '--workers', str(args.workers), '--worker-connections', str(args.connections * 2),
+                '--keep-alive', '60', '--bind', f'127.0.0.1:{port}', '--log-level', 'warning', 'app:app']
+    return [sys.executable, '-m', 'uvicorn', 'asgi:app', '--workers', str(args.workers),
+            '--port', str(port), '--backlog', str(args.connections * 2), '--timeout-keep-alive', '60',
+            '--log-level', 'warning']
+
+
+def tree_rss_kb(pid):
+    """Summed VmRSS of pid and its descendants."""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    parent = int(f.read().rsplit(')', 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(parent, []).append(int(entry))
+    total, pending = 0, [pid]
+    while pending:
+        current = pending.pop()
+        pending.extend(children.get(current, ()))
+        try:
+            with open(f'/proc/{current}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1])
+        except OSError:
+            pass
+    return total
+
+
+class PeakRSS:
+    """Samples a process tree's memory in the background; peak_mb is the largest total seen."""
+
+    def __init__(self, pid, interval=0.2):
+        self.pid = pid
+        self.interval = interval
+        self.peak_kb = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak_kb = max(self.peak_kb, tree_rss_kb(self.pid))
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak_kb = tree_rss_kb(self.pid)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    @property
+    def peak_mb(self):
+        return self.peak_kb / 1024
+
+
+async def wait_until_up(port, timeout=30):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(b'GET / HTTP/1.1\r\nHost: bench\r\n\r\n')
+            await reader.readuntil(b'\r\n\r\n')
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f'Server on port {port} did not start')
+
+
+# HTTP/1.1 client
+
+def request_bytes(method, path, token, body=None):
+    lines = [f'{method} {path} HTTP/1.1', 'Host: bench', f'Authorization: Bearer {token}']
+    if body is not None:
+        lines += ['Content-Type: application/json', f'Content-Length: {len(body)}']
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode() + (body or b'')
+
+
+async def read_response(reader):
+    """(status, body) of one non-streamed response (Content-Length or chunked)."""
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split(' ', 2)[1])
+    headers = dict(line.split(': ', 1) for line in lines[1:] if ': ' in line)
+    headers = {name.lower(): value for name, value in headers.items()}
+    if 'content-length' in headers:
+        return status, await reader.readexactly(int(headers['content-length']))
+    body = b''
+    if headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+            chunk = await reader.readexactly(size + 2)
+            if size == 0:
+                break
+            body += chunk[:-2]
+    return status, body
+
+
+async def list_scenario(port, tokens, connections, duration):
+    latencies, errors = [], {}
+    deadline = time.perf_counter() + duration
+
+    async def connection(index):
+        request = request_bytes('GET', '/api/v1/notes/?limit=20', tokens[index % len(tokens)])
+        reader = writer = None
+        while time.perf_counter() < deadline:
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                start = time.perf_counter()
+                writer.write(request)
+                status, _ = await asyncio.wait_for(read_response(reader), 30)
+                if status == 200:
+                    latencies.append((time.perf_counter() - start) * 1000)
+                else:
+                    errors[status] = errors.get(status, 0) + 1
+            except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+                if writer is not None:
+                    writer.close()
+                reader = writer = None
+                await asyncio.sleep(0.05)
+        if writer is not None:
+            writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(connection(index) for index in range(connections)))
+    elapsed = time.perf_counter() - started
+    return {
+        'requests/s': round(len(latencies) / elapsed, 1),
+        'p50 ms': round(percentile(latencies, 50), 1),
+        'p95 ms': round(percentile(latencies, 95), 1),
+        'p99 ms': round(percentile(latencies, 99), 1),
+        'errors': errors,
+    }
+
+
+async def stream_scenario(port, token, connections, timeout):
+    established, writers, arrivals = [], [], []
+    created = asyncio.Event()
+    write_started = [None]
+
+    async def stream():
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writers.append(writer)
+            writer.write(request_bytes('GET', '/api/v1/notes/stream', token))
+            head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), timeout)
+            if b' 200 ' not in head.split(b'\r\n', 1)[0]:
+                return
+            established.append(True)
+            while True:
+                line = await reader.readline()
+                if not line:
+                    return
+                if line.startswith(b'event: created') and created.is_set():
+                    arrivals.append((time.perf_counter() - write_started[0]) * 1000)
+                    return
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            return
+
+    tasks = [asyncio.ensure_future(stream()) for _ in range(connections)]
+    await asyncio.sleep(timeout)
+    opened = len(established)
+
+    # One write; every open stream of the user should receive it
+    body = json.dumps({'title': 'fan-out', 'content': 'measured'}).encode()
+    write_status = 'timeout'
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        created.set()
+        write_started[0] = time.perf_counter()
+        writer.write(request_bytes('POST', '/api/v1/notes/', token, body))
+        write_status, _ = await asyncio.wait_for(read_response(reader), timeout)
+        writer.close()
+    except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+        pass
+    await asyncio.wait(tasks, timeout=timeout)
+    for writer in writers:
+        writer.close()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return {
+        'streams open': f'{opened}/{connections}',
+        'write': write_status,
+        'received': len(arrivals),
+        'fan-out p50 ms': round(percentile(arrivals, 50), 1),
+        'fan-out p99 ms': round(percentile(arrivals, 99), 1),
+    }
+
+
+def run_mode(mode, port, tokens, args):
+    server = subprocess.Popen(server_command(mode, port, args), cwd=ROOT, env=os.environ.copy(),
+                              start_new_session=True)
+    results = {}
+    try:
+        asyncio.run(wait_until_up(port))
+        for scenario in args.scenarios.split(','):
+            with PeakRSS(server.pid) as memory:
+                if scenario == 'list':
+                    result = asyncio.run(list_scenario(port, tokens, args.connections, args.duration))
+                else:
+                    result = asyncio.run(stream_scenario(port, tokens[0], args.connections, args.stream_timeout))
+            result['peak RSS MB'] = round(memory.peak_mb, 1)
+            results[scenario] = result
+            time.sleep(1)  # Let closed connections drain before the next scenario
+    finally:
+        os.killpg(server.pid, signal.SIGTERM)
+        try:
+            server.wait(15)
+        except subprocess.TimeoutExpired:
+            os.killpg(server.pid, signal.SIGKILL)
+            server.wait()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', default='gunicorn,uvicorn')
+    parser.add_argument('--scenarios', default='list,stream')
+    parser.add_argument('--connections', type=int, default=1000)
+    parser.add_argument('--duration', type=float, default=15, help='Seconds of the list scenario')
+    parser.add_argument('--stream-timeout', type=float, default=10, help='Seconds to open streams and to await the event')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--threads', type=int, default=32, help='gunicorn --threads; ASGI_THREADS for uvicorn')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--notes', type=int, default=200)
+    parser.add_argument('--port', type=int, default=8790)
+    args = parser.parse_args()
+    os.environ['ASGI_THREADS'] = str(args.threads)
+
+    # Every connection holds a socket on both sides
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < args.connections * 3:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, args.connections * 3), hard))
+
+    with app.app_context():
+        migrate()
+        seed(args.users, args.notes)
+        tokens = [create_access_token(identity=str(user_id)) for user_id in range(1, args.users + 1)]
+
+    print(f'{args.connections} connections, {args.workers} worker(s), {args.threads} threads each')
+    for offset, mode in enumerate(args.modes.split(',')):
+        for scenario, result in run_mode(mode, args.port + offset, tokens, args).items():
+            print(f'{mode:<9} {scenario:<7} ' + '  '.join(f'{name}={value}' for name, value in result.items()))
+
+
+if __name__ == '__main__':
+    main()
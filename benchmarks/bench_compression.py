@@ -0,0 +1,108 @@
+"""
+Response compression benchmark: bytes on the wire and CPU per request.
+
+Seeds a temporary SQLite database with three users holding 100, 1,000 and
+10,000 notes, then fetches each user's whole list (one page) with every
+available encoding plus identity. For each it reports:
+
+  bytes       response body size on the wire
+  ratio       identity bytes / encoded bytes
+  fresh ms    CPU time of a request rendered from the database and
+              compressed (the response cache is invalidated first)
+  cached ms   CPU time of a repeated request, served from the response
+              cache with its precompressed body
+
+Encodings other than gzip need their packages installed (brotli, zstandard).
+
+Usage (from the repository root):
+    python benchmarks/bench_compression.py
+    python benchmarks/bench_compression.py --repeat 20 --sizes 100,1000,10000,50000
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['DATABASE_URL'] = f'sqlite:///{tempfile.mkdtemp()}/bench_compression.db'
+os.environ.setdefault('JWT_SECRET_KEY', 'bench-secret-key-with-enough-length')
+os.environ.setdefault('TOMBSTONE_PURGE_INTERVAL', '0')
+os.environ.setdefault('RATELIMIT_ENABLED', 'false')
+os.environ.setdefault('CACHE_BACKEND', 'memory')
+os.environ['NOTES_MAX_PAGE_SIZE'] = str(10 ** 6)  # Whole lists in one page
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+from app import app  # noqa: E402
+from migrations import migrate  # noqa: E402
+from models import db, Note, User  # noqa: E402
+
+# The app's own instances, used between requests
+compression = app.extensions['compression']
+response_cache = app.extensions['response_cache']
+
+
+def seed(sizes):
+    start = datetime(2024, 1, 1)
+    db.session.execute(insert(User), [
+        {'id': user_id, 'username': f'bench{user_id}', 'password': 'x'} for user_id in range(1, len(sizes) + 1)
+    ])
+    for user_id, notes in enumerate(sizes, 1):
+        db.session.execute(insert(Note), [
+            {'title': f'Meeting notes {i}', 'user_id': user_id, 'archived': i % 10 == 0,
+             'content': f'Discussed item {i}: lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 3,
+             'created_at': start + timedelta(seconds=i), 'updated_at': start + timedelta(seconds=i)}
+            for i in range(notes)
+        ])
+    db.session.commit()
+
+
+def cpu_ms(fn, repeat):
+    """Median CPU milliseconds over repeat calls, and the last result."""
+    timings = []
+    for _ in range(repeat):
+        start = time.process_time()
+        result = fn()
+        timings.append((time.process_time() - start) * 1000)
+    return statistics.median(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='100,1000,10000')
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    with app.app_context():
+        migrate()
+        seed(sizes)
+        tokens = {user_id: create_access_token(identity=str(user_id)) for user_id in range(1, len(sizes) + 1)}
+
+    client = app.test_client()
+    print(f'encodings available: {", ".join(compression.encodings) or "none"}; '
+          f'CPU medians of {args.repeat} requests')
+    print(f'{"notes":>6} {"encoding":<9} {"bytes":>11} {"ratio":>6} {"fresh ms":>9} {"cached ms":>10}')
+    for user_id, notes in enumerate(sizes, 1):
+        url = f'/api/v1/notes/?limit={notes}'
+        identity_bytes = None
+        for encoding in ['identity'] + compression.encodings:
+            headers = {'Authorization': f'Bearer {tokens[user_id]}', 'Accept-Encoding': encoding}
+
+            def fresh():
+                response_cache.invalidate_user(user_id)
+                return client.get(url, headers=headers)
+
+            fresh_ms, response = cpu_ms(fresh, args.repeat)
+            assert response.headers.get('Content-Encoding', 'identity') == encoding, response.headers
+            cached_ms, _ = cpu_ms(lambda: client.get(url, headers=headers), args.repeat)
+            size = len(response.data)
+            identity_bytes = identity_bytes or size
+            print(f'{notes:>6} {encoding:<9} {size:>11,} {identity_bytes / size:>5.1f}x {fresh_ms:>9.2f} {cached_ms:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+Query-plan benchmark for the notes date filter.
+
+Seeds a database with --notes notes (default 1,000,000) spread over --users
+users and a year of timestamps, then compares the old predicate
+date(created_at) = :day with the half-open range built by
+notes.created_between(). For each it prints the query plan and the median
+latency of the get_notes page query for one user and one day.
+
+Usage (from the repository root):
+    python benchmarks/bench_date_filter.py
+    python benchmarks/bench_date_filter.py --notes 100000 --database-url postgresql://localhost/notes_bench
+
+The target database is dropped and re-seeded, so never point this at real data.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, func, insert, select, text  # noqa: E402
+from models import db, Note, User  # noqa: E402
+from notes import created_between  # noqa: E402
+
+SEED_START = datetime(2024, 1, 1)
+SEED_BATCH = 50_000
+
+
+def seed(engine, users, notes):
+    """Recreates the schema and bulk loads users and notes."""
+    db.metadata.drop_all(engine)
+    db.metadata.create_all(engine)
+    rng = random.Random(42)
+    seconds_per_year = 365 * 24 * 3600
+
+    with engine.begin() as conn:
+        conn.execute(insert(User.__table__), [
+            {'id': i, 'username': f'user{i}', 'password': 'x', 'created_at': SEED_START, 'is_admin': False}
+            for i in range(1, users + 1)
+        ])
+
+    for offset in range(0, notes, SEED_BATCH):
+        rows = []
+        for i in range(offset, min(offset + SEED_BATCH, notes)):
+            created_at = SEED_START + timedelta(seconds=rng.randrange(seconds_per_year))
+            rows.append({
+                'title': f'Note {i}',
+                'content': 'Lorem ipsum dolor sit amet.',
+                'created_at': created_at,
+                'updated_at': created_at,
+                'archived': False,
+                'user_id': rng.randint(1, users),
+            })
+        with engine.begin() as conn:
+            conn.execute(insert(Note.__table__), rows)
+        print(f'  seeded {min(offset + SEED_BATCH, notes):,} / {notes:,} notes', end='\r')
+    print()
+
+    if engine.dialect.name == 'postgresql':
+        with engine.begin() as conn:
+            conn.execute(text('ANALYZE notes'))
+
+
+def page_query(predicate, user_id):
+    """The query shape get_notes issues for one page of a date-filtered listing."""
+    return (
+        select(Note.__table__)
+        .where(Note.user_id == user_id, predicate)
+        .order_by(Note.created_at.desc(), Note.id.desc())
+        .limit(51)
+    )
+
+
+def explain(conn, query):
+    """Returns the database's query plan for the statement as text lines."""
+    sql = str(query.compile(conn.engine, compile_kwargs={'literal_binds': True}))
+    if conn.dialect.name == 'sqlite':
+        return [row[-1] for row in conn.execute(text(f'EXPLAIN QUERY PLAN {sql}'))]
+    return [row[0] for row in conn.execute(text(f'EXPLAIN {sql}'))]
+
+
+def time_query(conn, query, repeat):
+    """Median wall-clock milliseconds over several runs."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute(query).fetchall()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--notes', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--database-url', help='defaults to a temporary SQLite file')
+    args = parser.parse_args()
+
+    url = args.database_url or f'sqlite:///{tempfile.mkdtemp()}/bench_date_filter.db'
+    engine = create_engine(url)
+    print(f'Seeding {args.notes:,} notes for {args.users} users into {engine.url!r}')
+    seed(engine, args.users, args.notes)
+
+    day = SEED_START + timedelta(days=180)
+    candidates = {
+        'date(created_at) = :day': func.date(Note.created_at) == day.date(),
+        'half-open range': created_between(day, day + timedelta(days=1)),
+    }
+
+    with engine.connect() as conn:
+        for label, predicate in candidates.items():
+            query = page_query(predicate, user_id=1)
+            print(f'\n{label}')
+            for line in explain(conn, query):
+                print(f'  plan: {line}')
+            print(f'  median: {time_query(conn, query, args.repeat):.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
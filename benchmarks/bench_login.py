@@ -0,0 +1,117 @@
+"""
+Login throughput benchmark for the password hashing pool.
+
+For each PASSWORD_HASH_WORKERS setting, starts a fresh app in a subprocess
+against a temporary SQLite database, then runs --concurrency threads that log
+in back to back for --duration seconds while one more thread polls the cheap
+index route. Reports logins/s, login latency percentiles, 503 responses and
+the latency of the index route during the burst (how much logins starve
+everything else). Setting 0 hashes inline, as before the pool existed.
+
+Usage (from the repository root):
+    python benchmarks/bench_login.py
+    python benchmarks/bench_login.py --workers 0,2,4 --concurrency 16 --duration 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from common import percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_child(concurrency, duration):
+    """Runs inside the subprocess: drives logins and index polls through the test client."""
+    sys.path.insert(0, ROOT)
+    from app import app
+    from migrations import migrate
+
+    with app.app_context():
+        migrate()
+    client = app.test_client()
+    credentials = {'username': 'bench_user', 'password': 'bench-password'}
+    client.post('/api/v1/auth/register', json=credentials)
+
+    login_times, index_times, statuses = [], [], {}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def login_loop():
+        local = app.test_client()
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            status = local.post('/api/v1/auth/login', json=credentials).status_code
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+                if status == 200:
+                    login_times.append(elapsed)
+
+    def index_loop():
+        local = app.test_client()
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            local.get('/')
+            index_times.append((time.perf_counter() - start) * 1000)
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=login_loop) for _ in range(concurrency)]
+    threads.append(threading.Thread(target=index_loop))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print(json.dumps({
+        'logins_per_second': len(login_times) / duration,
+        'login_p50_ms': statistics.median(login_times) if login_times else 0.0,
+        'login_p95_ms': percentile(login_times, 95),
+        'statuses': statuses,
+        'index_p50_ms': statistics.median(index_times) if index_times else 0.0,
+        'index_p95_ms': percentile(index_times, 95),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', default='0,2', help='comma-separated PASSWORD_HASH_WORKERS values')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--method', default='scrypt', help='PASSWORD_HASH_METHOD to benchmark')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.concurrency, args.duration)
+        return
+
+    print(f'{"workers":>7} {"logins/s":>9} {"p50 ms":>8} {"p95 ms":>8} {"index p95 ms":>13}  statuses')
+    for workers in args.workers.split(','):
+        env = dict(
+            os.environ,
+            DATABASE_URL=f'sqlite:///{tempfile.mkdtemp()}/bench_login.db',
+            JWT_SECRET_KEY='bench-secret-key-with-enough-length',
+            PASSWORD_HASH_WORKERS=workers,
+            PASSWORD_HASH_METHOD=args.method,
+            PASSWORD_HASH_QUEUE_DEPTH=str(args.concurrency),
+            RATELIMIT_ENABLED='false',
+        )
+        output = subprocess.run(
+            [sys.executable, __file__, '--child', '--concurrency', str(args.concurrency),
+             '--duration', str(args.duration)],
+            env=env, cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f'{workers:>7} {result["logins_per_second"]:>9.1f} {result["login_p50_ms"]:>8.1f} '
+              f'{result["login_p95_ms"]:>8.1f} {result["index_p95_ms"]:>13.1f}  {result["statuses"]}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Rate limiter microbenchmark.
+
+Times what the limiter adds to one request to a limited blueprint: the
+per-IP check before the view, the per-user check at JWT verification and
+the RateLimit-* headers, run inside a request context for GET
+/api/v1/notes/. It also times a bare bucket update for each backend. The
+memory backend should stay well under the 50 us budget per request; the
+fake:// Redis stand-in shows the Python cost around a Redis call, without
+the network round trip a real server adds.
+
+Usage (from the repository root):
+    python benchmarks/bench_ratelimit.py
+    python benchmarks/bench_ratelimit.py --number 200000 --repeat 7
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('JWT_SECRET_KEY', 'bench-secret-key-with-enough-length')
+os.environ.setdefault('TOMBSTONE_PURGE_INTERVAL', '0')
+os.environ['DATABASE_URL'] = 'sqlite://'
+
+from app import app  # noqa: E402
+from cache import connect_redis  # noqa: E402
+from ratelimit import MemoryBuckets, RedisBuckets  # noqa: E402
+
+rate_limiter = app.extensions['rate_limiter']  # The app's own limiter, usable outside a request
+
+BUDGET_US = 50
+UNLIMITED = (10 ** 9, 10 ** 9)  # capacity, tokens per second: never runs dry
+
+
+def time_calls(fn, number, repeat):
+    """Per-call microseconds for each of repeat rounds of number calls."""
+    rounds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        rounds.append((time.perf_counter() - start) / number * 1e6)
+    return rounds
+
+
+def request_overhead(buckets, number, repeat):
+    """Per-request microseconds of the limiter's hooks with the given bucket store."""
+    rate_limiter.buckets = buckets
+    rate_limiter.policies = {policy: (UNLIMITED, UNLIMITED) for policy in rate_limiter.policies}
+    response = app.response_class('{}')
+    jwt_data = {app.config['JWT_IDENTITY_CLAIM']: '1'}
+
+    def one_request():
+        with app.test_request_context('/api/v1/notes/', environ_base={'REMOTE_ADDR': '10.0.0.1'}):
+            rate_limiter._limit_ip()
+            rate_limiter._limit_user(None, jwt_data)
+            rate_limiter._add_headers(response)
+
+    def bare_context():
+        with app.test_request_context('/api/v1/notes/', environ_base={'REMOTE_ADDR': '10.0.0.1'}):
+            pass
+
+    with_limiter = time_calls(one_request, number, repeat)
+    without = time_calls(bare_context, number, repeat)
+    # Subtract the request context itself, which Flask sets up anyway
+    return [a - b for a, b in zip(with_limiter, without)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--number', type=int, default=50_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    if not rate_limiter.enabled:
+        sys.exit('RATELIMIT_ENABLED is false; unset it to run this benchmark.')
+
+    backends = {
+        'memory': lambda: MemoryBuckets(app.config['RATELIMIT_MAX_KEYS']),
+        'redis (fake://)': lambda: RedisBuckets(connect_redis('fake://')),
+    }
+    print(f'median of {args.repeat} rounds of {args.number:,} calls')
+    print(f'{"backend":<16} {"bucket take us":>15} {"per request us":>15} {"budget":>8}')
+    for name, make in backends.items():
+        buckets = make()
+        take = statistics.median(time_calls(lambda: buckets.take('notes:user:1', *UNLIMITED),
+                                            args.number, args.repeat))
+        overhead = statistics.median(request_overhead(make(), args.number, args.repeat))
+        verdict = 'ok' if overhead < BUDGET_US else 'OVER'
+        print(f'{name:<16} {take:>15.2f} {overhead:>15.2f} {verdict:>8}')
+
+
+if __name__ == '__main__':
+    main()
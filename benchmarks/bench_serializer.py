@@ -0,0 +1,96 @@
+"""
+Serialization benchmark: NoteSchema versus the precompiled note serializer.
+
+Seeds a temporary SQLite database with --notes notes for one user, then
+times three stages for both paths and checks the JSON bodies are identical:
+
+  fetch      loading the notes (ORM objects for NoteSchema, column tuples
+             for the serializer)
+  serialize  NoteSchema(many=True).dump versus note_serializer.rows
+  encode     jsonify versus serializers.json_response (orjson when installed)
+
+Usage (from the repository root):
+    python benchmarks/bench_serializer.py
+    python benchmarks/bench_serializer.py --notes 50000 --repeat 10
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['DATABASE_URL'] = f'sqlite:///{tempfile.mkdtemp()}/bench_serializer.db'
+os.environ.setdefault('JWT_SECRET_KEY', 'bench-secret-key-with-enough-length')
+os.environ.setdefault('TOMBSTONE_PURGE_INTERVAL', '0')
+
+from flask import jsonify  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+from app import app  # noqa: E402
+from models import db, Note, User, note_serializer  # noqa: E402
+from notes import NoteSchema  # noqa: E402
+from serializers import json_response, orjson  # noqa: E402
+from migrations import migrate  # noqa: E402
+
+
+def seed(notes):
+    start = datetime(2024, 1, 1)
+    db.session.execute(insert(User), [{'id': 1, 'username': 'bench', 'password': 'x'}])
+    db.session.execute(insert(Note), [
+        {'title': f'Note {i}', 'content': 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 4,
+         'created_at': start + timedelta(seconds=i), 'updated_at': start + timedelta(seconds=i, microseconds=i),
+         'archived': i % 10 == 0, 'user_id': 1}
+        for i in range(notes)
+    ])
+    db.session.commit()
+
+
+def timed(fn, repeat):
+    """Median milliseconds over repeat calls, and the last result."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - start) * 1000)
+        db.session.expunge_all()
+    return statistics.median(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--notes', type=int, default=10_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with app.test_request_context():
+        migrate()
+        seed(args.notes)
+        query = Note.query.filter_by(user_id=1).order_by(Note.created_at.desc(), Note.id.desc())
+
+        fetch_objects, notes = timed(lambda: query.all(), args.repeat)
+        fetch_rows, rows = timed(lambda: query.with_entities(*note_serializer.columns).all(), args.repeat)
+        notes = query.all()
+
+        serialize_schema, schema_data = timed(lambda: NoteSchema(many=True).dump(notes), args.repeat)
+        serialize_fast, fast_data = timed(lambda: note_serializer.rows(rows), args.repeat)
+
+        encode_schema, schema_body = timed(lambda: jsonify({'notes': schema_data}).get_data(), args.repeat)
+        encode_fast, fast_body = timed(lambda: json_response({'notes': fast_data}).get_data(), args.repeat)
+
+    print(f'{args.notes:,} notes, median of {args.repeat} runs; encoder: {"orjson" if orjson else "json"}')
+    print(f'{"stage":<10} {"NoteSchema ms":>14} {"serializer ms":>14} {"speedup":>8}')
+    stages = [
+        ('fetch', fetch_objects, fetch_rows),
+        ('serialize', serialize_schema, serialize_fast),
+        ('encode', encode_schema, encode_fast),
+        ('total', fetch_objects + serialize_schema + encode_schema, fetch_rows + serialize_fast + encode_fast),
+    ]
+    for stage, before, after in stages:
+        print(f'{stage:<10} {before:>14.1f} {after:>14.1f} {before / after:>7.1f}x')
+    print(f'identical JSON: {schema_body == fast_body}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Worker cold-start benchmark.
+
+Starts --runs fresh interpreters, as a gunicorn worker boot would, and in
+each one times:
+
+  import         `import app` (module imports plus create_app())
+  first request  the first GET / through the test client
+  first read     the first authenticated GET /api/v1/notes/ (first pool
+                 checkout and query)
+
+The schema is created once up front with `flask --app app init-db`, the
+deploy step, so the timings cover only what every worker pays. Point
+--app-dir at another checkout (e.g. a `git worktree` of an older commit)
+to compare startup between versions; --importtime lists the slowest
+imports of one run.
+
+Usage (from the repository root):
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 20 --app-dir ../notes-api-main
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = '''
+import json, sys, time
+sys.path.insert(0, sys.argv[1])
+start = time.perf_counter()
+from app import app
+imported = time.perf_counter()
+client = app.test_client()
+client.get('/')
+first_request = time.perf_counter()
+token = client.post('/api/v1/auth/login', json={'username': 'bench_user', 'password': 'bench-password'}).json['access_token']
+read_start = time.perf_counter()
+client.get('/api/v1/notes/', headers={'Authorization': 'Bearer ' + token})
+first_read = time.perf_counter()
+print(json.dumps({
+    'import': (imported - start) * 1000,
+    'first request': (first_request - imported) * 1000,
+    'first read': (first_read - read_start) * 1000,
+}))
+'''
+
+
+def child_env(database_url):
+    env = dict(os.environ)
+    env['DATABASE_URL'] = database_url
+    env.setdefault('JWT_SECRET_KEY', 'bench-secret-key-with-enough-length')
+    env.setdefault('TOMBSTONE_PURGE_INTERVAL', '0')
+    return env
+
+
+def prepare(app_dir, database_url):
+    """Creates the schema (when the checkout has init-db) and the benchmark user."""
+    env = child_env(database_url)
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'init-db'], cwd=app_dir, env=env,
+                   capture_output=True)
+    register = (
+        'import sys; sys.path.insert(0, sys.argv[1]); from app import app; '
+        "app.test_client().post('/api/v1/auth/register', "
+        "json={'username': 'bench_user', 'password': 'bench-password'})"
+    )
+    subprocess.run([sys.executable, '-c', register, app_dir], cwd=app_dir, env=env, check=True,
+                   capture_output=True)
+
+
+def run_once(app_dir, database_url):
+    result = subprocess.run([sys.executable, '-c', CHILD, app_dir], cwd=app_dir, env=child_env(database_url),
+                            check=True, capture_output=True, text=True)
+    # Older checkouts print their URL rules while importing; the timings are the last line
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def import_profile(app_dir, database_url, top):
+    """The slowest cumulative imports from python -X importtime."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=app_dir,
+                            env=child_env(database_url), check=True, capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|')
+        rows.append((int(cumulative), module.rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--app-dir', default=ROOT, help='checkout to measure (default: this one)')
+    parser.add_argument('--importtime', type=int, default=0, metavar='N', help='also list the N slowest imports')
+    args = parser.parse_args()
+
+    app_dir = os.path.abspath(args.app_dir)
+    database_url = f'sqlite:///{tempfile.mkdtemp()}/bench_startup.db'
+    prepare(app_dir, database_url)
+
+    runs = [run_once(app_dir, database_url) for _ in range(args.runs)]
+    print(f'{app_dir}: {args.runs} cold starts')
+    print(f'{"stage":<14} {"median ms":>10} {"min ms":>8} {"max ms":>8}')
+    for stage in ('import', 'first request', 'first read'):
+        values = [run[stage] for run in runs]
+        print(f'{stage:<14} {statistics.median(values):>10.1f} {min(values):>8.1f} {max(values):>8.1f}')
+
+    if args.importtime:
+        print('\nslowest imports (cumulative):')
+        for cumulative, module in import_profile(app_dir, database_url, args.importtime):
+            print(f'{cumulative / 1000:>10.1f} ms  {module}')
+
+
+if __name__ == '__main__':
+    main()
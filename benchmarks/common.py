@@ -0,0 +1,13 @@
+"""
+Helpers shared by the benchmark scripts, which import it as `common` (the
+script's own directory is first on sys.path when run as
+`python benchmarks/<script>.py`).
+"""
+
+
+def percentile(values, pct):
+    """The pct-th percentile of values by nearest rank; 0.0 when there are none."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
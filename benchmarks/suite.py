@@ -0,0 +1,537 @@
+"""
+Benchmark and load-test suite for the Notes API.
+
+load     Seeds a database with --users users and --notes notes, logs in a few
+         of them, then drives every auth, notes, transfer and admin route with
+         --requests requests at --concurrency threads. Reports p50/p95/p99
+         latency, throughput and error counts per endpoint; --memory adds a
+         tracemalloc pass for the peak Python heap per request. Requests go
+         through the Flask test client in-process, or over HTTP to a running
+         server with --base-url (start it against the same --database-url).
+micro    Times hot functions in-process: NoteSchema.dump, the note serializer,
+         the get_notes filter building, cursor encoding and password hashing.
+compare  Compares two --json outputs and exits 1 when a result regressed by
+         more than --threshold percent (p95 for load runs, per-call time for
+         micro runs).
+
+Usage (from the repository root):
+    python benchmarks/suite.py load --users 100 --notes 100000 --json base.json
+    python benchmarks/suite.py load --database-url postgresql://localhost/notes_bench
+    python benchmarks/suite.py load --only notes. --requests 1000 --concurrency 16
+    python benchmarks/suite.py micro --json micro.json
+    python benchmarks/suite.py compare base.json new.json --threshold 10
+
+The target database is dropped and re-seeded, so never point this at real data.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.error
+import urllib.request
+from datetime import datetime, timedelta
+
+from common import percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SEED_START = datetime(2024, 1, 1)
+SEED_BATCH = 20_000
+PASSWORD = 'bench-password'
+WORDS = ('alpha', 'budget', 'meeting', 'travel', 'recipe', 'project', 'garden', 'invoice', 'idea', 'review')
+
+
+def load_app(database_url):
+    """Imports the app against database_url and creates its schema (as init-db does)."""
+    os.environ['DATABASE_URL'] = database_url
+    os.environ.setdefault('JWT_SECRET_KEY', 'bench-secret-key-with-enough-length')
+    os.environ.setdefault('TOMBSTONE_PURGE_INTERVAL', '0')
+    os.environ.setdefault('RATELIMIT_ENABLED', 'false')  # Load tests measure the app, not the limiter
+    from app import app
+    from migrations import migrate
+    with app.app_context():
+        migrate()
+    return app
+
+
+
+# Seeding
+
+def reset_database(database_url):
+    """Removes a SQLite file, or drops the app's tables on other databases."""
+    if database_url.startswith('sqlite:///'):
+        path = database_url[len('sqlite:///'):]
+        for leftover in (path, path + '-wal', path + '-shm'):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        return
+    from sqlalchemy import create_engine
+    from models import db
+    engine = create_engine(database_url)
+    db.metadata.drop_all(engine)
+    engine.dispose()
+
+
+def seed(app, users, notes, victims):
+    """
+    Bulk loads users (user 1 is an admin, all share PASSWORD) and notes
+    spread over a year, plus victims users with a few notes each for the
+    delete-user route. Returns {user_id: [note ids]} and the victim ids.
+    """
+    from sqlalchemy import insert, select
+    from models import db, Note, User
+    from passwords import password_hasher
+    from search import rebuild_search_index
+
+    rng = random.Random(42)
+    seconds_per_year = 365 * 24 * 3600
+    with app.app_context():
+        hashed = password_hasher.hash(PASSWORD)
+        total_users = users + victims
+        db.session.execute(insert(User), [
+            {'id': i, 'username': f'bench_user{i}', 'password': hashed, 'created_at': SEED_START, 'is_admin': i == 1}
+            for i in range(1, total_users + 1)
+        ])
+        db.session.commit()
+
+        for offset in range(0, notes + victims * 5, SEED_BATCH):
+            rows = []
+            for i in range(offset, min(offset + SEED_BATCH, notes + victims * 5)):
+                created_at = SEED_START + timedelta(seconds=rng.randrange(seconds_per_year))
+                owner = rng.randint(1, users) if i < notes else users + 1 + (i - notes) // 5
+                rows.append({
+                    'title': f'Note {i} {rng.choice(WORDS)}',
+                    'content': ' '.join(rng.choice(WORDS) for _ in range(20)),
+                    'created_at': created_at,
+                    'updated_at': created_at,
+                    'archived': rng.random() < 0.1,
+                    'user_id': owner,
+                })
+            db.session.execute(insert(Note), rows)
+            db.session.commit()
+            print(f'  seeded {min(offset + SEED_BATCH, notes + victims * 5):,} notes', end='\r', file=sys.stderr)
+        print(file=sys.stderr)
+        rebuild_search_index()
+
+        note_ids = {}
+        for user_id, note_id in db.session.execute(select(Note.user_id, Note.id).where(Note.user_id <= users)):
+            note_ids.setdefault(user_id, []).append(note_id)
+        db.session.remove()
+    return note_ids, list(range(users + 1, users + victims + 1))
+
+
+
+# Clients
+
+class InProcessClient:
+    """Sends requests through the Flask test client; one instance per thread."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, headers=None, body=None, raw=None):
+        # Closing the response ends streamed requests the way a WSGI server would
+        with self.client.open(path, method=method, headers=headers, json=body, data=raw) as response:
+            return response.status_code, response.get_data()
+
+
+class HttpClient:
+    """Sends requests to a running server over HTTP."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method, path, headers=None, body=None, raw=None):
+        headers = dict(headers or {})
+        if body is not None:
+            raw = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        req = urllib.request.Request(self.base_url + path, data=raw, method=method, headers=headers)
+        try:
+            with urllib.request.urlopen(req) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as err:
+            return err.code, err.read()
+
+
+
+# Scenarios
+# Each scenario turns (ctx, rng) into (method, path, headers, json body, raw body).
+# They run in this order; the ones that delete data come last.
+
+class Context:
+    def __init__(self, tokens, admin, note_ids, victims, job_id):
+        self.tokens = tokens  # [(user_id, headers)]
+        self.admin = admin
+        self.note_ids = note_ids
+        self.victims = victims
+        self.job_id = job_id
+        self.registrations = itertools.count()
+        self.lock = threading.Lock()
+
+    def user(self, rng):
+        return rng.choice(self.tokens)
+
+    def note(self, rng):
+        user_id, headers = self.user(rng)
+        return headers, rng.choice(self.note_ids[user_id])
+
+    def take_note(self, rng):
+        """Removes and returns a note so it is deleted only once."""
+        with self.lock:
+            user_id, headers = self.user(rng)
+            ids = self.note_ids[user_id]
+            return headers, ids.pop() if len(ids) > 1 else ids[0]
+
+
+def _note_route(method, template, body=None, take=False, admin=False):
+    """Scenario for a route on one of the sending user's notes; take=True uses each note once."""
+    def build(ctx, rng):
+        headers, note_id = ctx.take_note(rng) if take else ctx.note(rng)
+        return method, template.format(note_id), ctx.admin if admin else headers, body, None
+    return build
+
+
+def _import_body(rng):
+    lines = (json.dumps({'title': f'Imported {i}', 'content': rng.choice(WORDS)}) for i in range(100))
+    return '\n'.join(lines).encode()
+
+
+SCENARIOS = [
+    ('auth.register', lambda ctx, rng: (
+        'POST', '/api/v1/auth/register', None,
+        {'username': f'bench_new{os.getpid()}_{next(ctx.registrations)}', 'password': PASSWORD}, None)),
+    ('auth.login', lambda ctx, rng: (
+        'POST', '/api/v1/auth/login', None,
+        {'username': f'bench_user{ctx.user(rng)[0]}', 'password': PASSWORD}, None)),
+    ('auth.protected', lambda ctx, rng: ('GET', '/api/v1/auth/protected', ctx.user(rng)[1], None, None)),
+    ('notes.list', lambda ctx, rng: ('GET', '/api/v1/notes/?limit=50', ctx.user(rng)[1], None, None)),
+    ('notes.list_summary', lambda ctx, rng: (
+        'GET', '/api/v1/notes/?limit=50&view=summary', ctx.user(rng)[1], None, None)),
+    ('notes.list_search', lambda ctx, rng: (
+        'GET', f'/api/v1/notes/?q={rng.choice(WORDS)}', ctx.user(rng)[1], None, None)),
+    ('notes.list_date_range', lambda ctx, rng: (
+        'GET', '/api/v1/notes/?from=2024-03-01&to=2024-03-31', ctx.user(rng)[1], None, None)),
+    ('notes.list_keyword', lambda ctx, rng: (
+        'GET', f'/api/v1/notes/?keyword={rng.choice(WORDS)}', ctx.user(rng)[1], None, None)),
+    ('notes.get', _note_route('GET', '/api/v1/notes/{}')),
+    ('notes.create', lambda ctx, rng: (
+        'POST', '/api/v1/notes/', ctx.user(rng)[1], {'title': 'Bench', 'content': rng.choice(WORDS)}, None)),
+    ('notes.update', _note_route('PUT', '/api/v1/notes/{}', body={'content': 'edited'})),
+    ('notes.archive', _note_route('PATCH', '/api/v1/notes/{}/archive')),
+    ('notes.unarchive', _note_route('PATCH', '/api/v1/notes/{}/unarchive')),
+    ('notes.batch', lambda ctx, rng: (
+        'POST', '/api/v1/notes/batch', ctx.user(rng)[1],
+        {'operations': [{'op': 'create', 'data': {'title': f'Batch {i}', 'content': 'x'}} for i in range(20)]},
+        None)),
+    ('notes.changes', lambda ctx, rng: ('GET', '/api/v1/notes/changes?limit=100', ctx.user(rng)[1], None, None)),
+    ('transfer.export', lambda ctx, rng: ('GET', '/api/v1/notes/export', ctx.user(rng)[1], None, None)),
+    ('transfer.import', lambda ctx, rng: (
+        'POST', '/api/v1/notes/import', ctx.user(rng)[1], None, _import_body(rng))),
+    ('admin.users', lambda ctx, rng: ('GET', '/api/v1/admin/users?limit=50', ctx.admin, None, None)),
+    ('admin.notes', lambda ctx, rng: ('GET', '/api/v1/admin/notes?limit=50', ctx.admin, None, None)),
+    ('admin.stats', lambda ctx, rng: ('GET', '/api/v1/admin/stats', ctx.admin, None, None)),
+    ('admin.cache', lambda ctx, rng: ('GET', '/api/v1/admin/cache', ctx.admin, None, None)),
+    ('admin.job', lambda ctx, rng: ('GET', f'/api/v1/admin/jobs/{ctx.job_id}', ctx.admin, None, None)),
+    ('notes.delete', _note_route('DELETE', '/api/v1/notes/{}', take=True)),
+    ('admin.delete_note', _note_route('DELETE', '/api/v1/admin/notes/{}', take=True, admin=True)),
+    ('admin.delete_user', lambda ctx, rng: (
+        'DELETE', f'/api/v1/admin/users/{_take_victim(ctx)}', ctx.admin, None, None)),
+]
+
+
+def _take_victim(ctx):
+    with ctx.lock:
+        return ctx.victims.pop() if ctx.victims else 0
+
+
+def run_request(client, ctx, rng, build):
+    method, path, headers, body, raw = build(ctx, rng)
+    start = time.perf_counter()
+    status, data = client.request(method, path, headers=headers, body=body, raw=raw)
+    return (time.perf_counter() - start) * 1000, status, len(data)
+
+
+
+# Load mode
+
+def login_all(client, user_ids):
+    tokens = []
+    for user_id in user_ids:
+        status, data = client.request('POST', '/api/v1/auth/login',
+                                      body={'username': f'bench_user{user_id}', 'password': PASSWORD})
+        if status != 200:
+            raise SystemExit(f'Login for bench_user{user_id} failed with {status}: {data[:200]!r}')
+        tokens.append((user_id, {'Authorization': 'Bearer ' + json.loads(data)['access_token']}))
+    return tokens
+
+
+def run_scenario(make_client, ctx, build, requests, concurrency):
+    timings, statuses, sizes = [], {}, []
+    lock = threading.Lock()
+    remaining = itertools.count()
+
+    def worker(seed):
+        client = make_client()
+        rng = random.Random(seed)
+        while next(remaining) < requests:
+            elapsed, status, size = run_request(client, ctx, rng, build)
+            with lock:
+                timings.append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+                sizes.append(size)
+
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    return {
+        'requests': len(timings),
+        'throughput_rps': len(timings) / wall if wall else 0.0,
+        'p50_ms': percentile(timings, 50),
+        'p95_ms': percentile(timings, 95),
+        'p99_ms': percentile(timings, 99),
+        'mean_response_bytes': statistics.mean(sizes) if sizes else 0,
+        'errors': sum(count for status, count in statuses.items() if status >= 400),
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+    }
+
+
+def measure_memory(make_client, ctx, build, samples):
+    """Peak Python heap (KiB, tracemalloc) over a few sequential requests."""
+    client = make_client()
+    rng = random.Random(0)
+    peak = 0
+    tracemalloc.start()
+    try:
+        for _ in range(samples):
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            run_request(client, ctx, rng, build)
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+    return peak / 1024
+
+
+def command_load(args):
+    url = args.database_url or f'sqlite:///{tempfile.mkdtemp()}/bench_suite.db'
+    reset_database(url)
+    app = load_app(url)
+    scenarios = [(name, build) for name, build in SCENARIOS if name.startswith(tuple(args.only or ('',)))]
+    # One victim for the job status route, plus one per delete_user request
+    victims = 1 + (args.requests if any(name == 'admin.delete_user' for name, _ in scenarios) else 0)
+
+    print(f'Seeding {args.users} users and {args.notes:,} notes into {url}', file=sys.stderr)
+    note_ids, victim_ids = seed(app, args.users, args.notes, victims)
+
+    if args.base_url:
+        make_client = lambda: HttpClient(args.base_url)  # noqa: E731
+    else:
+        make_client = lambda: InProcessClient(app)  # noqa: E731
+
+    client = make_client()
+    token_users = [user_id for user_id in range(1, args.users + 1) if user_id in note_ids][:args.token_users]
+    tokens = login_all(client, token_users)
+    admin = dict(tokens[0][1]) if tokens[0][0] == 1 else login_all(client, [1])[0][1]
+    # One asynchronous delete gives the job status route something to report
+    status, data = client.request('DELETE', f'/api/v1/admin/users/{victim_ids.pop()}?async=true', headers=admin)
+    job_id = json.loads(data)['job']['id'] if status == 202 else 0
+    ctx = Context(tokens, admin, note_ids, victim_ids, job_id)
+
+    results = {}
+    print(f'{"endpoint":<24} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"errors":>7}'
+          + (f' {"peak KiB":>9}' if args.memory else ''))
+    for name, build in scenarios:
+        result = run_scenario(make_client, ctx, build, args.requests, args.concurrency)
+        if args.memory and not args.base_url:
+            result['peak_memory_kib'] = measure_memory(make_client, ctx, build, args.memory_samples)
+        results[name] = result
+        line = (f'{name:<24} {result["throughput_rps"]:>8.1f} {result["p50_ms"]:>8.2f} {result["p95_ms"]:>8.2f} '
+                f'{result["p99_ms"]:>8.2f} {result["errors"]:>7}')
+        if 'peak_memory_kib' in result:
+            line += f' {result["peak_memory_kib"]:>9.1f}'
+        print(line)
+
+    meta = {
+        'database': url.split(':', 1)[0],
+        'users': args.users,
+        'notes': args.notes,
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'target': args.base_url or 'in-process',
+        # ru_maxrss is KiB on Linux; covers the whole run including seeding
+        'process_peak_rss_kib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+    write_json(args.json, 'load', meta, results)
+
+
+
+# Micro mode
+
+def time_calls(fn, number, repeat):
+    """Per-call microseconds for each of repeat rounds of number calls."""
+    rounds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        rounds.append((time.perf_counter() - start) * 1_000_000 / number)
+    return rounds
+
+
+def command_micro(args):
+    app = load_app(f'sqlite:///{tempfile.mkdtemp()}/bench_micro.db')
+    from werkzeug.datastructures import MultiDict
+    from werkzeug.security import check_password_hash, generate_password_hash
+    from models import db, Note, note_serializer
+    from notes import NoteSchema, filtered_notes_query
+    from params import decode_cursor, encode_cursor
+    from passwords import password_hasher
+    app.app_context().push()  # Building notes and reading extensions needs the app
+
+    now = datetime(2024, 6, 1, 12, 0, 0)
+    notes = [
+        Note(id=i, title=f'Note {i}', content='Lorem ipsum dolor sit amet. ' * 10, created_at=now,
+             updated_at=now, archived=False, user_id=1)
+        for i in range(args.notes)
+    ]
+    # Column tuples as selected by note_serializer.columns: the fields, then no blob data
+    rows = [
+        tuple(getattr(note, field) for field in note_serializer.fields) + (None,) * len(note_serializer.decoders)
+        for note in notes
+    ]
+    schema = NoteSchema(many=True)
+    filter_args = MultiDict({'from': '2024-03-01', 'to': '2024-03-31', 'keyword': 'budget', 'archived': 'false'})
+    search_args = MultiDict({'q': 'budget meet*'})
+    stored_hash = generate_password_hash(PASSWORD, password_hasher.method)
+
+    def build_filter(filter_args):
+        def run():
+            query, _ = filtered_notes_query(1, filter_args)
+            return str(query.statement.compile(db.engine))
+        return run
+
+    cases = {
+        f'NoteSchema.dump x{args.notes}': (lambda: schema.dump(notes), args.number),
+        f'Note.to_dict x{args.notes}': (lambda: [note.to_dict() for note in notes], args.number),
+        f'note_serializer.rows x{args.notes}': (lambda: note_serializer.rows(rows), args.number),
+        'filtered_notes_query (filters)': (build_filter(filter_args), args.number * 10),
+        'filtered_notes_query (q)': (build_filter(search_args), args.number * 10),
+        'encode_cursor + decode_cursor': (lambda: decode_cursor(encode_cursor(now.isoformat(), 12345), str, int),
+                                          args.number * 100),
+        f'password hash ({password_hasher.method})': (
+            lambda: generate_password_hash(PASSWORD, password_hasher.method), args.hash_number),
+        f'password verify ({password_hasher.method})': (
+            lambda: check_password_hash(stored_hash, PASSWORD), args.hash_number),
+    }
+
+    results = {}
+    print(f'{"function":<36} {"per call us":>12} {"p95 us":>10} {"calls/s":>12}')
+    with app.app_context():
+        for name, (fn, number) in cases.items():
+            fn()  # Warm up
+            rounds = time_calls(fn, number, args.repeat)
+            per_call = statistics.median(rounds)
+            results[name] = {
+                'per_call_us': per_call,
+                'p95_us': percentile(rounds, 95),
+                'calls_per_second': 1_000_000 / per_call if per_call else 0.0,
+                'number': number,
+                'repeat': args.repeat,
+            }
+            print(f'{name:<36} {per_call:>12.1f} {results[name]["p95_us"]:>10.1f} '
+                  f'{results[name]["calls_per_second"]:>12.1f}')
+
+    write_json(args.json, 'micro', {'notes': args.notes}, results)
+
+
+
+# Output and comparison
+
+def write_json(path, mode, meta, results):
+    if not path:
+        return
+    meta = dict(meta, python=platform.python_version(), timestamp=datetime.utcnow().isoformat())
+    with open(path, 'w') as f:
+        json.dump({'mode': mode, 'meta': meta, 'results': results}, f, indent=2, sort_keys=True)
+    print(f'Wrote {path}', file=sys.stderr)
+
+
+def command_compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    if baseline['mode'] != candidate['mode']:
+        raise SystemExit('Cannot compare a load run with a micro run')
+
+    metric = 'p95_ms' if baseline['mode'] == 'load' else 'per_call_us'
+    regressions = 0
+    print(f'{"name":<36} {"baseline":>10} {"candidate":>10} {"change":>8}')
+    for name, before in baseline['results'].items():
+        after = candidate['results'].get(name)
+        if after is None:
+            continue
+        change = (after[metric] - before[metric]) / before[metric] * 100 if before[metric] else 0.0
+        flag = ''
+        if change > args.threshold:
+            regressions += 1
+            flag = '  REGRESSION'
+        print(f'{name:<36} {before[metric]:>10.2f} {after[metric]:>10.2f} {change:>7.1f}%{flag}')
+    print(f'\n{regressions} regression(s) above {args.threshold}% in {metric}')
+    sys.exit(1 if regressions else 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    load = commands.add_parser('load', help='seed a database and load-test every route')
+    load.add_argument('--database-url', help='defaults to a temporary SQLite file')
+    load.add_argument('--users', type=int, default=50)
+    load.add_argument('--notes', type=int, default=50_000)
+    load.add_argument('--requests', type=int, default=200, help='requests per endpoint')
+    load.add_argument('--concurrency', type=int, default=8)
+    load.add_argument('--token-users', type=int, default=10, help='users that log in and send the traffic')
+    load.add_argument('--only', action='append', help='endpoint name prefix to run, e.g. notes. (repeatable)')
+    load.add_argument('--base-url', help='send requests to a running server instead of in-process')
+    load.add_argument('--memory', action='store_true', help='measure peak heap per request (in-process only)')
+    load.add_argument('--memory-samples', type=int, default=5)
+    load.add_argument('--json', help='write results to this file')
+    load.set_defaults(func=command_load)
+
+    micro = commands.add_parser('micro', help='time hot functions in-process')
+    micro.add_argument('--notes', type=int, default=1000, help='notes serialized per call')
+    micro.add_argument('--number', type=int, default=20, help='calls per round (scaled up for cheap functions)')
+    micro.add_argument('--hash-number', type=int, default=5, help='calls per round for password hashing')
+    micro.add_argument('--repeat', type=int, default=5)
+    micro.add_argument('--json', help='write results to this file')
+    micro.set_defaults(func=command_micro)
+
+    compare = commands.add_parser('compare', help='compare two --json outputs')
+    compare.add_argument('baseline')
+    compare.add_argument('candidate')
+    compare.add_argument('--threshold', type=float, default=10.0, help='allowed slowdown in percent')
+    compare.set_defaults(func=command_compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+import hashlib
+import zlib
+from extensions import AppExtension
+
+try:
+    import zstandard
+except ImportError:  # Optional: enables NOTE_BLOB_CODEC=zstd
+    zstandard = None
+
+# Compressed storage for large note bodies.
+# A body of NOTE_BLOB_THRESHOLD characters or more is compressed into the
+# note_blobs table under the sha256 of its text, so identical bodies are
+# stored once; the note row keeps its first NOTE_BLOB_PREFIX characters
+# inline (previews and keyword filters read those) plus the hash. Blobs are
+# decompressed only when a note's content is serialized or indexed for
+# search, which sees the whole body (see search.py). The codec
+# is recognised from each blob's magic bytes, so changing NOTE_BLOB_CODEC
+# never breaks blobs written before.
+
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+CODECS = ('zlib', 'zstd')
+
+
+class BlobCodec:
+    """
+    Configured from NOTE_BLOB_THRESHOLD (0 keeps every body inline),
+    NOTE_BLOB_PREFIX, NOTE_BLOB_CODEC and NOTE_BLOB_LEVEL.
+    """
+
+    def __init__(self):
+        self.threshold = 0
+        self.prefix = 0
+        self._compress = None
+
+    def init_app(self, app):
+        self.threshold = app.config['NOTE_BLOB_THRESHOLD']
+        self.prefix = app.config['NOTE_BLOB_PREFIX']
+        codec = app.config['NOTE_BLOB_CODEC']
+        level = app.config['NOTE_BLOB_LEVEL']
+
+        if codec not in CODECS:
+            raise RuntimeError(f'Unknown NOTE_BLOB_CODEC {codec!r}. Use {" or ".join(CODECS)}.')
+        if codec == 'zstd':
+            if zstandard is None:
+                raise RuntimeError('NOTE_BLOB_CODEC=zstd needs the zstandard package.')
+            self._compress = zstandard.ZstdCompressor(level=level).compress
+        else:
+            self._compress = lambda data: zlib.compress(data, level)
+
+        if self.threshold and not app.config['NOTES_PREVIEW_LENGTH'] <= self.prefix < self.threshold:
+            raise RuntimeError('NOTE_BLOB_PREFIX must be at least NOTES_PREVIEW_LENGTH and below NOTE_BLOB_THRESHOLD.')
+
+    def stores(self, text):
+        """Whether text is large enough to go to a blob."""
+        return bool(self.threshold) and len(text) >= self.threshold
+
+    def encode(self, text):
+        """(sha256 hex digest, compressed bytes) of a body."""
+        data = text.encode('utf-8')
+        return hashlib.sha256(data).hexdigest(), self._compress(data)
+
+    def decode(self, data):
+        """Text of a blob written with any codec."""
+        if data[:4] == ZSTD_MAGIC:
+            if zstandard is None:
+                raise RuntimeError('A note blob is zstd-compressed; install the zstandard package.')
+            return zstandard.ZstdDecompressor().decompress(data).decode('utf-8')
+        return zlib.decompress(data).decode('utf-8')
+
+
+blob_codec = AppExtension('blob_codec', BlobCodec)
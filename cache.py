@@ -0,0 +1,276 @@
+import fnmatch
+import hashlib
+import json
+import queue
+import threading
+import time
+from collections import OrderedDict
+from extensions import AppExtension
+
+try:
+    import redis
+except ImportError:  # Optional: only needed for CACHE_BACKEND=redis with a real server
+    redis = None
+
+# Read-through cache for serialized note responses.
+# Entries are keyed by user, a per-user generation counter and the normalized
+# request; writes bump the user's generation so stale entries are never read
+# again and simply age out. Backends: in-process LRU (default), Redis, none.
+
+
+class LRUCache:
+    """Thread-safe in-process LRU with per-entry TTL and a total byte budget."""
+
+    def __init__(self, max_bytes, default_ttl):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._counters = {}  # generation counters, never evicted
+        self._size = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        size = len(key) + len(value)
+        if size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + (ttl or self.default_ttl)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires_at, value)
+            self._size += size
+            while self._size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def counter(self, key):
+        return self._counters.get(key, 0)
+
+    def _remove(self, key):
+        _, value = self._entries.pop(key)
+        self._size -= len(key) + len(value)
+
+    def info(self):
+        return {'entries': len(self._entries), 'bytes': self._size, 'evictions': self.evictions}
+
+
+class FakeRedis:
+    """
+    Minimal in-memory stand-in for a redis.Redis client, covering the
+    commands used in this app. Selected with a fake:// Redis URL for local
+    development and tests; it is not shared between processes. Lua scripts
+    are not interpreted: a module registers a Python equivalent in
+    script_handlers, which runs atomically under the fake's lock.
+    """
+
+    script_handlers = {}  # Lua source -> handler(fake, keys, args)
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.RLock()
+        self._pubsubs = []
+
+    def _live(self, key):
+        item = self._data.get(key)
+        if item and item[1] is not None and item[1] < time.monotonic():
+            del self._data[key]
+            return None
+        return item
+
+    def get(self, key):
+        with self._lock:
+            item = self._live(key)
+            return item[0] if item else None
+
+    def set(self, key, value, ex=None):
+        if isinstance(value, str):
+            value = value.encode()
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ex if ex else None)
+        return True
+
+    def incr(self, key):
+        with self._lock:
+            item = self._live(key)
+            value = int(item[0]) + 1 if item else 1
+            self._data[key] = (str(value).encode(), item[1] if item else None)
+            return value
+
+    def delete(self, *keys):
+        with self._lock:
+            return sum(self._data.pop(key, None) is not None for key in keys)
+
+    def register_script(self, script):
+        handler = self.script_handlers[script]
+
+        def run(keys=(), args=()):
+            with self._lock:
+                return handler(self, keys, args)
+        return run
+
+    def publish(self, channel, message):
+        with self._lock:
+            pubsubs = list(self._pubsubs)
+        return sum(pubsub._receive(channel, message) for pubsub in pubsubs)
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        pubsub = FakePubSub()
+        with self._lock:
+            self._pubsubs.append(pubsub)
+        return pubsub
+
+
+class FakePubSub:
+    """Pattern subscriptions of a FakeRedis; messages queue up until listen() yields them."""
+
+    def __init__(self):
+        self._patterns = []
+        self._messages = queue.Queue()
+
+    def psubscribe(self, *patterns):
+        self._patterns.extend(patterns)
+
+    def _receive(self, channel, message):
+        for pattern in self._patterns:
+            if fnmatch.fnmatchcase(channel, pattern):
+                self._messages.put({
+                    'type': 'pmessage', 'pattern': pattern.encode(), 'channel': channel.encode(),
+                    'data': message.encode() if isinstance(message, str) else message,
+                })
+                return 1
+        return 0
+
+    def listen(self):
+        while True:
+            yield self._messages.get()
+
+
+def connect_redis(url):
+    """Returns a Redis client for the URL; fake:// gives an in-process FakeRedis."""
+    if url.startswith('fake://'):
+        return FakeRedis()
+    if redis is None:
+        raise RuntimeError('The redis package is required for a Redis backend. Install it with pip install redis.')
+    return redis.Redis.from_url(url)
+
+
+class RedisCache:
+    """Cache backend on a Redis-compatible client; entries expire through Redis TTLs."""
+
+    def __init__(self, client, default_ttl, prefix='notes-cache:'):
+        self.client = client
+        self.default_ttl = default_ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, value, ex=ttl or self.default_ttl)
+
+    def incr(self, key):
+        return self.client.incr(self.prefix + key)
+
+    def counter(self, key):
+        value = self.client.get(self.prefix + key)
+        return int(value) if value else 0
+
+    def info(self):
+        # Memory and evictions are managed (and reported) by Redis itself
+        return {}
+
+
+class ResponseCache:
+    """
+    Per-user response cache, configured from the app config:
+    CACHE_BACKEND (memory | redis | none), CACHE_TTL, CACHE_MAX_BYTES and
+    CACHE_REDIS_URL. Entries store the response body with its validators.
+    """
+
+    def __init__(self):
+        self.backend = None
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        backend = app.config['CACHE_BACKEND']
+        ttl = app.config['CACHE_TTL']
+        if backend == 'memory':
+            self.backend = LRUCache(app.config['CACHE_MAX_BYTES'], ttl)
+        elif backend == 'redis':
+            self.backend = RedisCache(connect_redis(app.config['CACHE_REDIS_URL']), ttl)
+        elif backend == 'none':
+            self.backend = None
+        else:
+            raise RuntimeError(f'Unknown CACHE_BACKEND {backend!r}. Use memory, redis or none.')
+
+    @property
+    def enabled(self):
+        return self.backend is not None
+
+    def key(self, user_id, scope, args=()):
+        """Cache key for a user's view of scope under the normalized request arguments."""
+        generation = self.backend.counter(f'gen:{user_id}')
+        params = hashlib.sha1(json.dumps(sorted(args)).encode()).hexdigest()
+        return f'{user_id}:{generation}:{scope}:{params}'
+
+    def get(self, key, encoding=None):
+        """
+        Returns (body, etag, last_modified, encoding) or None. Given an
+        encoding, the body precompressed with it is preferred; the returned
+        encoding is None when the plain body is served instead.
+        """
+        raw = self.backend.get(f'{key}|{encoding}') if encoding else None
+        if raw is None:
+            encoding = None
+            raw = self.backend.get(key)
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        header, body = raw.split(b'\n', 1)
+        etag, last_modified = json.loads(header)
+        return body, etag, last_modified, encoding
+
+    def set(self, key, body, etag, last_modified, encoding=None):
+        header = json.dumps([etag, last_modified]).encode()
+        self.backend.set(f'{key}|{encoding}' if encoding else key, header + b'\n' + body)
+
+    def invalidate_user(self, user_id):
+        """Bumps the user's generation so every cached entry for them is bypassed."""
+        if self.enabled:
+            self.backend.incr(f'gen:{user_id}')
+
+    def stats(self):
+        stats = {'backend': type(self.backend).__name__ if self.backend else None,
+                 'hits': self.hits, 'misses': self.misses, 'evictions': 0}
+        if self.backend:
+            stats.update(self.backend.info())
+        return stats
+
+
+response_cache = AppExtension('response_cache', ResponseCache)
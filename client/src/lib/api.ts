@@ -3,7 +3,7 @@ import axios from "axios";
 /**
  * This removes hydration timing issues on Netlify/Vite.
  */
-function resolveBaseURL() {
+export function resolveBaseURL() {
   const url = import.meta.env.VITE_API_URL;
   if (url) return `${url}/api/v1`;
   return "http://localhost:10000/api/v1";
@@ -1,6 +1,6 @@
-import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
-import api from '../lib/api';
-import { useMemo, useState } from 'react';
+import { useInfiniteQuery, useMutation, useQueryClient } from '@tanstack/react-query';
+import api, { resolveBaseURL } from '../lib/api';
+import { useEffect, useMemo, useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 
 type Note = {
@@ -12,6 +12,14 @@ type Note = {
 	archived: boolean;
 };
 
+type NotesPage = {
+	notes: Note[];
+	next_cursor: string | null;
+};
+
+// Delay before reopening the live feed after it ends or fails
+const STREAM_RETRY_MS = 5000;
+
 export default function Notes() {
 	const navigate = useNavigate();
 	const queryClient = useQueryClient();
@@ -23,17 +31,68 @@ export default function Notes() {
 
 	const queryKey = useMemo(() => ['notes', { keyword, archived }], [keyword, archived]);
 
-	const { data, isPending, error } = useQuery({
+	const { data, isPending, error, fetchNextPage, hasNextPage, isFetchingNextPage } = useInfiniteQuery({
 		queryKey,
-		queryFn: async () => {
+		initialPageParam: null as string | null,
+		queryFn: async ({ pageParam }) => {
 			const params: Record<string, string> = {};
 			if (keyword) params.keyword = keyword;
 			if (archived !== 'all') params.archived = archived;
+			if (pageParam) params.cursor = pageParam;
 			const res = await api.get('/notes/', { params });
-			return res.data.notes as Note[];
+			return res.data as NotesPage;
 		},
+		getNextPageParam: (lastPage) => lastPage.next_cursor,
 	});
 
+	const notes = useMemo(() => data?.pages.flatMap((page) => page.notes) ?? [], [data]);
+
+	// Refresh when notes change on another device (live feed instead of polling).
+	// EventSource can't send headers, so every connection opens with a fresh
+	// short-lived stream ticket; when the stream ends or is refused (server busy),
+	// reconnect with a new ticket and resume after the last event seen.
+	useEffect(() => {
+		if (!localStorage.getItem('access_token')) return;
+		let source: EventSource | null = null;
+		let retry: ReturnType<typeof setTimeout> | undefined;
+		let lastEventId = '';
+		let closed = false;
+
+		const refresh = (event: MessageEvent) => {
+			lastEventId = event.lastEventId || lastEventId;
+			queryClient.invalidateQueries({ queryKey: ['notes'] });
+		};
+		const reconnect = () => {
+			if (!closed) retry = setTimeout(connect, STREAM_RETRY_MS);
+		};
+		const connect = async () => {
+			try {
+				const res = await api.post('/notes/stream/ticket');
+				if (closed) return;
+				const params = new URLSearchParams({ ticket: res.data.ticket });
+				if (lastEventId) params.set('since', lastEventId);
+				source = new EventSource(`${resolveBaseURL()}/notes/stream?${params}`);
+				for (const kind of ['created', 'updated', 'archived', 'unarchived', 'deleted', 'resync']) {
+					source.addEventListener(kind, refresh);
+				}
+				source.onerror = () => {
+					// The browser would retry with the same, soon expired ticket
+					source?.close();
+					reconnect();
+				};
+			} catch {
+				reconnect();
+			}
+		};
+
+		connect();
+		return () => {
+			closed = true;
+			clearTimeout(retry);
+			source?.close();
+		};
+	}, [queryClient]);
+
 	const createMutation = useMutation({
 		mutationFn: async (note: { title: string; content: string }) => {
 			const res = await api.post('/notes/', note);
@@ -123,7 +182,7 @@ export default function Notes() {
 					<div style={{ color: 'red' }}>Failed to load notes</div>
 				) : (
 					<ul style={{ display: 'grid', gap: 8, padding: 0, listStyle: 'none' }}>
-						{(data ?? []).map((n) => (
+						{notes.map((n) => (
 							<li key={n.id} style={{ border: '1px solid #eee', padding: 12, borderRadius: 6 }}>
 								{editingId === n.id ? (
 									<form
@@ -190,6 +249,11 @@ export default function Notes() {
 						))}
 					</ul>
 				)}
+				{hasNextPage ? (
+					<button onClick={() => fetchNextPage()} disabled={isFetchingNextPage} style={{ marginTop: 12 }}>
+						{isFetchingNextPage ? 'Loading...' : 'Load more'}
+					</button>
+				) : null}
 			</section>
 		</div>
 	);
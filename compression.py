@@ -0,0 +1,165 @@
+import re
+import zlib
+from flask import g, request
+from cache import response_cache
+from extensions import AppExtension
+
+try:
+    import brotli
+except ImportError:  # Optional: enables Content-Encoding: br
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # Optional: enables Content-Encoding: zstd
+    zstandard = None
+
+# Content-negotiated response compression.
+# Responses of a compressible type over COMPRESS_MIN_SIZE bytes are encoded
+# with the best of COMPRESS_ENCODINGS the client accepts (and this install
+# supports). A compressed representation gets its own ETag (the identity ETag
+# plus -<encoding>); conditional headers are normalized back before the views
+# see them, so their validators keep working. Cached note responses keep
+# their compressed bytes next to the identity body, under
+# '<cache key>|<encoding>', so repeated reads are not compressed again.
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/x-ndjson', 'text/csv', 'text/plain', 'text/html')
+
+ETAG_ENCODING_SUFFIX = re.compile(r'-(gzip|br|zstd)"')
+
+
+def _gzip(level):
+    return lambda data: zlib.compress(data, level, wbits=31)  # wbits=31 writes a gzip header
+
+
+def _gzip_stream(level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress, compressor.flush
+
+
+def _br(level):
+    return lambda data: brotli.compress(data, quality=level)
+
+
+def _br_stream(level):
+    compressor = brotli.Compressor(quality=level)
+    return compressor.process, compressor.finish
+
+
+def _zstd(level):
+    return zstandard.ZstdCompressor(level=level).compress
+
+
+def _zstd_stream(level):
+    compressor = zstandard.ZstdCompressor(level=level).compressobj()
+    return compressor.compress, compressor.flush
+
+
+# encoding -> (one-shot factory, streaming factory, module it needs, level setting)
+ENCODERS = {
+    'gzip': (_gzip, _gzip_stream, zlib, 'COMPRESS_GZIP_LEVEL'),
+    'br': (_br, _br_stream, brotli, 'COMPRESS_BR_LEVEL'),
+    'zstd': (_zstd, _zstd_stream, zstandard, 'COMPRESS_ZSTD_LEVEL'),
+}
+
+
+class Compressor:
+    """
+    Configured from COMPRESS_ENABLED, COMPRESS_ENCODINGS (server preference
+    order), COMPRESS_MIN_SIZE and COMPRESS_<ENCODING>_LEVEL.
+    """
+
+    def __init__(self):
+        self.encodings = []
+        self.min_size = 0
+        self._compress = {}
+        self._levels = {}
+
+    def init_app(self, app):
+        if not app.config['COMPRESS_ENABLED']:
+            return
+
+        for encoding in app.config['COMPRESS_ENCODINGS']:
+            if encoding not in ENCODERS:
+                raise RuntimeError(f'Unknown compression encoding {encoding!r}. Use {", ".join(ENCODERS)}.')
+            one_shot, _, module, level_setting = ENCODERS[encoding]
+            if module is None:
+                continue  # Package not installed; the next encoding is used instead
+            self.encodings.append(encoding)
+            self._levels[encoding] = app.config[level_setting]
+            self._compress[encoding] = one_shot(app.config[level_setting])
+        self.min_size = app.config['COMPRESS_MIN_SIZE']
+
+        app.before_request(self._normalize_validators)
+        app.after_request(self._compress_response)
+
+    def negotiate(self, size=None):
+        """The encoding for this request's response, or None to send it as is."""
+        if not self.encodings or (size is not None and size < self.min_size):
+            return None
+        encoding = request.accept_encodings.best_match(self.encodings)
+        return encoding if encoding and request.accept_encodings[encoding] > 0 else None
+
+    def compress(self, data, encoding):
+        return self._compress[encoding](data)
+
+    def stream(self, chunks, encoding):
+        """Compresses an iterable of byte chunks on the fly."""
+        compress, finish = ENCODERS[encoding][1](self._levels[encoding])
+        for chunk in chunks:
+            data = compress(chunk)
+            if data:
+                yield data
+        yield finish()
+
+    def encoded(self, response, encoding, body):
+        """Turns response into its encoding representation carrying body (already compressed)."""
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(f'{etag}-{encoding}', weak)
+        return response
+
+    def _normalize_validators(self):
+        # Strip our encoding suffix from If-None-Match / If-Match, remembering it for 304s
+        for header in ('HTTP_IF_NONE_MATCH', 'HTTP_IF_MATCH'):
+            value = request.environ.get(header)
+            if value and '-' in value:
+                match = ETAG_ENCODING_SUFFIX.search(value)
+                if match:
+                    g.etag_encoding = match.group(1)
+                    request.environ[header] = ETAG_ENCODING_SUFFIX.sub('"', value)
+
+    def _compress_response(self, response):
+        if response.status_code == 304:
+            encoding = g.get('etag_encoding')
+            etag, weak = response.get_etag()
+            if encoding and etag:
+                response.set_etag(f'{etag}-{encoding}', weak)
+                response.vary.add('Accept-Encoding')
+            return response
+
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        body = response.get_data()
+        encoding = self.negotiate(len(body))
+        if encoding is None:
+            return response
+
+        compressed = self.compress(body, encoding)
+        if len(compressed) >= len(body):
+            return response
+        entry = g.get('response_cache_entry')
+        if entry is not None:
+            cache_key, etag, last_modified = entry
+            response_cache.set(cache_key, compressed, etag, last_modified, encoding)
+        return self.encoded(response, encoding, compressed)
+
+
+compression = AppExtension('compression', Compressor)
@@ -17,6 +17,118 @@ class Config:
     SQLALCHEMY_DATABASE_URI = database_url
     SQLALCHEMY_TRACK_MODIFICATIONS = False  # Disable unnecessary event notifications
 
+    # Optional read replicas (comma-separated URLs); GET requests read from them
+    DATABASE_REPLICA_URLS = [
+        url.strip().replace('postgres://', 'postgresql://', 1)
+        for url in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if url.strip()
+    ]
+    DB_REPLICA_STICKY_SECONDS = int(os.getenv('DB_REPLICA_STICKY_SECONDS', 5))  # Reads stay on the primary this long after a user writes
+
+    # Connection pool and engine tuning (applied in database.py)
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))  # Persistent connections per app worker
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))  # Extra connections allowed under bursts
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))  # Seconds to wait for a free connection
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'  # Test connections on checkout (not SQLite)
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))  # Reconnect after this many seconds (not SQLite)
+    DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 0))  # Per-statement limit; 0 disables
+
+    # SQLite connection pragmas
+    SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')  # WAL lets readers run alongside a writer
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')  # NORMAL is safe with WAL and avoids an fsync per commit
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))  # Bytes of the file read through mmap
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))  # Wait this long on a locked database
+    SQLITE_FOREIGN_KEYS = os.getenv('SQLITE_FOREIGN_KEYS', 'true').lower() == 'true'  # Enforce FKs, incl. ON DELETE CASCADE
+
     # JWT configuration
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY')  # Secret key for token generation
-    JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=2)  # Token lifespan set to 2 hours
\ No newline at end of file
+    JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=2)  # Token lifespan set to 2 hours
+    # Embed is_admin in tokens so admin checks need no query; a role change then
+    # only takes effect once the user's current token expires
+    JWT_ADMIN_CLAIM = os.getenv('JWT_ADMIN_CLAIM', 'false').lower() == 'true'
+    PRINCIPAL_CACHE_TTL = int(os.getenv('PRINCIPAL_CACHE_TTL', 30))  # Seconds a user lookup is reused; 0 disables
+
+    # Pagination for note listings (keyset/cursor based)
+    NOTES_PAGE_SIZE = int(os.getenv('NOTES_PAGE_SIZE', 50))  # Default page size when no limit is given
+    NOTES_MAX_PAGE_SIZE = int(os.getenv('NOTES_MAX_PAGE_SIZE', 500))  # Upper bound for the limit parameter
+    NOTES_PREVIEW_LENGTH = int(os.getenv('NOTES_PREVIEW_LENGTH', 200))  # Characters of content in view=summary listings
+
+    # Large note bodies are stored compressed in note_blobs, once per distinct text; the note row keeps a
+    # plain prefix for previews, keyword filters and search. Convert existing notes with `flask --app app compress-notes`
+    NOTE_BLOB_THRESHOLD = int(os.getenv('NOTE_BLOB_THRESHOLD', 32768))  # Characters; 0 keeps every body inline
+    NOTE_BLOB_PREFIX = int(os.getenv('NOTE_BLOB_PREFIX', 2048))  # Characters kept inline; at least NOTES_PREVIEW_LENGTH
+    NOTE_BLOB_CODEC = os.getenv('NOTE_BLOB_CODEC', 'zlib')  # zlib | zstd (needs the zstandard package)
+    NOTE_BLOB_LEVEL = int(os.getenv('NOTE_BLOB_LEVEL', 6))  # zlib 1-9, zstd 1-22
+    NOTE_BLOB_MIGRATION_BATCH_SIZE = int(os.getenv('NOTE_BLOB_MIGRATION_BATCH_SIZE', 200))  # Notes converted per transaction
+
+    # Maximum number of operations accepted by POST /api/v1/notes/batch
+    NOTES_BATCH_MAX_OPERATIONS = int(os.getenv('NOTES_BATCH_MAX_OPERATIONS', 5000))
+
+    # Deleted notes are kept as tombstones for delta sync, then purged
+    TOMBSTONE_RETENTION_DAYS = int(os.getenv('TOMBSTONE_RETENTION_DAYS', 30))  # Also the oldest usable change token
+    TOMBSTONE_PURGE_INTERVAL = int(os.getenv('TOMBSTONE_PURGE_INTERVAL', 3600))  # Seconds between purges; 0 disables the job
+    TOMBSTONE_PURGE_BATCH_SIZE = int(os.getenv('TOMBSTONE_PURGE_BATCH_SIZE', 1000))  # Rows deleted per transaction
+
+    # Read-through response cache for note reads
+    CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'memory')  # memory | redis | none; use redis with several workers
+    CACHE_TTL = int(os.getenv('CACHE_TTL', 30))  # Seconds an entry may be served
+    CACHE_MAX_BYTES = int(os.getenv('CACHE_MAX_BYTES', 64 * 1024 * 1024))  # Size budget of the in-process LRU
+    CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0')  # fake:// selects an in-process stand-in
+
+    # Token-bucket rate limits per blueprint policy, as <count>/<second|minute|hour|day> ('' disables one)
+    RATELIMIT_ENABLED = os.getenv('RATELIMIT_ENABLED', 'true').lower() == 'true'
+    RATELIMIT_BACKEND = os.getenv('RATELIMIT_BACKEND', 'memory')  # memory | redis; use redis with several workers
+    RATELIMIT_REDIS_URL = os.getenv('RATELIMIT_REDIS_URL', CACHE_REDIS_URL)  # fake:// selects an in-process stand-in
+    RATELIMIT_MAX_KEYS = int(os.getenv('RATELIMIT_MAX_KEYS', 100000))  # Buckets kept by the memory backend
+    RATELIMIT_AUTH_PER_IP = os.getenv('RATELIMIT_AUTH_PER_IP', '20/minute')  # Login and register hash passwords
+    RATELIMIT_AUTH_PER_USER = os.getenv('RATELIMIT_AUTH_PER_USER', '60/minute')
+    RATELIMIT_NOTES_PER_IP = os.getenv('RATELIMIT_NOTES_PER_IP', '600/minute')  # Also covers export/import
+    RATELIMIT_NOTES_PER_USER = os.getenv('RATELIMIT_NOTES_PER_USER', '300/minute')
+    RATELIMIT_ADMIN_PER_IP = os.getenv('RATELIMIT_ADMIN_PER_IP', '300/minute')
+    RATELIMIT_ADMIN_PER_USER = os.getenv('RATELIMIT_ADMIN_PER_USER', '120/minute')
+    TRUSTED_PROXY_COUNT = int(os.getenv('TRUSTED_PROXY_COUNT', 0))  # Proxies in front of the app (1 on Render), for client IPs
+
+    # Live change feed (GET /api/v1/notes/stream); each open stream holds a worker thread,
+    # so serve it with threaded workers (gunicorn -k gthread) rather than sync ones
+    EVENTS_BACKEND = os.getenv('EVENTS_BACKEND', 'memory')  # memory | redis; use redis with several workers
+    EVENTS_REDIS_URL = os.getenv('EVENTS_REDIS_URL', CACHE_REDIS_URL)  # fake:// selects an in-process stand-in
+    EVENTS_BUFFER_SIZE = int(os.getenv('EVENTS_BUFFER_SIZE', 1000))  # Events queued per stream before it resyncs from the database
+    SSE_HEARTBEAT_SECONDS = float(os.getenv('SSE_HEARTBEAT_SECONDS', 15))  # Keep-alive comment interval
+    SSE_MAX_SECONDS = float(os.getenv('SSE_MAX_SECONDS', 300))  # Streams end after this long; clients reconnect and resume
+    SSE_RETRY_MS = int(os.getenv('SSE_RETRY_MS', 3000))  # Reconnect delay suggested to EventSource clients
+    # Under gunicorn every open stream holds one of the worker's --threads until it ends, so keep this
+    # well below --threads (0 turns the feed off there; run the ASGI mode to serve many streams)
+    SSE_MAX_STREAMS = int(os.getenv('SSE_MAX_STREAMS', 2))  # Open streams per worker process; more get 503
+    SSE_TICKET_SECONDS = int(os.getenv('SSE_TICKET_SECONDS', 60))  # Lifetime of the tickets EventSource clients open streams with
+
+    # ASGI mode (uvicorn asgi:app): register, login, the live stream and admin stats run as async views;
+    # every other request runs in a thread pool of this size per worker process
+    ASGI_THREADS = int(os.getenv('ASGI_THREADS', 32))
+
+    # Response compression (br needs the brotli package, zstd the zstandard package)
+    COMPRESS_ENABLED = os.getenv('COMPRESS_ENABLED', 'true').lower() == 'true'
+    COMPRESS_ENCODINGS = [e.strip() for e in os.getenv('COMPRESS_ENCODINGS', 'zstd,br,gzip').split(',') if e.strip()]  # Preference order
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))  # Smaller bodies are sent as is
+    COMPRESS_GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', 6))  # 1-9
+    COMPRESS_BR_LEVEL = int(os.getenv('COMPRESS_BR_LEVEL', 4))  # 0-11; higher levels are too slow per request
+    COMPRESS_ZSTD_LEVEL = int(os.getenv('COMPRESS_ZSTD_LEVEL', 3))  # 1-22
+
+    # Streaming export: rows fetched per server-side cursor batch (and per response chunk)
+    NOTES_EXPORT_BATCH_SIZE = int(os.getenv('NOTES_EXPORT_BATCH_SIZE', 1000))
+
+    # Streaming import: rows per INSERT/commit and how many record errors to report back
+    NOTES_IMPORT_BATCH_SIZE = int(os.getenv('NOTES_IMPORT_BATCH_SIZE', 5000))
+    NOTES_IMPORT_MAX_ERRORS = int(os.getenv('NOTES_IMPORT_MAX_ERRORS', 100))
+
+    # Password hashing (runs in a bounded process pool; see passwords.py)
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt')  # werkzeug method string, e.g. pbkdf2:sha256:600000
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))  # Pool processes per app worker; 0 hashes inline
+    PASSWORD_HASH_QUEUE_DEPTH = int(os.getenv('PASSWORD_HASH_QUEUE_DEPTH', 16))  # Waiting jobs allowed before 503s
+    PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', 10))  # Seconds before a queued job gives up
+
+    # Notes deleted per transaction when an admin deletes a user (bounds lock time)
+    USER_DELETE_CHUNK_SIZE = int(os.getenv('USER_DELETE_CHUNK_SIZE', 1000))
+
+    # Request/SQL metrics exposed at /metrics (Prometheus text format)
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 200))  # Statements slower than this are logged
+    N_PLUS_ONE_THRESHOLD = int(os.getenv('N_PLUS_ONE_THRESHOLD', 10))  # Same statement this often in one request is flagged
@@ -0,0 +1,177 @@
+import time
+from flask import has_app_context
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from models import db
+from metrics import metrics
+from replicas import replica_router
+
+# Engine and connection pool configuration.
+# Pool sizing, pre-ping and recycle come from the DB_* settings. SQLite
+# connections get their pragmas (WAL, synchronous, mmap, busy timeout,
+# foreign keys) as they are opened. DB_STATEMENT_TIMEOUT_MS caps each
+# statement: PostgreSQL enforces it server-side, on SQLite a progress handler
+# interrupts statements that run past their deadline. The ASGI mode's async
+# engine (see aio.py) gets the same pool settings and pragmas.
+
+SQLITE_JOURNAL_MODES = ('DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF')
+SQLITE_SYNCHRONOUS_MODES = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+SQLITE_PROGRESS_STEPS = 10000  # VM instructions between deadline checks
+
+
+# Async driver of each supported backend, for the ASGI mode
+ASYNC_DRIVERS = {'sqlite': 'sqlite+aiosqlite', 'postgresql': 'postgresql+asyncpg'}
+
+
+def _observe_pool_wait(start):
+    # Checkouts outside an app context have no app metrics to report to
+    if has_app_context():
+        metrics.pool_wait.observe(time.perf_counter() - start)
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that reports how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            _observe_pool_wait(start)
+
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """The async engine's pool, reporting checkout waits like TimedQueuePool."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            _observe_pool_wait(start)
+
+
+def _is_memory_sqlite(url):
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def engine_options(config, url):
+    """Engine options for a database URL under the configured DB_* settings."""
+    url = make_url(url)
+    if _is_memory_sqlite(url):
+        # In-memory SQLite lives in a single connection; Flask-SQLAlchemy pools it itself
+        return {}
+
+    options = {
+        'poolclass': TimedQueuePool,
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+    }
+    if url.get_backend_name() != 'sqlite':
+        options['pool_pre_ping'] = config['DB_POOL_PRE_PING']
+        options['pool_recycle'] = config['DB_POOL_RECYCLE']
+    if url.get_backend_name() == 'postgresql' and config['DB_STATEMENT_TIMEOUT_MS'] > 0:
+        options['connect_args'] = {'options': f"-c statement_timeout={config['DB_STATEMENT_TIMEOUT_MS']}"}
+    return options
+
+
+def async_engine_url(url):
+    """The database URL with its backend's async driver (sqlite+aiosqlite, postgresql+asyncpg)."""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise RuntimeError(f'The ASGI mode supports SQLite and PostgreSQL databases, not {backend}.')
+    if _is_memory_sqlite(url):
+        raise RuntimeError('The ASGI mode needs a file or server database; in-memory SQLite is private to one engine.')
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+def async_engine_options(config, url):
+    """engine_options() for the async engine of the same database."""
+    options = engine_options(config, url)
+    options['poolclass'] = TimedAsyncQueuePool
+    if 'connect_args' in options:
+        # asyncpg takes server settings directly rather than a libpq options string
+        options['connect_args'] = {'server_settings': {'statement_timeout': str(config['DB_STATEMENT_TIMEOUT_MS'])}}
+    return options
+
+
+def _sqlite_pragmas(config):
+    journal_mode = config['SQLITE_JOURNAL_MODE'].upper()
+    synchronous = config['SQLITE_SYNCHRONOUS'].upper()
+    if journal_mode not in SQLITE_JOURNAL_MODES:
+        raise RuntimeError(f'Unknown SQLITE_JOURNAL_MODE {journal_mode!r}. Use one of {", ".join(SQLITE_JOURNAL_MODES)}.')
+    if synchronous not in SQLITE_SYNCHRONOUS_MODES:
+        raise RuntimeError(f'Unknown SQLITE_SYNCHRONOUS {synchronous!r}. Use one of {", ".join(SQLITE_SYNCHRONOUS_MODES)}.')
+    return [
+        f'PRAGMA journal_mode={journal_mode}',
+        f'PRAGMA synchronous={synchronous}',
+        f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE'])}",
+        f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+        f"PRAGMA foreign_keys={'ON' if config['SQLITE_FOREIGN_KEYS'] else 'OFF'}",
+    ]
+
+
+def configure_engine(engine, config, name='primary'):
+    """
+    Installs connection hooks and metrics on an engine created from
+    engine_options(). Needs the app context of the app the engine serves.
+    """
+    metrics.watch_engine(name, engine)
+    if engine.dialect.name != 'sqlite':
+        return
+
+    pragmas = _sqlite_pragmas(config)
+    timeout = config['DB_STATEMENT_TIMEOUT_MS'] / 1000
+
+    @event.listens_for(engine, 'connect')
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+        # aiosqlite connections have no progress handler; their statements are not interrupted
+        if timeout > 0 and hasattr(dbapi_connection, 'set_progress_handler'):
+            info = connection_record.info
+            dbapi_connection.set_progress_handler(
+                lambda: info.get('deadline', float('inf')) < time.monotonic(), SQLITE_PROGRESS_STEPS
+            )
+
+    if timeout > 0:
+        # The deadline covers executing a statement, not streaming its rows afterwards
+        @event.listens_for(engine, 'before_cursor_execute')
+        def start_deadline(conn, cursor, statement, parameters, context, executemany):
+            conn.info['deadline'] = time.monotonic() + timeout
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def clear_deadline(conn, cursor, statement, parameters, context, executemany):
+            conn.info.pop('deadline', None)
+
+        @event.listens_for(engine, 'handle_error')
+        def clear_deadline_on_error(context):
+            if context.connection is not None:
+                context.connection.info.pop('deadline', None)
+
+
+def init_database(app):
+    """
+    Initializes db for the app with the configured engine options and hooks.
+    Each of DATABASE_REPLICA_URLS becomes a bind (replica0, replica1, ...)
+    used by the replica router for reads.
+    """
+    app.config.setdefault(
+        'SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config, app.config['SQLALCHEMY_DATABASE_URI'])
+    )
+    replica_keys = []
+    for i, url in enumerate(app.config['DATABASE_REPLICA_URLS']):
+        replica_keys.append(f'replica{i}')
+        app.config.setdefault('SQLALCHEMY_BINDS', {})[f'replica{i}'] = {'url': url, **engine_options(app.config, url)}
+
+    db.init_app(app)
+    with app.app_context():
+        configure_engine(db.engine, app.config)
+        for key in replica_keys:
+            configure_engine(db.engines[key], app.config, name=key)
+        replica_router.init_app(app, [db.engines[key] for key in replica_keys])
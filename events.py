@@ -0,0 +1,186 @@
+import asyncio
+import json
+import threading
+import time
+from collections import deque, namedtuple
+from datetime import datetime
+from cache import connect_redis
+from params import encode_cursor
+from extensions import AppExtension
+
+# Live note change events for the SSE feed (GET /api/v1/notes/stream).
+# Views publish events once their changes are committed; an in-process bus
+# fans them out to the user's open streams in this worker. With
+# EVENTS_BACKEND=redis they travel over Redis pub/sub instead, so streams
+# held by any gunicorn worker see changes made through every other one.
+# Event ids are change tokens, interchangeable with /changes next_token, so a
+# stream can resume (Last-Event-ID) or catch up from the database.
+
+CHANNEL_PREFIX = 'notes-events:'
+
+# id: change token, kind: created | updated | archived | unarchived | deleted,
+# data: JSON payload, position: (change_seq, note id, updated_at) the token encodes
+Event = namedtuple('Event', ['id', 'kind', 'data', 'position'])
+
+
+def change_position(change_seq, note_id, updated_at):
+    """The (change_seq, id, updated_at) key of a change; change tokens encode it."""
+    return (change_seq or 0, note_id, updated_at)
+
+
+def change_token(position):
+    return encode_cursor(position[0], position[1], position[2].isoformat())
+
+
+def note_event(kind, position, note=None):
+    """Event for a committed change at position; note is the serialized note, None for deletions."""
+    data = {'note': note} if note is not None else {'id': position[1]}
+    return Event(change_token(position), kind, json.dumps(data, sort_keys=True, separators=(',', ':')), position)
+
+
+class Subscription:
+    """
+    One open stream's buffer of at most max_events events. A consumer that
+    falls further behind loses the backlog and is flagged as overflowed, so
+    it catches up from the database instead of holding events in memory.
+    Streams served on an event loop (ASGI mode) pass it as loop and wait
+    with take_async.
+    """
+
+    def __init__(self, user_id, max_events, loop=None):
+        self.user_id = user_id
+        self.max_events = max_events
+        self._events = deque()
+        self._overflowed = False
+        self._ready = threading.Condition()
+        self._loop = loop
+        self._wakeup = asyncio.Event() if loop is not None else None
+
+    def put(self, events):
+        with self._ready:
+            if len(self._events) + len(events) > self.max_events:
+                self._events.clear()
+                self._overflowed = True
+            else:
+                self._events.extend(events)
+            self._ready.notify()
+        if self._loop is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._wakeup.set)
+            except RuntimeError:
+                pass  # The loop has shut down along with the stream
+
+    def take(self, timeout):
+        """Waits up to timeout seconds; returns (events, overflowed) and empties the buffer."""
+        with self._ready:
+            if not self._events and not self._overflowed:
+                self._ready.wait(timeout)
+            return self._drain()
+
+    async def take_async(self, timeout):
+        """take() without blocking the event loop."""
+        self._wakeup.clear()
+        with self._ready:
+            waiting = not self._events and not self._overflowed
+        if waiting:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        with self._ready:
+            return self._drain()
+
+    def _drain(self):
+        events = list(self._events)
+        self._events.clear()
+        overflowed, self._overflowed = self._overflowed, False
+        return events, overflowed
+
+
+class NoteEvents:
+    """Configured from EVENTS_BACKEND (memory | redis), EVENTS_REDIS_URL and EVENTS_BUFFER_SIZE."""
+
+    def __init__(self):
+        self.buffer_size = 1000
+        self._subscribers = {}
+        self._streams = 0
+        self._lock = threading.Lock()
+        self._client = None
+        self._listener = None
+
+    def init_app(self, app):
+        backend = app.config['EVENTS_BACKEND']
+        self.buffer_size = app.config['EVENTS_BUFFER_SIZE']
+        if backend == 'redis':
+            self._client = connect_redis(app.config['EVENTS_REDIS_URL'])
+        elif backend != 'memory':
+            raise RuntimeError(f'Unknown EVENTS_BACKEND {backend!r}. Use memory or redis.')
+
+    def subscribe(self, user_id, loop=None, max_streams=None):
+        """A new Subscription, or None if max_streams subscriptions are already open in this process."""
+        if self._client is not None:
+            self._start_listener()
+        subscription = Subscription(str(user_id), self.buffer_size, loop)
+        with self._lock:
+            if max_streams is not None and self._streams >= max_streams:
+                return None
+            self._streams += 1
+            self._subscribers.setdefault(subscription.user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscribers.get(subscription.user_id)
+            if subscriptions and subscription in subscriptions:
+                self._streams -= 1
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscribers[subscription.user_id]
+
+    def publish(self, user_id, events):
+        """Sends a committed batch of a user's events to their streams, in one message."""
+        if not events:
+            return
+        if self._client is None:
+            self._deliver(str(user_id), events)
+            return
+        message = json.dumps([[e.id, e.kind, e.data, e.position[0], e.position[1], e.position[2].isoformat()] for e in events])
+        try:
+            self._client.publish(CHANNEL_PREFIX + str(user_id), message)
+        except Exception as e:
+            # The change is committed either way; streams pick it up when they resume
+            print(f"Error publishing note events: {e}")
+
+    def _deliver(self, user_id, events):
+        with self._lock:
+            subscriptions = list(self._subscribers.get(user_id, ()))
+        for subscription in subscriptions:
+            subscription.put(events)
+
+    def _start_listener(self):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name='note-events', daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        """Relays every user's events from Redis to this worker's streams."""
+        while True:
+            try:
+                pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(CHANNEL_PREFIX + '*')
+                for message in pubsub.listen():
+                    if message['type'] != 'pmessage':
+                        continue
+                    user_id = message['channel'].decode()[len(CHANNEL_PREFIX):]
+                    events = [
+                        Event(event_id, kind, data, (change_seq, note_id, datetime.fromisoformat(updated_at)))
+                        for event_id, kind, data, change_seq, note_id, updated_at in json.loads(message['data'])
+                    ]
+                    self._deliver(user_id, events)
+            except Exception as e:
+                print(f"Error in note event listener: {e}")
+                time.sleep(1)
+
+
+note_events = AppExtension('note_events', NoteEvents)
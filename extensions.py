@@ -0,0 +1,32 @@
+from flask import current_app
+
+# Per-app extension state.
+# Modules expose their extension as a handle (response_cache, password_hasher,
+# note_events, ...) so call sites stay `response_cache.get(...)`. Each
+# create_app() builds fresh instances kept in app.extensions, and the handle
+# forwards to the current app's, so two apps in one process (tests, CLI
+# commands, benchmarks) never share configuration, pools, caches or hooks.
+
+
+class AppExtension:
+    """Handle to the current app's instance of an extension, created by init_app()."""
+
+    def __init__(self, name, factory):
+        self._name = name
+        self._factory = factory
+
+    def init_app(self, app, *args):
+        """Builds and configures the app's own instance, and returns it."""
+        instance = app.extensions[self._name] = self._factory()
+        instance.init_app(app, *args)
+        return instance
+
+    def _get_current_object(self):
+        """The instance itself, for code that outlives the app context (threads, close callbacks)."""
+        try:
+            return current_app.extensions[self._name]
+        except KeyError:
+            raise RuntimeError(f'{self._name} is not initialized for this app; call init_app() first.') from None
+
+    def __getattr__(self, attr):
+        return getattr(self._get_current_object(), attr)
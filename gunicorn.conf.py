@@ -0,0 +1,9 @@
+# Gunicorn settings, read from the working directory by
+# gunicorn --worker-class gthread --threads 8 app:app (see procfile).
+
+
+def post_worker_init(worker):
+    # Background jobs start in each worker once it has loaded the app, never
+    # on import, so the master, CLI commands and tests don't run them
+    from tombstones import start_compaction_job
+    start_compaction_job(worker.wsgi)
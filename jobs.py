@@ -0,0 +1,41 @@
+import threading
+from models import db, Job
+
+# Background jobs for long admin operations.
+# The job row lives in the database so whichever worker serves the status
+# request can report progress; the work itself runs in a daemon thread of the
+# worker that accepted it.
+
+
+def start_job(app, kind, target_id, work):
+    """
+    Records a pending job and runs work(job) in a background thread.
+    work should update job.progress/job.total and commit as it goes.
+    """
+    job = Job(kind=kind, target_id=target_id)
+    db.session.add(job)
+    db.session.commit()
+
+    thread = threading.Thread(target=_run, args=(app, job.id, work), name=f'job-{job.id}', daemon=True)
+    thread.start()
+    return job
+
+
+def _run(app, job_id, work):
+    with app.app_context():
+        try:
+            job = db.session.get(Job, job_id)
+            job.status = 'running'
+            db.session.commit()
+            work(job)
+            job.status = 'done'
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error in background job {job_id}: {e}")
+            job = db.session.get(Job, job_id)
+            job.status = 'failed'
+            job.error = str(e)
+            db.session.commit()
+        finally:
+            db.session.remove()
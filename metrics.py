@@ -0,0 +1,253 @@
+import bisect
+import threading
+import time
+from flask import Response, g, request, has_request_context
+from sqlalchemy import event
+from extensions import AppExtension
+
+# Request and SQL instrumentation with a Prometheus text endpoint.
+# Every request records its latency, body sizes and the number and total time
+# of the SQL statements it ran (collected through engine events). Statements
+# slower than SLOW_QUERY_MS are logged, and a request that runs the same
+# statement N_PLUS_ONE_THRESHOLD times or more is flagged as a likely N+1.
+# Metrics live in process memory, so each gunicorn worker reports its own.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label values; cheap to observe under a lock."""
+
+    def __init__(self, name, help_text, label_names, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+        for labels, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = _format_labels(self.label_names, labels, f'le="{bound}"')
+                lines.append(f'{self.name}_bucket{le} {cumulative}')
+            le = _format_labels(self.label_names, labels, 'le="+Inf"')
+            lines.append(f'{self.name}_bucket{le} {series[-1]}')
+            lines.append(f'{self.name}_sum{_format_labels(self.label_names, labels)} {series[-2]}')
+            lines.append(f'{self.name}_count{_format_labels(self.label_names, labels)} {series[-1]}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            snapshot = dict(self._values)
+        for labels, value in sorted(snapshot.items()):
+            lines.append(f'{self.name}{_format_labels(self.label_names, labels)} {value}')
+        return lines
+
+
+class Gauge:
+    """Values read from a callback at scrape time; callback returns {label values: value}."""
+
+    def __init__(self, name, help_text, label_names, callback):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.callback = callback
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} gauge']
+        for labels, value in sorted(self.callback().items()):
+            lines.append(f'{self.name}{_format_labels(self.label_names, labels)} {value}')
+        return lines
+
+
+class Metrics:
+    """
+    Configured from the app config: METRICS_ENABLED, SLOW_QUERY_MS and
+    N_PLUS_ONE_THRESHOLD. Exposes everything at GET /metrics.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.slow_query_seconds = 0.2
+        self.n_plus_one_threshold = 10
+        self._collectors = []
+        self._engines = {}
+
+        self.request_latency = self._register(Histogram(
+            'http_request_duration_seconds', 'Time spent handling a request.',
+            ('method', 'endpoint', 'status'), LATENCY_BUCKETS))
+        self.request_size = self._register(Histogram(
+            'http_request_size_bytes', 'Request body size.', ('endpoint',), SIZE_BUCKETS))
+        self.response_size = self._register(Histogram(
+            'http_response_size_bytes', 'Response body size (streamed bodies are not counted).',
+            ('endpoint',), SIZE_BUCKETS))
+        self.request_queries = self._register(Histogram(
+            'db_queries_per_request', 'SQL statements executed per request.',
+            ('endpoint',), QUERY_COUNT_BUCKETS))
+        self.request_query_time = self._register(Histogram(
+            'db_query_seconds_per_request', 'Total SQL time per request.', ('endpoint',), LATENCY_BUCKETS))
+        self.query_latency = self._register(Histogram(
+            'db_query_duration_seconds', 'Time spent executing a single SQL statement.', (), LATENCY_BUCKETS))
+        self.slow_queries = self._register(Counter(
+            'db_slow_queries_total', 'SQL statements slower than SLOW_QUERY_MS.', ('endpoint',)))
+        self.n_plus_one = self._register(Counter(
+            'db_n_plus_one_total', 'Requests that repeated one statement N_PLUS_ONE_THRESHOLD times or more.',
+            ('endpoint',)))
+        self.pool_wait = self._register(Histogram(
+            'db_pool_checkout_wait_seconds', 'Time spent waiting for a pooled connection.', (), LATENCY_BUCKETS))
+        self._register(Gauge(
+            'db_pool_connections', 'Pooled connections by state; capacity is pool size plus max overflow.',
+            ('pool', 'state'), self._pool_states))
+        self._register(Gauge(
+            'db_pool_saturation', 'Checked-out connections as a fraction of capacity.',
+            ('pool',), self._pool_saturation))
+
+    def _register(self, collector):
+        self._collectors.append(collector)
+        return collector
+
+    def init_app(self, app):
+        self.enabled = app.config['METRICS_ENABLED']
+        self.slow_query_seconds = app.config['SLOW_QUERY_MS'] / 1000
+        self.n_plus_one_threshold = app.config['N_PLUS_ONE_THRESHOLD']
+        if not self.enabled:
+            return
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.add_url_rule('/metrics', 'metrics', self.render_response)
+
+    # Engines and connection pools
+
+    def watch_engine(self, name, engine):
+        """Times the engine's statements and reports its pool's usage under name (e.g. primary)."""
+        self._engines[name] = engine
+        if self.enabled:
+            # Hooked per engine, so another app's engines report to that app's metrics
+            event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def _pool_states(self):
+        states = {}
+        for name, engine in self._engines.items():
+            pool = engine.pool  # Replaced when the engine is disposed
+            if not hasattr(pool, 'checkedout'):
+                continue  # Pools without size limits (in-memory SQLite)
+            states[(name, 'checked_out')] = pool.checkedout()
+            states[(name, 'idle')] = pool.checkedin()
+            states[(name, 'capacity')] = pool.size() + max(pool._max_overflow, 0)
+        return states
+
+    def _pool_saturation(self):
+        states = self._pool_states()
+        return {
+            (name,): states[(name, 'checked_out')] / states[(name, 'capacity')]
+            for (name, state) in states if state == 'capacity' and states[(name, 'capacity')]
+        }
+
+    # Request hooks
+
+    def _before_request(self):
+        g.metrics_start = time.perf_counter()
+        g.metrics_queries = 0
+        g.metrics_query_time = 0.0
+        g.metrics_statements = {}
+
+    def _after_request(self, response):
+        start = g.get('metrics_start')
+        if start is None:
+            return response
+        endpoint = request.endpoint or 'unmatched'
+        self.request_latency.observe(time.perf_counter() - start, request.method, endpoint, response.status_code)
+        self.request_size.observe(request.content_length or 0, endpoint)
+        if not response.is_streamed:
+            self.response_size.observe(response.calculate_content_length() or 0, endpoint)
+        self.request_queries.observe(g.metrics_queries, endpoint)
+        self.request_query_time.observe(g.metrics_query_time, endpoint)
+        return response
+
+    # SQL hooks
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info['metrics_start'] = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['metrics_start']
+        self.query_latency.observe(elapsed)
+
+        in_request = has_request_context() and 'metrics_start' in g
+        endpoint = (request.endpoint or 'unmatched') if in_request else 'background'
+
+        if elapsed >= self.slow_query_seconds:
+            self.slow_queries.inc(endpoint)
+            print(f"Slow query ({elapsed * 1000:.1f} ms, {endpoint}): {' '.join(statement.split())[:500]}")
+
+        if not in_request:
+            return
+        g.metrics_queries += 1
+        g.metrics_query_time += elapsed
+        # Statements are parameterized, so a loop of per-row lookups repeats the same text
+        repeats = g.metrics_statements.get(statement, 0) + 1
+        g.metrics_statements[statement] = repeats
+        if repeats == self.n_plus_one_threshold:
+            self.n_plus_one.inc(endpoint)
+            print(f"Possible N+1 in {endpoint}: statement ran {repeats} times: "
+                  f"{' '.join(statement.split())[:200]}")
+
+    # Exposition
+
+    def render(self):
+        lines = []
+        for collector in self._collectors:
+            lines.extend(collector.render())
+        return '\n'.join(lines) + '\n'
+
+    def render_response(self):
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
+
+
+metrics = AppExtension('metrics', Metrics)
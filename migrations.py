@@ -0,0 +1,97 @@
+from blobs import blob_codec
+from models import db, Note, NoteBlob
+from search import install_search_index
+
+
+def _add_missing_columns():
+    """
+    Adds model columns that are absent from existing tables.
+    Only nullable columns can be added this way; anything stricter needs a
+    hand-written step. Existing rows get the column's scalar default, if any.
+    """
+    inspector = db.inspect(db.engine)
+    dialect = db.engine.dialect
+
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable:
+                raise RuntimeError(f'Cannot add NOT NULL column {table.name}.{column.name} automatically')
+            column_type = column.type.compile(dialect=dialect)
+            with db.engine.begin() as conn:
+                conn.execute(db.text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                if column.default is not None and column.default.is_scalar:
+                    conn.execute(table.update().values({column.name: column.default.arg}))
+
+
+def upgrade_schema():
+    """
+    Brings an existing database up to date with the models.
+    db.create_all() only creates missing tables, so columns and indexes
+    declared after a table already exists (e.g. on the production database)
+    are added here. Every step is idempotent and safe to run on each deploy.
+    """
+    _add_missing_columns()
+
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
+
+    # Full-text search index (FTS5 table or tsvector column, per dialect)
+    install_search_index(db.engine)
+
+
+def migrate():
+    """
+    Creates missing tables, then upgrades existing ones (the init-db command).
+    Only the primary is migrated; replicas receive the schema by replication.
+    """
+    db.create_all(bind_key=None)
+    upgrade_schema()
+
+
+def compress_large_notes(batch_size):
+    """
+    Moves the bodies of existing notes of NOTE_BLOB_THRESHOLD characters or
+    more into compressed blobs, batch_size notes per transaction (the
+    compress-notes command). updated_at is left alone: the notes read the
+    same, so sync clients and cached validators are unaffected. Safe to
+    rerun or interrupt. Returns how many notes were converted.
+    """
+    if not blob_codec.threshold:
+        return 0
+
+    notes = Note.__table__
+    convert = (
+        db.update(notes)
+        .where(notes.c.id == db.bindparam('note_id'))
+        .values(content=db.bindparam('inline'), content_blob=db.bindparam('digest'), updated_at=notes.c.updated_at)
+    )
+    converted = after_id = 0
+
+    while True:
+        rows = db.session.execute(
+            db.select(Note.id, Note.content_inline)
+            .where(
+                Note.id > after_id, Note.content_blob.is_(None),
+                db.func.length(Note.content_inline) >= blob_codec.threshold
+            )
+            .order_by(Note.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        params = []
+        for row in rows:
+            inline, digest = NoteBlob.store(row.content_inline)
+            params.append({'note_id': row.id, 'inline': inline, 'digest': digest})
+        db.session.execute(convert, params)
+        db.session.commit()
+        converted += len(rows)
+        after_id = rows[-1].id
+
+    return converted
@@ -1,9 +1,15 @@
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.hybrid import hybrid_property
+from blobs import blob_codec
+from passwords import password_hasher
+from serializers import RowSerializer
+from replicas import RoutingSession
 
-# Initialize SQLAlchemy instance globally
-db = SQLAlchemy()
+# Initialize SQLAlchemy instance globally; the session routes reads to replicas when configured
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 
 class User(db.Model):
@@ -16,52 +22,213 @@ class User(db.Model):
 
     #indicates if the user has admin privileges
     is_admin = db.Column(db.Boolean, default=False)
+
+    # Last change sequence number handed to the user's notes (see next_change_seq)
+    change_seq = db.Column(db.Integer, default=0)
     
     # Establish one-to-many relationship with Note table
     notes = db.relationship(
         'Note',
         backref='owner',             # Enables note.owner to access related user
         lazy=True,                   # Loads related objects only when accessed (performance optimization)
-        cascade='all, delete-orphan' # Ensures notes are deleted if user is deleted
+        cascade='all, delete-orphan', # Ensures notes are deleted if user is deleted
+        passive_deletes=True         # Leaves that to ON DELETE CASCADE instead of loading every note
     )
 
     # Utility Methods 
     def set_password(self, password):
         """Hashes the password before storing it."""
-        self.password = generate_password_hash(password)
+        self.password = password_hasher.hash(password)
 
     def check_password(self, password):
         """Verifies password against stored hash."""
-        return check_password_hash(self.password, password)
+        return password_hasher.verify(self.password, password)
 
     def to_dict(self):
         """Serializes the user object into a dictionary."""
-        return {
-            'id': self.id,
-            'username': self.username,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+        return user_serializer.dump(self)
 
 
 class Note(db.Model):
     __tablename__ = 'notes'  # Explicitly named for clarity and maintainability
+    __table_args__ = (
+        # Keyset pagination walks (created_at, id) within a single user's notes,
+        # so each page is an index range scan instead of an OFFSET skip
+        db.Index('ix_notes_user_created', 'user_id', 'created_at', 'id'),
+        db.Index('ix_notes_user_archived_created', 'user_id', 'archived', 'created_at', 'id'),
+        # Delta sync walks (change_seq, id) to find everything changed since a token
+        db.Index('ix_notes_user_change', 'user_id', 'change_seq', 'id'),
+        # Listing validators read the newest updated_at
+        db.Index('ix_notes_user_updated', 'user_id', 'updated_at', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(120), nullable=False)
-    content = db.Column(db.Text, nullable=False)
+    # Whole body, or only its first NOTE_BLOB_PREFIX characters when it lives in a blob (see blobs.py)
+    content_inline = db.Column('content', db.Text, nullable=False)
+    content_blob = db.Column(db.String(64), db.ForeignKey('note_blobs.hash'), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     archived = db.Column(db.Boolean, default=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)  # Matches 'users' table name
+    deleted_at = db.Column(db.DateTime, nullable=True)  # Tombstone: set instead of deleting so clients can sync deletions
+    change_seq = db.Column(db.Integer, default=0)  # Owner's change sequence number of the last write; the delta sync cursor
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)  # Matches 'users' table name
+
+    @hybrid_property
+    def content(self):
+        """The note body; a blob is fetched and decompressed on first access."""
+        if self.content_blob is None:
+            return self.content_inline
+        cached = self.__dict__.get('_content_cache')
+        if cached is None or cached[0] != self.content_blob:
+            blob = db.session.get(NoteBlob, self.content_blob)
+            cached = self._content_cache = (self.content_blob, blob_codec.decode(blob.data))
+        return cached[1]
+
+    @content.setter
+    def content(self, value):
+        self.content_inline, self.content_blob = NoteBlob.store(value)
+        if self.content_blob is not None:
+            self._content_cache = (self.content_blob, value)
+
+    @content.expression
+    def content(cls):
+        # SQL sees the inline text: the whole body, or the prefix of a large one
+        return cls.content_inline
+
+    @content.inplace.bulk_dml
+    @classmethod
+    def _content_bulk_dml(cls, mapping, value):
+        # Parameter dicts of bulk insert(Note) / update(Note) statements
+        mapping['content_inline'], mapping['content_blob'] = NoteBlob.store(value)
+
+    @classmethod
+    def live(cls):
+        """Query over notes that have not been deleted (tombstones excluded)."""
+        return cls.query.filter(cls.deleted_at.is_(None))
+
+    def mark_deleted(self):
+        """
+        Turns the note into a tombstone. The row is kept, with its body cleared,
+        so sync clients learn about the deletion; compaction purges it later.
+        """
+        now = datetime.utcnow()
+        self.title = ''
+        self.content = ''
+        self.deleted_at = now
+        self.updated_at = now
+
+    def to_dict(self):
+        """Serializes the note object into a dictionary, including its owner."""
+        return note_record_serializer.dump(self)
+
+
+class NoteBlob(db.Model):
+    __tablename__ = 'note_blobs'  # Compressed large note bodies, shared by every note with the same text
+
+    hash = db.Column(db.String(64), primary_key=True)  # sha256 of the UTF-8 text
+    data = db.Column(db.LargeBinary, nullable=False)  # zlib or zstd, told apart by magic bytes
+    size = db.Column(db.Integer, nullable=False)  # Stored (compressed) bytes, for storage stats
+    stored_at = db.Column(db.DateTime, default=datetime.utcnow)  # Refreshed on reuse; orphans are purged after a grace period
+
+    @classmethod
+    def store(cls, text):
+        """
+        Splits a note body into (inline text, blob hash). A large body is
+        compressed and inserted as a blob unless one with its hash exists
+        already; smaller bodies stay inline with no hash.
+        """
+        if not blob_codec.stores(text):
+            return text, None
+
+        digest, data = blob_codec.encode(text)
+        now = datetime.utcnow()
+        values = {'hash': digest, 'data': data, 'size': len(data), 'stored_at': now}
+        dialect = db.engine.dialect.name
+        if dialect in ('sqlite', 'postgresql'):
+            insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+            db.session.execute(
+                insert(cls).values(values).on_conflict_do_update(index_elements=[cls.hash], set_={'stored_at': now})
+            )
+        elif db.session.get(cls, digest) is None:
+            db.session.execute(db.insert(cls).values(values))
+        else:
+            db.session.execute(db.update(cls).where(cls.hash == digest).values(stored_at=now))
+        return text[:blob_codec.prefix], digest
+
+
+def next_change_seq(user_id, session=None):
+    """
+    Bumps the user's change counter and returns the new value; every note the
+    current transaction writes is stamped with it. The UPDATE holds the
+    user's row lock until commit, so writers of one user's notes commit in
+    sequence order and a reader that sees number n has seen every change
+    before it. updated_at, assigned by the app before commit, can't promise
+    that, so it only decides how old a change token is.
+    """
+    session = session or db.session
+    users = User.__table__
+    bump = (
+        users.update().where(users.c.id == user_id)
+        .values(change_seq=db.func.coalesce(users.c.change_seq, 0) + 1)
+    )
+    if db.engine.dialect.update_returning:
+        return session.execute(bump.returning(users.c.change_seq)).scalar_one()
+    session.execute(bump)
+    return session.execute(db.select(users.c.change_seq).where(users.c.id == user_id)).scalar_one()
+
+
+@event.listens_for(RoutingSession, 'before_flush')
+def _stamp_change_seq(session, flush_context, instances):
+    """Gives the notes written by a flush their owner's next change sequence number."""
+    written = {}
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Note) and obj.user_id is not None and (obj in session.new or session.is_modified(obj)):
+            written.setdefault(int(obj.user_id), []).append(obj)
+    for user_id, notes in written.items():
+        seq = next_change_seq(user_id, session)
+        for note in notes:
+            note.change_seq = seq
+
+
+def _decode_content(inline, data):
+    return inline if data is None else blob_codec.decode(data)
+
+
+# Serializers for the public fields (see serializers.py); content is read from its blob when there is one
+user_serializer = RowSerializer(User, ('id', 'username', 'created_at'))
+note_serializer = RowSerializer(
+    Note, ('id', 'title', 'content', 'created_at', 'updated_at', 'archived'),
+    decoders={'content': (
+        db.select(NoteBlob.data).where(NoteBlob.hash == Note.content_blob).scalar_subquery(), _decode_content
+    )}
+)
+note_record_serializer = RowSerializer(Note, note_serializer.fields + ('user_id',), decoders=note_serializer.decoders)  # Admin views also show the owner
+
+
+class Job(db.Model):
+    __tablename__ = 'jobs'  # Background admin jobs, stored so any worker can report progress
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    target_id = db.Column(db.Integer)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending | running | done | failed
+    progress = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     def to_dict(self):
-        """Serializes the note object into a dictionary."""
+        """Serializes the job object into a dictionary."""
         return {
             'id': self.id,
-            'title': self.title,
-            'content': self.content,
+            'kind': self.kind,
+            'target_id': self.target_id,
+            'status': self.status,
+            'progress': self.progress,
+            'total': self.total,
+            'error': self.error,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'archived': self.archived,
-            'user_id': self.user_id
-        }
\ No newline at end of file
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
@@ -1,8 +1,22 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import db, Note
+import asyncio
+import hashlib
+import json
+import time
+from collections import namedtuple
+from flask import Blueprint, Response, request, jsonify, current_app, g, stream_with_context
+from sqlalchemy import insert, update
+from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request
+from itsdangerous import BadData, URLSafeTimedSerializer
+from aio import AsyncStreamResponse, async_db, async_view
+from models import db, Note, next_change_seq, note_serializer
+from cache import response_cache
+from compression import compression
+from events import change_position, change_token, note_event, note_events
+from params import encode_cursor, decode_cursor, parse_bool, parse_datetime, parse_limit
+from search import apply_search, keyword_filter, parse_search_terms, reindex_notes, search_backend, substring_filter
+from serializers import RowSerializer, json_response
 from marshmallow import Schema, fields, validate, ValidationError
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 
 #  Blueprint for modular routing
 notes_bp = Blueprint('notes', __name__)
@@ -10,6 +24,11 @@ notes_bp = Blueprint('notes', __name__)
 
 # Schemas for validation and serialization
 
+BATCH_OPERATIONS = ('create', 'update', 'archive', 'unarchive', 'delete')
+
+# Fields of view=summary listings; preview is computed from content in SQL
+SUMMARY_FIELDS = ('id', 'title', 'preview', 'created_at', 'updated_at', 'archived')
+
 class NoteSchema(Schema):
     """Schema for serializing and validating notes."""
     id = fields.Int(dump_only=True)
@@ -26,6 +45,120 @@ class NoteUpdateSchema(Schema):
     content = fields.Str()
 
 
+class BatchOperationSchema(Schema):
+    """Schema for one entry of a batch request; data is validated per op."""
+    op = fields.Str(required=True, validate=validate.OneOf(BATCH_OPERATIONS))
+    id = fields.Int()
+    data = fields.Dict()
+
+
+class BatchSchema(Schema):
+    """Schema for the batch request envelope."""
+    mode = fields.Str(load_default='atomic', validate=validate.OneOf(['atomic', 'partial']))
+    operations = fields.List(fields.Nested(BatchOperationSchema), required=True)
+
+
+
+# Conditional Requests (ETag / Last-Modified)
+
+def _as_utc(value):
+    """Stored timestamps are naive UTC; HTTP dates need them timezone-aware."""
+    return value.replace(tzinfo=timezone.utc) if value else None
+
+
+def _note_etag(note):
+    """Strong validator for a single note; it changes whenever updated_at does."""
+    return f'n{note.id}-{note.updated_at:%Y%m%d%H%M%S%f}'
+
+
+def _list_validators(current_user_id, args):
+    """
+    Validators for a listing, computed from a cheap aggregate over the user's
+    rows (tombstones included, so deletions count) without loading any notes.
+    The newest change sequence number catches writes whose updated_at is
+    older than one already committed. The query string is part of the ETag
+    since it shapes the response.
+    """
+    latest, change_seq, total = db.session.execute(
+        db.select(db.func.max(Note.updated_at), db.func.max(Note.change_seq), db.func.count())
+        .where(Note.user_id == current_user_id)
+    ).one()
+    watermark = [
+        str(current_user_id),
+        latest.isoformat() if latest else None,
+        change_seq,
+        total,
+        sorted(args.items(multi=True))
+    ]
+    etag = 'l' + hashlib.sha1(json.dumps(watermark).encode()).hexdigest()
+    return etag, latest
+
+
+def _not_modified(etag, last_modified):
+    """Returns a 304 response when the request's validators still match, else None."""
+    if request.if_none_match:
+        matched = request.if_none_match.contains_weak(etag)
+    elif request.if_modified_since and last_modified:
+        # HTTP dates have whole-second precision
+        matched = _as_utc(last_modified).replace(microsecond=0) <= request.if_modified_since
+    else:
+        matched = False
+
+    if not matched:
+        return None
+    return _with_validators(current_app.response_class(status=304), etag, last_modified)
+
+
+def _with_validators(response, etag, last_modified):
+    """Attaches ETag/Last-Modified and asks clients to revalidate before reuse."""
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = _as_utc(last_modified)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def _cached_response(cache_key, body, etag, last_modified, encoding):
+    """
+    Rebuilds a response from a cache entry, honouring conditional headers.
+    A precompressed body is sent as is; a plain one is compressed once by the
+    compression middleware, which stores the result next to it.
+    """
+    if encoding is None:
+        g.response_cache_entry = (cache_key, etag, last_modified)
+    last_modified = datetime.fromisoformat(last_modified) if last_modified else None
+    not_modified = _not_modified(etag, last_modified)
+    if not_modified:
+        return not_modified
+    response = _with_validators(current_app.response_class(body, mimetype='application/json'), etag, last_modified)
+    return compression.encoded(response, encoding, body) if encoding else response
+
+
+def _cache_response(cache_key, response, etag, last_modified):
+    """Stores a rendered response under cache_key (no-op when caching is off)."""
+    if cache_key:
+        last_modified = last_modified.isoformat() if last_modified else None
+        response_cache.set(cache_key, response.get_data(), etag, last_modified)
+        g.response_cache_entry = (cache_key, etag, last_modified)
+
+
+def _note_response(body, note, status=200):
+    """JSON response for a single note, carrying that note's validators."""
+    response = _with_validators(json_response(body), _note_etag(note), note.updated_at)
+    return response, status
+
+
+def _publish(user_id, kind, note):
+    """Sends a committed change of one note to the user's live streams."""
+    position = change_position(note.change_seq, note.id, note.updated_at)
+    if kind == 'deleted':
+        event = note_event(kind, position)
+    else:
+        event = note_event(kind, position, note_serializer.dump(note))
+    note_events.publish(user_id, [event])
+
+
 
 # Create Note
 
@@ -50,56 +183,520 @@ def create_note():
 
     db.session.add(new_note)
     db.session.commit()
+    response_cache.invalidate_user(current_user_id)
+    _publish(current_user_id, 'created', new_note)
 
-    return jsonify({
+    return _note_response({
         'message': 'Note created successfully',
-        'note': schema.dump(new_note)
-    }), 201
+        'note': note_serializer.dump(new_note)
+    }, new_note, 201)
 
 
 
 # Get All Notes (with filters)
 
-@notes_bp.route('/', methods=['GET'])
-@jwt_required()
-def get_notes():
-    """Retrieve all notes for the current user, with optional filters."""
-    current_user_id = get_jwt_identity()
-    query = Note.query.filter_by(user_id=current_user_id)
+def created_between(start=None, end=None):
+    """
+    Half-open range predicate start <= created_at < end on the bare column,
+    so the (user_id, created_at, id) index can seek straight to the range.
+    """
+    clauses = []
+    if start is not None:
+        clauses.append(Note.created_at >= start)
+    if end is not None:
+        clauses.append(Note.created_at < end)
+    return db.and_(*clauses)
 
-    # Optional filters
-    date_filter = request.args.get('date')
-    keyword_filter = request.args.get('keyword')
-    archived_filter = request.args.get('archived')
 
-    # Date filter
+def created_at_filter(args):
+    """
+    Predicate for the date= and from=/to= filters, or None when neither is set.
+    date= is the day's [midnight, next midnight) range; from is inclusive, to exclusive.
+    """
+    clauses = []
+    date_filter = args.get('date')
+    from_filter = args.get('from')
+    to_filter = args.get('to')
+
     if date_filter:
         try:
-            date_obj = datetime.strptime(date_filter, '%Y-%m-%d').date()
-            query = query.filter(db.func.date(Note.created_at) == date_obj)
+            day_start = datetime.strptime(date_filter, '%Y-%m-%d')
         except ValueError:
-            return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD.'}), 400
+            raise ValueError('Invalid date format. Use YYYY-MM-DD.')
+        clauses.append(created_between(day_start, day_start + timedelta(days=1)))
 
-    # Keyword search (case-insensitive)
-    if keyword_filter:
-        query = query.filter(
-            (Note.title.ilike(f'%{keyword_filter}%')) |
-            (Note.content.ilike(f'%{keyword_filter}%'))
-        )
+    if from_filter or to_filter:
+        range_start = parse_datetime(from_filter, 'from') if from_filter else None
+        range_end = parse_datetime(to_filter, 'to') if to_filter else None
+        if range_start and range_end and range_start >= range_end:
+            raise ValueError('Invalid range. from must be earlier than to.')
+        clauses.append(created_between(range_start, range_end))
+
+    return db.and_(*clauses) if clauses else None
+
+
+def filtered_notes_query(current_user_id, args):
+    """
+    Builds the note query for the given user from the request filters.
+    Returns (query, score), where score ranks full-text matches and is None
+    unless a q= search ran against a search index.
+    Raises ValueError with a client-facing message on invalid filters.
+    """
+    query = Note.live().filter_by(user_id=current_user_id)
+    score = None
+
+    # Optional filters
+    keyword = args.get('keyword')
+    search_filter = args.get('q')
+    archived_filter = args.get('archived')
+
+    # Date filter and creation range
+    created_filter = created_at_filter(args)
+    if created_filter is not None:
+        query = query.filter(created_filter)
+
+    # Keyword search (case-insensitive; see search.keyword_filter for large notes)
+    if keyword:
+        query = query.filter(keyword_filter(keyword))
+
+    # Full-text search, ranked when a search index is installed
+    if search_filter is not None:
+        terms = parse_search_terms(search_filter)
+        if not terms:
+            raise ValueError('Invalid search query. Provide at least one word.')
+        if search_backend():
+            query, score = apply_search(query, terms)
+        else:
+            query = query.filter(substring_filter(terms))
 
     # Archive status filter
     if archived_filter is not None:
-        if archived_filter.lower() == 'true':
-            query = query.filter_by(archived=True)
-        elif archived_filter.lower() == 'false':
-            query = query.filter_by(archived=False)
+        query = query.filter_by(archived=parse_bool(archived_filter, 'archived'))
+
+    return query, score
+
+
+def note_projection(args):
+    """
+    Serializer for the view= and fields= parameters of a listing.
+    view=summary swaps content for a preview of its first
+    NOTES_PREVIEW_LENGTH characters, cut in SQL; fields= keeps only the
+    listed fields. Unrequested columns are left out of the SELECT, so large
+    bodies are not read at all. Raises ValueError on unknown values.
+    """
+    view = args.get('view', 'full')
+    if view == 'summary':
+        preview = db.func.substr(Note.content, 1, current_app.config['NOTES_PREVIEW_LENGTH'])
+        serializer = RowSerializer(Note, SUMMARY_FIELDS, {'preview': preview})
+    elif view == 'full':
+        serializer = note_serializer
+    else:
+        raise ValueError('Invalid view. Use full or summary.')
+
+    fields = args.get('fields')
+    if fields is not None:
+        requested = tuple(dict.fromkeys(field.strip() for field in fields.split(',') if field.strip()))
+        if not requested or not set(requested) <= set(serializer.fields):
+            raise ValueError(f'Invalid fields. Use a comma-separated list of: {", ".join(serializer.fields)}.')
+        serializer = serializer.project(requested)
+    return serializer
+
+
+@notes_bp.route('/', methods=['GET'])
+@jwt_required()
+def get_notes():
+    """
+    Retrieve the current user's notes with optional filters.
+    Notes are sorted newest first, or by relevance for q= searches
+    (override with sort=recent|relevance). Results are paginated by keyset:
+    pass the returned next_cursor back as ?cursor= to fetch the next page.
+    Use fields=id,title,... and/or view=summary to get lighter notes.
+    """
+    current_user_id = get_jwt_identity()
+
+    try:
+        query, score = filtered_notes_query(current_user_id, request.args)
+        serializer = note_projection(request.args)
+        limit = parse_limit(request.args.get('limit'))
+
+        sort = request.args.get('sort', 'relevance' if score is not None else 'recent')
+        if sort not in ('recent', 'relevance'):
+            raise ValueError('Invalid sort. Use recent or relevance.')
+        if sort == 'relevance' and 'q' not in request.args:
+            raise ValueError('Sorting by relevance requires a q= search.')
+        # Without a search index, q= falls back to substring matching by recency
+        ranked = sort == 'relevance' and score is not None
+
+        cursor = request.args.get('cursor')
+        if cursor and ranked:
+            after_score, after_id = decode_cursor(cursor, float, int)
+            query = query.filter(db.tuple_(score, Note.id) > (after_score, after_id))
+        elif cursor:
+            created_at, note_id = decode_cursor(cursor, datetime.fromisoformat, int)
+            query = query.filter(
+                db.tuple_(Note.created_at, Note.id) < (created_at, note_id)
+            )
+    except ValueError as err:
+        return jsonify({'error': str(err)}), 400
+
+    # Serve repeated reads straight from the response cache
+    cache_key = None
+    if response_cache.enabled:
+        cache_key = response_cache.key(current_user_id, 'list', request.args.items(multi=True))
+        cached = response_cache.get(cache_key, compression.negotiate())
+        if cached:
+            return _cached_response(cache_key, *cached)
+
+    # Answer polling clients from the aggregate alone when nothing changed
+    etag, last_modified = _list_validators(current_user_id, request.args)
+    not_modified = _not_modified(etag, last_modified)
+    if not_modified:
+        return not_modified
+
+    # Fetch one extra row to learn whether another page exists; rows are
+    # plain column tuples, serialized without building Note objects. The
+    # cursor columns trail the projected ones, whichever fields were asked for.
+    if ranked:
+        rows = (
+            query.with_entities(*serializer.columns, score.label('cursor_score'), Note.id.label('cursor_id'))
+            .order_by(score, Note.id)
+            .limit(limit + 1)
+            .all()
+        )
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = encode_cursor(last.cursor_score, last.cursor_id)
+        else:
+            next_cursor = None
+    else:
+        rows = (
+            query.with_entities(
+                *serializer.columns, Note.created_at.label('cursor_created_at'), Note.id.label('cursor_id')
+            )
+            .order_by(Note.created_at.desc(), Note.id.desc())
+            .limit(limit + 1)
+            .all()
+        )
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = encode_cursor(last.cursor_created_at.isoformat(), last.cursor_id)
+        else:
+            next_cursor = None
+
+    response = json_response({
+        'notes': serializer.rows(rows[:limit]),
+        'next_cursor': next_cursor
+    })
+    _cache_response(cache_key, response, etag, last_modified)
+    return _with_validators(response, etag, last_modified), 200
+
+
+
+# Delta Sync
+
+def _changes_query(user_id, position=None):
+    """
+    A user's changes after position, a (change_seq, id, updated_at)
+    change-token key, in change order with change_seq and deleted_at
+    trailing. Without a position, all live notes.
+    """
+    query = Note.query.filter_by(user_id=user_id)
+    if position:
+        query = query.filter(db.tuple_(Note.change_seq, Note.id) > tuple(position[:2]))
+    else:
+        query = query.filter(Note.deleted_at.is_(None))
+    return (
+        query.with_entities(*note_serializer.columns, Note.change_seq, Note.deleted_at)
+        .order_by(Note.change_seq, Note.id)
+    )
+
+
+def _row_position(row):
+    return change_position(row.change_seq, row.id, row.updated_at)
+
+
+def _decode_change_token(token):
+    """
+    (change_seq, id, updated_at) of a change token; raises ValueError when
+    malformed. Tokens from before change sequence numbers, (updated_at, id),
+    start before every sequence number, so they return all changes since.
+    """
+    try:
+        return tuple(decode_cursor(token, int, int, datetime.fromisoformat))
+    except ValueError:
+        updated_at, note_id = decode_cursor(token, datetime.fromisoformat, int)
+        return (-1, note_id, updated_at)
+
+
+def _change_token_expired(updated_at):
+    # Tombstones older than the retention window may already be purged,
+    # so a token that old can no longer describe every deletion
+    retention = timedelta(days=current_app.config['TOMBSTONE_RETENTION_DAYS'])
+    return updated_at < datetime.utcnow() - retention
+
+
+@notes_bp.route('/changes', methods=['GET'])
+@jwt_required()
+def get_changes():
+    """
+    Return notes created, updated, archived or deleted after a change token.
+    Changes are ordered by the per-user change sequence number the database
+    assigns at write time (commit order), then id; deleted notes appear only as ids.
+    Without ?since= the full set of live notes is returned, which is how a
+    client performs its initial sync. Store next_token and send it back as
+    ?since= next time; keep paging while has_more is true.
+    """
+    current_user_id = get_jwt_identity()
+
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        since = request.args.get('since')
+        position = _decode_change_token(since) if since else None
+    except ValueError:
+        return jsonify({'error': 'Invalid change token.'}), 400
+
+    if position and _change_token_expired(position[2]):
+        return jsonify({'error': 'Change token expired. Perform a full sync without since.'}), 410
+
+    rows = _changes_query(current_user_id, position).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    if rows:
+        next_token = change_token(_row_position(rows[-1]))
+    else:
+        next_token = since
+
+    return json_response({
+        'notes': note_serializer.rows(row for row in rows if row.deleted_at is None),
+        'deleted': [row.id for row in rows if row.deleted_at is not None],
+        'next_token': next_token,
+        'has_more': has_more
+    }), 200
+
+
+
+# Live Changes (Server-Sent Events)
+
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no',  # Tell proxies not to buffer the stream
+}
+
+
+# Stream tickets: EventSource cannot send an Authorization header, so clients
+# trade their access token for a ticket that only opens the stream and expires
+# after SSE_TICKET_SECONDS, keeping long-lived tokens out of URLs and logs
+STREAM_TICKET_SALT = 'notes-stream-ticket'
+
+# Retry-After sent when a worker already holds SSE_MAX_STREAMS open streams
+STREAM_BUSY_RETRY_SECONDS = 30
+
+
+def _sse(event):
+    return f'id: {event.id}\nevent: {event.kind}\ndata: {event.data}\n\n'
+
+
+def _stream_tickets():
+    return URLSafeTimedSerializer(current_app.config['JWT_SECRET_KEY'], salt=STREAM_TICKET_SALT)
+
+
+def _stream_user():
+    """The user a stream request is for, from its ?ticket= or Authorization header; None if the ticket is bad."""
+    ticket = request.args.get('ticket')
+    if ticket is None:
+        verify_jwt_in_request()
+        return int(get_jwt_identity())
+    try:
+        return int(_stream_tickets().loads(ticket, max_age=current_app.config['SSE_TICKET_SECONDS']))
+    except BadData:
+        return None
+
+
+def _open_stream(loop=None, max_streams=None):
+    """
+    Authenticates a stream request, reads where it resumes and subscribes it
+    to the user's events. Returns ((user_id, position, subscription), None),
+    or (None, error response) when the request is refused.
+    """
+    user_id = _stream_user()
+    if user_id is None:
+        return None, (jsonify({'error': 'Invalid or expired stream ticket.'}), 401)
+    since = request.headers.get('Last-Event-ID') or request.args.get('since')
+    try:
+        position = _decode_change_token(since) if since else None
+    except ValueError:
+        return None, (jsonify({'error': 'Invalid change token.'}), 400)
+
+    subscription = note_events.subscribe(user_id, loop, max_streams)
+    if subscription is None:
+        response = jsonify({'error': 'Too many open streams. Retry later.'})
+        response.headers['Retry-After'] = str(STREAM_BUSY_RETRY_SECONDS)
+        return None, (response, 503)
+    return (user_id, position, subscription), None
+
+
+def _stream_response(response, subscription):
+    # Unsubscribe once the server closes the response, even if the body never started
+    bus = note_events._get_current_object()
+    response.call_on_close(lambda: bus.unsubscribe(subscription))
+    return response
+
+
+# The stream body is written once, as a generator of frames that does no
+# I/O itself: it yields SSE text, or a request for the driver to carry out
+# and send the result back. _event_stream() drives it on a worker thread
+# and _event_stream_async() on the event loop.
+_Fetch = namedtuple('_Fetch', ['statement'])  # Result: the rows
+_Wait = namedtuple('_Wait', ['timeout'])  # Result: the subscription's (events, overflowed)
+
+
+def _replay_frames(user_id, position, batch_size):
+    """
+    Frames of the user's changes after position, batch_size rows per query;
+    returns the position of the last one. Replayed notes arrive as updated
+    (or deleted) with their current state.
+    """
+    while True:
+        rows = yield _Fetch(_changes_query(user_id, position).limit(batch_size).statement)
+        for row in rows:
+            if row.deleted_at is None:
+                yield _sse(note_event('updated', _row_position(row), note_serializer.row(row)))
+            else:
+                yield _sse(note_event('deleted', _row_position(row)))
+        if len(rows) < batch_size:
+            return _row_position(rows[-1]) if rows else position
+        position = _row_position(rows[-1])
+
+
+def _latest_change(user_id):
+    # Where a stream without a token starts: the user's newest change
+    return (
+        db.select(Note.change_seq, Note.id, Note.updated_at).where(Note.user_id == user_id)
+        .order_by(Note.change_seq.desc(), Note.id.desc()).limit(1)
+    )
+
+
+def _stream_frames(user_id, position, config):
+    """The SSE body: the replay after position (if any), then live events until SSE_MAX_SECONDS."""
+    yield f'retry: {config["SSE_RETRY_MS"]}\n\n'
+    batch_size = config['NOTES_EXPORT_BATCH_SIZE']
+
+    if position is not None and _change_token_expired(position[2]):
+        yield 'event: resync\ndata: {}\n\n'
+        position = None
+    if position is None:
+        # Start at the newest change; an id-only message sets the client's Last-Event-ID
+        latest = yield _Fetch(_latest_change(user_id))
+        if latest:
+            position = _row_position(latest[0])
+            yield f'id: {change_token(position)}\n\n'
+        else:
+            position = change_position(0, 0, datetime.utcnow())  # No notes yet: any change is newer
+    else:
+        position = yield from _replay_frames(user_id, position, batch_size)
+
+    deadline = time.monotonic() + config['SSE_MAX_SECONDS']
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return  # The client reconnects and resumes from its Last-Event-ID
+        events, overflowed = yield _Wait(min(config['SSE_HEARTBEAT_SECONDS'], remaining))
+        if overflowed:
+            # This stream fell too far behind; catch up from the database instead
+            position = yield from _replay_frames(user_id, position, batch_size)
+        for event in events:
+            # Concurrent writers may publish out of order; resume after the newest seen
+            position = max(position, event.position, key=lambda p: p[:2])
+            yield _sse(event)
+        if not events and not overflowed:
+            yield ': keep-alive\n\n'
+
+
+def _event_stream(user_id, position, subscription, config):
+    """Drives _stream_frames() with blocking I/O, releasing the connection after each query."""
+    frames = _stream_frames(user_id, position, config)
+    result = None
+    while True:
+        try:
+            frame = frames.send(result)
+        except StopIteration:
+            return
+        if isinstance(frame, _Fetch):
+            result = db.session.execute(frame.statement).all()
+            db.session.remove()  # An idle stream holds no connection
+        elif isinstance(frame, _Wait):
+            result = subscription.take(frame.timeout)
+        else:
+            result = None
+            yield frame
+
+
+async def _event_stream_async(user_id, position, subscription, config):
+    """_event_stream() on the event loop: waiting for events holds no thread or connection."""
+    frames = _stream_frames(user_id, position, config)
+    result = None
+    while True:
+        try:
+            frame = frames.send(result)
+        except StopIteration:
+            return
+        if isinstance(frame, _Fetch):
+            session = async_db.session
+            result = (await session.execute(frame.statement)).all()
+            await session.close()
+        elif isinstance(frame, _Wait):
+            result = await subscription.take_async(frame.timeout)
         else:
-            return jsonify({'error': 'Invalid archived filter. Use true or false.'}), 400
+            result = None
+            yield frame
+
+
+@notes_bp.route('/stream/ticket', methods=['POST'])
+@jwt_required()
+def create_stream_ticket():
+    """
+    Issue a ticket for opening the live stream as ?ticket=. It is valid
+    for SSE_TICKET_SECONDS and for nothing but GET /notes/stream.
+    """
+    ticket = _stream_tickets().dumps(str(get_jwt_identity()))
+    return jsonify({'ticket': ticket, 'expires_in': current_app.config['SSE_TICKET_SECONDS']}), 200
 
-    notes = query.all()
-    schema = NoteSchema(many=True)
 
-    return jsonify({'notes': schema.dump(notes)}), 200
+@notes_bp.route('/stream', methods=['GET'])
+def stream_notes():
+    """
+    Server-Sent Events feed of the user's note changes: created, updated,
+    archived, unarchived and deleted events whose ids are change tokens.
+    Resumes after the Last-Event-ID header (or ?since=, any /changes token);
+    a resync event means the token expired and a full sync is needed.
+    EventSource clients, which cannot send headers, pass a stream ticket
+    (POST /notes/stream/ticket) as ?ticket=; others may send the usual
+    Authorization header. Each open stream holds a worker thread, so past
+    SSE_MAX_STREAMS per worker the request gets 503 with Retry-After.
+    Events may repeat across reconnects; apply them as upserts.
+    """
+    stream, error = _open_stream(max_streams=current_app.config['SSE_MAX_STREAMS'])
+    if error:
+        return error
+    user_id, position, subscription = stream
+
+    body = _event_stream(user_id, position, subscription, current_app.config)
+    response = Response(stream_with_context(body), mimetype='text/event-stream', headers=SSE_HEADERS)
+    return _stream_response(response, subscription)
+
+
+@async_view('notes.stream_notes')
+async def stream_notes_async():
+    """stream_notes() for the ASGI mode, where an open stream costs no worker thread (nor counts against SSE_MAX_STREAMS)."""
+    stream, error = _open_stream(asyncio.get_running_loop())
+    if error:
+        return error
+    user_id, position, subscription = stream
+
+    body = _event_stream_async(user_id, position, subscription, current_app.config)
+    response = AsyncStreamResponse(body, mimetype='text/event-stream', headers=SSE_HEADERS)
+    return _stream_response(response, subscription)
 
 
 
@@ -110,13 +707,26 @@ def get_notes():
 def get_note(note_id):
     """Retrieve a single note by ID for the authenticated user."""
     current_user_id = get_jwt_identity()
-    note = Note.query.filter_by(id=note_id, user_id=current_user_id).first()
+
+    cache_key = None
+    if response_cache.enabled:
+        cache_key = response_cache.key(current_user_id, f'note:{note_id}')
+        cached = response_cache.get(cache_key, compression.negotiate())
+        if cached:
+            return _cached_response(cache_key, *cached)
+
+    note = Note.live().filter_by(id=note_id, user_id=current_user_id).first()
 
     if not note:
         return jsonify({'error': 'Note not found'}), 404
 
-    schema = NoteSchema()
-    return jsonify({'note': schema.dump(note)}), 200
+    not_modified = _not_modified(_note_etag(note), note.updated_at)
+    if not_modified:
+        return not_modified
+
+    response, status = _note_response({'note': note_serializer.dump(note)}, note)
+    _cache_response(cache_key, response, _note_etag(note), note.updated_at)
+    return response, status
 
 
 
@@ -125,7 +735,10 @@ def get_note(note_id):
 @notes_bp.route('/<int:note_id>', methods=['PUT'])
 @jwt_required()
 def update_note(note_id):
-    """Update a note’s title or content."""
+    """
+    Update a note’s title or content.
+    Send If-Match with the note's ETag to update only if it is unchanged.
+    """
     try:
         schema = NoteUpdateSchema()
         data = schema.load(request.json)
@@ -133,11 +746,19 @@ def update_note(note_id):
         return jsonify({'error': 'Validation failed', 'messages': err.messages}), 400
 
     current_user_id = get_jwt_identity()
-    note = Note.query.filter_by(id=note_id, user_id=current_user_id).first()
+    note = Note.live().filter_by(id=note_id, user_id=current_user_id).first()
 
     if not note:
         return jsonify({'error': 'Note not found'}), 404
 
+    # Optimistic concurrency: refuse to overwrite a version the client hasn't seen
+    if request.if_match and not request.if_match.contains(_note_etag(note)):
+        response = _with_validators(
+            jsonify({'error': 'Note has been modified. Fetch it again and retry.'}),
+            _note_etag(note), note.updated_at
+        )
+        return response, 412
+
     # Update only provided fields
     if 'title' in data:
         note.title = data['title']
@@ -145,12 +766,13 @@ def update_note(note_id):
         note.content = data['content']
 
     db.session.commit()
+    response_cache.invalidate_user(current_user_id)
+    _publish(current_user_id, 'updated', note)
 
-    schema = NoteSchema()
-    return jsonify({
+    return _note_response({
         'message': 'Note updated successfully',
-        'note': schema.dump(note)
-    }), 200
+        'note': note_serializer.dump(note)
+    }, note)
 
 
 
@@ -159,15 +781,17 @@ def update_note(note_id):
 @notes_bp.route('/<int:note_id>', methods=['DELETE'])
 @jwt_required()
 def delete_note(note_id):
-    """Delete a note permanently."""
+    """Delete a note, leaving a tombstone for sync clients."""
     current_user_id = get_jwt_identity()
-    note = Note.query.filter_by(id=note_id, user_id=current_user_id).first()
+    note = Note.live().filter_by(id=note_id, user_id=current_user_id).first()
 
     if not note:
         return jsonify({'error': 'Note not found'}), 404
 
-    db.session.delete(note)
+    note.mark_deleted()
     db.session.commit()
+    response_cache.invalidate_user(current_user_id)
+    _publish(current_user_id, 'deleted', note)
 
     return jsonify({'message': 'Note deleted successfully'}), 200
 
@@ -180,19 +804,20 @@ def delete_note(note_id):
 def archive_note(note_id):
     """Mark a note as archived."""
     current_user_id = get_jwt_identity()
-    note = Note.query.filter_by(id=note_id, user_id=current_user_id).first()
+    note = Note.live().filter_by(id=note_id, user_id=current_user_id).first()
 
     if not note:
         return jsonify({'error': 'Note not found'}), 404
 
     note.archived = True
     db.session.commit()
+    response_cache.invalidate_user(current_user_id)
+    _publish(current_user_id, 'archived', note)
 
-    schema = NoteSchema()
-    return jsonify({
+    return _note_response({
         'message': 'Note archived successfully',
-        'note': schema.dump(note)
-    }), 200
+        'note': note_serializer.dump(note)
+    }, note)
 
 
 @notes_bp.route('/<int:note_id>/unarchive', methods=['PATCH'])
@@ -200,16 +825,214 @@ def archive_note(note_id):
 def unarchive_note(note_id):
     """Restore a previously archived note."""
     current_user_id = get_jwt_identity()
-    note = Note.query.filter_by(id=note_id, user_id=current_user_id).first()
+    note = Note.live().filter_by(id=note_id, user_id=current_user_id).first()
 
     if not note:
         return jsonify({'error': 'Note not found'}), 404
 
     note.archived = False
     db.session.commit()
+    response_cache.invalidate_user(current_user_id)
+    _publish(current_user_id, 'unarchived', note)
 
-    schema = NoteSchema()
-    return jsonify({
+    return _note_response({
         'message': 'Note restored successfully',
-        'note': schema.dump(note)
-    }), 200
\ No newline at end of file
+        'note': note_serializer.dump(note)
+    }, note)
+
+
+
+# Batch Operations
+
+def _validate_batch_operation(operation):
+    """
+    Validates one batch entry against the single-note schemas.
+    Returns (payload, error) where error is a per-item result on failure.
+    """
+    op = operation['op']
+
+    if op == 'create':
+        if 'id' in operation:
+            return None, {'status': 400, 'error': 'Create operations must not specify an id'}
+        try:
+            return NoteSchema().load(operation.get('data', {})), None
+        except ValidationError as err:
+            return None, {'status': 400, 'error': 'Validation failed', 'messages': err.messages}
+
+    if 'id' not in operation:
+        return None, {'status': 400, 'error': f'{op.capitalize()} operations require an id'}
+
+    if op == 'update':
+        try:
+            data = NoteUpdateSchema().load(operation.get('data', {}))
+        except ValidationError as err:
+            return None, {'status': 400, 'error': 'Validation failed', 'messages': err.messages}
+        if not data:
+            return None, {'status': 400, 'error': 'Update operations require title or content'}
+        return data, None
+
+    return {}, None
+
+
+@notes_bp.route('/batch', methods=['POST'])
+@jwt_required()
+def batch_notes():
+    """
+    Apply many create/update/archive/unarchive/delete operations in one
+    transaction using set-based statements.
+    In atomic mode (default) any invalid operation rejects the whole batch;
+    in partial mode invalid operations are reported and the rest applied.
+    """
+    try:
+        batch = BatchSchema().load(request.json)
+    except ValidationError as err:
+        return jsonify({'error': 'Validation failed', 'messages': err.messages}), 400
+
+    operations = batch['operations']
+    max_operations = current_app.config['NOTES_BATCH_MAX_OPERATIONS']
+    if len(operations) > max_operations:
+        return jsonify({'error': f'Too many operations. The limit is {max_operations}.'}), 413
+
+    current_user_id = int(get_jwt_identity())
+    results = [{'index': i, 'op': op['op']} for i, op in enumerate(operations)]
+    payloads = {}
+
+    # Validate every operation before touching the database
+    for i, operation in enumerate(operations):
+        payload, error = _validate_batch_operation(operation)
+        if error:
+            results[i].update(error)
+        else:
+            payloads[i] = payload
+            if 'id' in operation:
+                results[i]['id'] = operation['id']
+
+    # Resolve ownership of every referenced note with a single query
+    referenced = [i for i in payloads if operations[i]['op'] != 'create']
+    owned_ids = set()
+    if referenced:
+        owned_ids = set(db.session.scalars(
+            db.select(Note.id).where(
+                Note.user_id == current_user_id,
+                Note.deleted_at.is_(None),
+                Note.id.in_({operations[i]['id'] for i in referenced})
+            )
+        ))
+    seen_ids = set()
+    for i in referenced:
+        note_id = operations[i]['id']
+        if note_id not in owned_ids:
+            results[i].update({'status': 404, 'error': 'Note not found'})
+            del payloads[i]
+        elif note_id in seen_ids:
+            results[i].update({'status': 400, 'error': 'Note appears more than once in the batch'})
+            del payloads[i]
+        else:
+            seen_ids.add(note_id)
+
+    failed = len(operations) - len(payloads)
+    if failed and batch['mode'] == 'atomic':
+        return jsonify({
+            'error': 'Batch rejected, no operations were applied',
+            'results': [r for r in results if 'status' in r]
+        }), 400
+
+    # Group the valid operations so each kind becomes one statement
+    creates, updates, flags, deletes = [], [], {True: [], False: []}, []
+    for i, payload in payloads.items():
+        op = operations[i]['op']
+        if op == 'create':
+            creates.append(i)
+        elif op == 'update':
+            updates.append(i)
+        elif op in ('archive', 'unarchive'):
+            flags[op == 'archive'].append(i)
+        else:
+            deletes.append(i)
+
+    now = datetime.utcnow()
+    try:
+        # The bulk statements below bypass the flush, so they take their sequence number here
+        change_seq = next_change_seq(current_user_id)
+
+        if creates:
+            new_notes = db.session.scalars(
+                insert(Note).returning(Note, sort_by_parameter_order=True),
+                [
+                    {'title': payloads[i]['title'], 'content': payloads[i]['content'],
+                     'user_id': current_user_id, 'change_seq': change_seq}
+                    for i in creates
+                ]
+            ).all()
+            for i, note in zip(creates, new_notes):
+                results[i].update({'status': 201, 'id': note.id, 'note': note_serializer.dump(note)})
+
+        if updates:
+            db.session.execute(update(Note), [
+                {'id': operations[i]['id'], 'updated_at': now, 'change_seq': change_seq, **payloads[i]}
+                for i in updates
+            ])
+
+        for archived, indexes in flags.items():
+            if indexes:
+                db.session.execute(
+                    update(Note)
+                    .where(Note.id.in_([operations[i]['id'] for i in indexes]))
+                    .values(archived=archived, updated_at=now, change_seq=change_seq)
+                    .execution_options(synchronize_session=False)
+                )
+
+        if deletes:
+            # Same tombstone as Note.mark_deleted(), applied set-wise
+            db.session.execute(
+                update(Note)
+                .where(Note.id.in_([operations[i]['id'] for i in deletes]))
+                .values(
+                    title='', content_inline='', content_blob=None, deleted_at=now, updated_at=now,
+                    change_seq=change_seq
+                )
+                .execution_options(synchronize_session=False)
+            )
+
+        # Bulk statements bypass the flush that keeps the search index current
+        reindex_notes([results[i]['id'] for i in creates] + [operations[i]['id'] for i in updates + deletes])
+
+        db.session.commit()
+        response_cache.invalidate_user(current_user_id)
+
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception('Batch operation failed')
+        return jsonify({'error': 'Internal server error'}), 500
+
+    # Reload changed notes in one query so the results carry their new state
+    changed = updates + flags[True] + flags[False]
+    if changed:
+        notes_by_id = {
+            note.id: note for note in Note.query
+            .filter(Note.id.in_([operations[i]['id'] for i in changed]))
+            .populate_existing()
+        }
+        for i in changed:
+            results[i].update({'status': 200, 'note': note_serializer.dump(notes_by_id[operations[i]['id']])})
+    for i in deletes:
+        results[i]['status'] = 200
+
+    # One message carries the whole batch to the user's live streams
+    kinds = {'create': 'created', 'update': 'updated', 'archive': 'archived', 'unarchive': 'unarchived'}
+    events = []
+    for i in sorted(payloads):
+        if operations[i]['op'] == 'delete':
+            events.append(note_event('deleted', change_position(change_seq, operations[i]['id'], now)))
+        else:
+            note = results[i]['note']
+            position = change_position(change_seq, note['id'], datetime.fromisoformat(note['updated_at']))
+            events.append(note_event(kinds[operations[i]['op']], position, note))
+    note_events.publish(current_user_id, events)
+
+    return json_response({
+        'message': 'Batch processed',
+        'applied': len(payloads),
+        'failed': failed,
+        'results': results
+    }), 200
@@ -0,0 +1,65 @@
+import base64
+import json
+from datetime import datetime, timezone
+from flask import current_app
+
+# Request parameter parsing shared by the listing endpoints.
+# Every parser raises ValueError with a client-facing message.
+
+
+def encode_cursor(*values):
+    """Builds an opaque cursor from the sort key of the last row on a page."""
+    raw = json.dumps(values).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, *types):
+    """
+    Reverses encode_cursor, coercing each sort key value with the given types.
+    Raises ValueError on malformed input.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if len(values) != len(types):
+            raise ValueError('Cursor does not match the sort order.')
+        return [convert(value) for convert, value in zip(types, values)]
+    except (TypeError, ValueError) as err:
+        raise ValueError('Invalid cursor.') from err
+
+
+def parse_limit(value):
+    """Validates the page size, falling back to the configured default."""
+    if value is None:
+        return current_app.config['NOTES_PAGE_SIZE']
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError('Invalid limit. Use a positive integer.')
+    max_limit = current_app.config['NOTES_MAX_PAGE_SIZE']
+    if limit < 1 or limit > max_limit:
+        raise ValueError(f'Invalid limit. Use a value between 1 and {max_limit}.')
+    return limit
+
+
+def parse_datetime(value, name):
+    """
+    Parses a YYYY-MM-DD date (midnight) or an ISO 8601 datetime.
+    Aware datetimes are converted to naive UTC to match the stored timestamps.
+    """
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'Invalid {name} value. Use YYYY-MM-DD or an ISO 8601 datetime.')
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def parse_bool(value, name):
+    """Parses a true/false filter value, case-insensitively."""
+    if value.lower() == 'true':
+        return True
+    if value.lower() == 'false':
+        return False
+    raise ValueError(f'Invalid {name} filter. Use true or false.')
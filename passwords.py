@@ -0,0 +1,147 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import generate_password_hash, check_password_hash
+from extensions import AppExtension
+
+# Password hashing off the request thread.
+# Hashing is deliberately CPU-heavy, so it runs in a small process pool with a
+# bounded number of in-flight jobs; once the queue is full callers get
+# HashingBusy and the endpoints answer 503 instead of piling up. Async views
+# (ASGI mode) await the same pool through the *_async methods. A pool whose
+# process died (e.g. OOM-killed) is replaced and the job retried once.
+
+
+class HashingBusy(Exception):
+    """Raised when the hashing queue is full or a job took too long."""
+
+
+class PasswordHasher:
+    """
+    Configured from the app config: PASSWORD_HASH_METHOD (any werkzeug method
+    string, e.g. scrypt or pbkdf2:sha256:600000), PASSWORD_HASH_WORKERS
+    (0 hashes inline), PASSWORD_HASH_QUEUE_DEPTH and PASSWORD_HASH_TIMEOUT.
+    """
+
+    def __init__(self):
+        self.method = 'scrypt'
+        self.workers = 0
+        self.timeout = None
+        self._slots = None
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+        self._prefix = None
+
+    def init_app(self, app):
+        self.method = app.config['PASSWORD_HASH_METHOD']
+        self.workers = app.config['PASSWORD_HASH_WORKERS']
+        self.timeout = app.config['PASSWORD_HASH_TIMEOUT']
+        # Jobs running plus jobs allowed to wait for a worker
+        self._slots = threading.BoundedSemaphore(self.workers + app.config['PASSWORD_HASH_QUEUE_DEPTH'])
+        self._prefix = None
+
+    def _pool(self):
+        # Created lazily and per process, so each gunicorn worker owns its pool
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=_pool_context())
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def _discard(self, executor):
+        """Drops a broken pool so the next job starts a new one."""
+        with self._lock:
+            if self._executor is executor:
+                print("Password hashing pool is broken; starting a new one")
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, executor, fn, *args):
+        """Queues a job in a free slot; the slot is held until the job itself finishes."""
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy('Password hashing queue is full')
+        try:
+            future = executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # Released by the job, not the caller: a caller that timed out leaves
+        # its job queued or running, still occupying a worker
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        for retry in (True, False):
+            executor = self._pool()
+            try:
+                future = self._submit(executor, fn, *args)
+                try:
+                    return future.result(timeout=self.timeout)
+                except FutureTimeout:
+                    future.cancel()  # Frees the slot now if the job never started
+                    raise HashingBusy('Password hashing timed out')
+            except BrokenProcessPool:
+                self._discard(executor)
+                if not retry:
+                    raise HashingBusy('Password hashing pool failed')
+
+    async def _run_async(self, fn, *args):
+        if not self.workers:
+            # Inline hashing still leaves the event loop free, in its default thread pool
+            return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+        for retry in (True, False):
+            executor = self._pool()
+            try:
+                future = self._submit(executor, fn, *args)
+                try:
+                    # Cancelling the awaited wrapper on timeout also cancels a job that never started
+                    return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+                except asyncio.TimeoutError:
+                    raise HashingBusy('Password hashing timed out')
+            except BrokenProcessPool:
+                self._discard(executor)
+                if not retry:
+                    raise HashingBusy('Password hashing pool failed')
+
+    def hash(self, password):
+        """Hashes a password with the configured method."""
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, stored_hash, password):
+        """Checks a password against a stored hash of any supported method."""
+        return self._run(check_password_hash, stored_hash, password)
+
+    async def hash_async(self, password):
+        """hash() for async views."""
+        return await self._run_async(generate_password_hash, password, self.method)
+
+    async def verify_async(self, stored_hash, password):
+        """verify() for async views."""
+        return await self._run_async(check_password_hash, stored_hash, password)
+
+    def needs_rehash(self, stored_hash):
+        """True when the stored hash was made with other parameters than the configured ones."""
+        if self._prefix is None:
+            # e.g. 'scrypt:32768:8:1' for method 'scrypt'; the salt and hash follow the first '$'
+            self._prefix = generate_password_hash('', self.method).split('$', 1)[0]
+        return stored_hash.split('$', 1)[0] != self._prefix
+
+
+def _pool_context():
+    # Pool processes start from a fresh interpreter (forkserver, or spawn where
+    # it is unavailable) rather than forking a threaded worker, whose copied
+    # locks (connection pools, logging) could be held by threads the child lacks
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(['werkzeug.security'])
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+password_hasher = AppExtension('password_hasher', PasswordHasher)
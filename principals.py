@@ -0,0 +1,69 @@
+import json
+from collections import namedtuple
+from sqlalchemy import event
+from models import db, User
+from cache import LRUCache
+from extensions import AppExtension
+
+# Short-lived cache of the authenticated user's identity and role, so
+# admin_required and /protected don't re-query the users table on every call.
+# Entries are dropped whenever a User row is updated or deleted through the
+# ORM; other workers see the change once their entry's TTL runs out.
+
+Principal = namedtuple('Principal', ['id', 'username', 'is_admin'])
+
+
+class PrincipalCache:
+    """Configured from PRINCIPAL_CACHE_TTL (seconds; 0 disables caching)."""
+
+    def __init__(self):
+        self._cache = None
+
+    def init_app(self, app):
+        ttl = app.config['PRINCIPAL_CACHE_TTL']
+        self._cache = LRUCache(max_bytes=1024 * 1024, default_ttl=ttl) if ttl > 0 else None
+
+    def load(self, user_id):
+        """Returns the Principal for a JWT identity, or None if the user doesn't exist."""
+        principal = self._cached(user_id)
+        if principal is None:
+            principal = self._remember(user_id, db.session.execute(self._query(user_id)).first())
+        return principal
+
+    async def load_async(self, user_id, session):
+        """load() for async views, querying through their AsyncSession."""
+        principal = self._cached(user_id)
+        if principal is None:
+            principal = self._remember(user_id, (await session.execute(self._query(user_id))).first())
+        return principal
+
+    def _cached(self, user_id):
+        if self._cache is not None:
+            cached = self._cache.get(str(user_id))
+            if cached is not None:
+                return Principal(*json.loads(cached))
+        return None
+
+    def _query(self, user_id):
+        return db.select(User.id, User.username, User.is_admin).where(User.id == int(user_id))
+
+    def _remember(self, user_id, row):
+        if row is None:
+            return None
+        principal = Principal(row.id, row.username, bool(row.is_admin))
+        if self._cache is not None:
+            self._cache.set(str(user_id), json.dumps(principal).encode())
+        return principal
+
+    def invalidate(self, user_id):
+        if self._cache is not None:
+            self._cache.delete(str(user_id))
+
+
+principal_cache = AppExtension('principal_cache', PrincipalCache)
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_changed_user(mapper, connection, target):
+    principal_cache.invalidate(target.id)
@@ -0,0 +1,221 @@
+import math
+import time
+from flask import current_app, g, jsonify, request
+from cache import FakeRedis, connect_redis
+from extensions import AppExtension
+
+# Token-bucket rate limiting per blueprint policy.
+# Every request to a limited blueprint takes a token from its client IP's
+# bucket before the view runs; requests with a JWT also take one from the
+# user's bucket when the token is verified, so the identity is never decoded
+# twice. Buckets live in this worker's memory, or in Redis (one Lua call per
+# bucket) so limits hold across gunicorn workers. Responses carry
+# RateLimit-Limit/-Remaining/-Reset for the tightest bucket checked; an empty
+# bucket gives 429 with Retry-After.
+
+# Policy of each blueprint; transfer shares the notes budget
+BLUEPRINT_POLICIES = {'auth': 'auth', 'notes': 'notes', 'transfer': 'notes', 'admin': 'admin'}
+
+RATE_PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+def parse_rate(value):
+    """(capacity, tokens per second) for '<count>/<period>', or None for '' / 'none'."""
+    if value.strip().lower() in ('', 'none'):
+        return None
+    count, _, period = value.partition('/')
+    try:
+        capacity = int(count)
+        seconds = RATE_PERIODS[period.strip().lower()]
+    except (ValueError, KeyError):
+        raise RuntimeError(f'Invalid rate limit {value!r}. Use <count>/second, /minute, /hour or /day.')
+    if capacity <= 0:
+        raise RuntimeError(f'Invalid rate limit {value!r}. The count must be positive.')
+    return capacity, capacity / seconds
+
+
+def take_token(tokens, updated, now, capacity, rate):
+    """Refills a bucket to now and takes one token: (allowed, tokens left)."""
+    if tokens is None:
+        tokens = capacity
+    else:
+        tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+    if tokens >= 1:
+        return True, tokens - 1
+    return False, tokens
+
+
+class MemoryBuckets:
+    """
+    Buckets in a plain dict, for a single worker. Lock-free: each bucket is
+    one tuple swapped in with a single assignment, so concurrent threads
+    never block; a race can at worst let an extra request through.
+    """
+
+    def __init__(self, max_keys):
+        self.max_keys = max_keys
+        self._buckets = {}
+
+    def take(self, key, capacity, rate):
+        now = time.monotonic()
+        state = self._buckets.get(key)
+        if state is None:
+            if len(self._buckets) >= self.max_keys:
+                self._prune(now)
+            allowed, tokens = take_token(None, now, now, capacity, rate)
+        else:
+            allowed, tokens = take_token(state[0], state[1], now, capacity, rate)
+        self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+        return allowed, tokens
+
+    def _prune(self, now):
+        # Full buckets carry no state; drop them, then the oldest if still over budget
+        for key, state in list(self._buckets.items()):
+            if state[2] <= now:
+                self._buckets.pop(key, None)
+        excess = len(self._buckets) - self.max_keys // 2
+        for key in list(self._buckets)[:max(excess, 0)]:
+            self._buckets.pop(key, None)
+
+
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1])
+if tokens == nil then
+  tokens = capacity
+else
+  tokens = math.min(capacity, tokens + math.max(0, now - tonumber(state[2])) * rate)
+end
+local allowed = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+  allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+
+def _fake_token_bucket(fake, keys, args):
+    capacity, rate, now = float(args[0]), float(args[1]), float(args[2])
+    state = fake.get(keys[0])
+    if state is None:
+        allowed, tokens = take_token(None, now, now, capacity, rate)
+    else:
+        stored_tokens, updated = map(float, state.split())
+        allowed, tokens = take_token(stored_tokens, updated, now, capacity, rate)
+    fake.set(keys[0], f'{tokens!r} {now!r}', ex=math.ceil((capacity - tokens) / rate) + 1)
+    return [int(allowed), repr(tokens).encode()]
+
+
+FakeRedis.script_handlers[TOKEN_BUCKET_SCRIPT] = _fake_token_bucket
+
+
+class RedisBuckets:
+    """Buckets in Redis hashes, updated atomically by TOKEN_BUCKET_SCRIPT; they expire once full."""
+
+    def __init__(self, client, prefix='notes-ratelimit:'):
+        self.prefix = prefix
+        self._script = client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def take(self, key, capacity, rate):
+        # Wall-clock time, so workers on different hosts agree on refills
+        allowed, tokens = self._script(keys=[self.prefix + key], args=[capacity, rate, time.time()])
+        return bool(allowed), float(tokens)
+
+
+class RateLimitExceeded(Exception):
+    pass
+
+
+class RateLimiter:
+    """
+    Configured from RATELIMIT_ENABLED, RATELIMIT_BACKEND, RATELIMIT_REDIS_URL,
+    RATELIMIT_MAX_KEYS and RATELIMIT_<POLICY>_PER_IP / _PER_USER.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.buckets = None
+        self.policies = {}
+
+    def init_app(self, app, jwt):
+        self.enabled = app.config['RATELIMIT_ENABLED']
+        if not self.enabled:
+            return
+
+        backend = app.config['RATELIMIT_BACKEND']
+        if backend == 'memory':
+            self.buckets = MemoryBuckets(app.config['RATELIMIT_MAX_KEYS'])
+        elif backend == 'redis':
+            self.buckets = RedisBuckets(connect_redis(app.config['RATELIMIT_REDIS_URL']))
+        else:
+            raise RuntimeError(f'Unknown RATELIMIT_BACKEND {backend!r}. Use memory or redis.')
+
+        self.policies = {
+            policy: (
+                parse_rate(app.config[f'RATELIMIT_{policy.upper()}_PER_IP']),
+                parse_rate(app.config[f'RATELIMIT_{policy.upper()}_PER_USER']),
+            )
+            for policy in set(BLUEPRINT_POLICIES.values())
+        }
+
+        app.before_request(self._limit_ip)
+        app.after_request(self._add_headers)
+        app.register_error_handler(RateLimitExceeded, self._too_many_requests)
+        jwt.token_verification_loader(self._limit_user)
+
+    def _policy(self):
+        """(policy, (per-IP rate, per-user rate)) for this request, or (None, None)."""
+        policy = BLUEPRINT_POLICIES.get(request.blueprint)
+        if policy is None or request.method == 'OPTIONS':  # CORS preflights are free
+            return None, None
+        return policy, self.policies[policy]
+
+    def _limit_ip(self):
+        policy, limits = self._policy()
+        if policy and limits[0]:
+            self._hit(f'{policy}:ip:{request.remote_addr}', *limits[0])
+
+    def _limit_user(self, jwt_header, jwt_data):
+        policy, limits = self._policy()
+        if policy and limits[1] and 'rate_limited_user' not in g:
+            g.rate_limited_user = True
+            identity = jwt_data[current_app.config['JWT_IDENTITY_CLAIM']]
+            self._hit(f'{policy}:user:{identity}', *limits[1])
+        return True
+
+    def _hit(self, key, capacity, rate):
+        try:
+            allowed, tokens = self.buckets.take(key, capacity, rate)
+        except Exception as e:
+            # Fail open: an unreachable shared store must not take the API down
+            print(f"Error checking rate limit: {e}")
+            return
+
+        current = g.get('rate_limit')
+        if current is None or tokens < current[1] or not allowed:
+            g.rate_limit = (capacity, tokens, rate, allowed)
+        if not allowed:
+            raise RateLimitExceeded()
+
+    def _add_headers(self, response):
+        state = g.get('rate_limit')
+        if state is not None:
+            capacity, tokens, rate, allowed = state
+            response.headers['RateLimit-Limit'] = str(capacity)
+            response.headers['RateLimit-Remaining'] = str(int(tokens))
+            response.headers['RateLimit-Reset'] = str(math.ceil((capacity - tokens) / rate))
+            if not allowed:
+                response.headers['Retry-After'] = str(math.ceil((1 - tokens) / rate))
+        return response
+
+    def _too_many_requests(self, error):
+        return jsonify({'error': 'Too many requests'}), 429
+
+
+rate_limiter = AppExtension('rate_limiter', RateLimiter)
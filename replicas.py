@@ -0,0 +1,124 @@
+import random
+import sqlite3
+from contextlib import closing
+from flask import g, request, has_request_context
+from flask_jwt_extended import get_jwt_identity
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.sql.dml import UpdateBase
+from cache import LRUCache, RedisCache, connect_redis
+from extensions import AppExtension
+
+# Read-replica routing.
+# With DATABASE_REPLICA_URLS set, the session sends reads made while serving
+# GET/HEAD requests to a replica (one per request) and everything else to the
+# primary: writes, flushes, other methods, background jobs and CLI commands.
+# A user who wrote is pinned to the primary for DB_REPLICA_STICKY_SECONDS so
+# they read their own writes despite replication lag. Pins live in the
+# response cache's Redis when CACHE_BACKEND=redis, so every worker sees them.
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ReplicaRouter:
+    """Configured from DATABASE_REPLICA_URLS, DB_REPLICA_STICKY_SECONDS and the cache settings."""
+
+    def __init__(self):
+        self.replicas = []
+        self._pins = None
+
+    def init_app(self, app, replicas):
+        self.replicas = replicas
+        ttl = app.config['DB_REPLICA_STICKY_SECONDS']
+        if app.config['CACHE_BACKEND'] == 'redis':
+            self._pins = RedisCache(connect_redis(app.config['CACHE_REDIS_URL']), ttl, prefix='notes-primary:')
+        else:
+            self._pins = LRUCache(max_bytes=1024 * 1024, default_ttl=ttl)
+        app.after_request(self._pin_writer)
+
+    def pin(self, user_id):
+        """Sends the user's reads to the primary until their writes have replicated."""
+        if self.replicas:
+            self._pins.set(str(user_id), b'1')
+
+    def choose(self, clause):
+        """The replica engine for this read, or None when it must go to the primary."""
+        if not has_request_context() or request.method not in READ_METHODS:
+            return None
+        if isinstance(clause, UpdateBase):
+            g.db_wrote = True
+            return None
+        if g.get('db_wrote'):
+            return None
+
+        if 'db_replica' not in g:
+            identity = _current_identity()
+            pinned = identity is not None and self._pins.get(str(identity)) is not None
+            g.db_replica = None if pinned else random.choice(self.replicas)
+        return g.db_replica
+
+    def _pin_writer(self, response):
+        if g.get('db_wrote'):
+            identity = _current_identity()
+            if identity is not None:
+                self.pin(identity)
+        return response
+
+
+replica_router = AppExtension('replica_router', ReplicaRouter)
+
+
+def _current_identity():
+    try:
+        return get_jwt_identity()
+    except RuntimeError:  # No JWT was verified for this request
+        return None
+
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session that lets replica_router pick the engine for reads."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and replica_router.replicas and not self._flushing:
+            replica = replica_router.choose(clause)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _record_write(session, flush_context):
+    if has_request_context():
+        g.db_wrote = True
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _record_statement_write(orm_execute_state):
+    # Bulk and Core-style insert()/update()/delete() run through session.execute()
+    # never flush, so after_flush misses them
+    if has_request_context() and (
+        orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete
+    ):
+        g.db_wrote = True
+
+
+def copy_sqlite_replicas(primary_url, replica_urls):
+    """
+    Copies a SQLite primary into SQLite replica files with the backup API,
+    standing in for replication when testing locally. Returns the paths written.
+    """
+    source = make_url(primary_url)
+    if source.get_backend_name() != 'sqlite':
+        raise RuntimeError('Replica copies are only supported for SQLite; use your database replication instead.')
+
+    written = []
+    with closing(sqlite3.connect(source.database)) as primary:
+        for url in replica_urls:
+            target = make_url(url)
+            if target.get_backend_name() != 'sqlite':
+                raise RuntimeError(f'Replica {url} is not a SQLite database.')
+            with closing(sqlite3.connect(target.database)) as replica:
+                primary.backup(replica)
+            written.append(target.database)
+    return written
@@ -0,0 +1,329 @@
+import re
+from flask import current_app
+from sqlalchemy import Float, Integer, cast, event, func, literal_column, text
+from blobs import blob_codec
+from models import db, Note, NoteBlob
+from replicas import RoutingSession
+
+# Full-text search over note titles and content.
+# SQLite uses an FTS5 table keyed by note id; PostgreSQL uses a tsvector
+# column with a GIN index. Both are written by the application, not derived
+# from the notes table: a large body keeps only a prefix inline (see
+# blobs.py), so the index is fed the full decoded text whenever a note's
+# title or content is written (flushes, batch requests, imports).
+# Databases without either fall back to substring matching in notes.py.
+
+FTS_TABLE = 'notes_fts'
+TSVECTOR_COLUMN = 'search_vector'
+
+# Words, optionally followed by * for a prefix match (e.g. "meet*")
+_TERM_RE = re.compile(r'(\w+)(\*?)', re.UNICODE)
+
+# Notes indexed per statement when (re)building the index
+_INDEX_BATCH_SIZE = 500
+
+_SQLITE_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, content, tokenize='porter unicode61 remove_diacritics 2'
+    )
+    """,
+    # Purged tombstones (and any other hard delete) leave the index by row id
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON notes BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+    END
+    """,
+]
+
+# The earlier external-content table indexed notes.content, i.e. only the inline prefix of blob notes
+_SQLITE_LEGACY_DDL = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+_POSTGRES_DDL = [
+    f'ALTER TABLE notes ADD COLUMN IF NOT EXISTS {TSVECTOR_COLUMN} tsvector',
+    f"""
+    CREATE INDEX IF NOT EXISTS ix_notes_{TSVECTOR_COLUMN}
+    ON notes USING GIN ({TSVECTOR_COLUMN})
+    """,
+]
+
+# Likewise, the earlier generated column was computed from the inline prefix
+_POSTGRES_LEGACY_DDL = [
+    f'ALTER TABLE notes DROP COLUMN {TSVECTOR_COLUMN}',
+]
+
+_TSVECTOR_SQL = (
+    "setweight(to_tsvector('english', coalesce({title}, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce({content}, '')), 'B')"
+)
+
+
+def _sqlite_index_state(conn):
+    """None (no index), 'legacy' (external-content table) or 'current'."""
+    names = set(conn.execute(
+        text("SELECT name FROM sqlite_master WHERE name IN (:table, :legacy_trigger)"),
+        {'table': FTS_TABLE, 'legacy_trigger': f'{FTS_TABLE}_ai'}
+    ).scalars())
+    if FTS_TABLE not in names:
+        return None
+    return 'legacy' if f'{FTS_TABLE}_ai' in names else 'current'
+
+
+def _postgres_index_state(conn):
+    """None (no column), 'legacy' (generated column) or 'current'."""
+    generated = conn.execute(
+        text(
+            "SELECT is_generated FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name = 'notes' AND column_name = :column"
+        ),
+        {'column': TSVECTOR_COLUMN}
+    ).scalar()
+    if generated is None:
+        return None
+    return 'legacy' if generated == 'ALWAYS' else 'current'
+
+
+def _backends():
+    """
+    Which backend each of the current app's engines has: set by
+    install_search_index(), else detected on first use. Kept per app, so
+    apps on the same database URL don't answer for each other.
+    """
+    return current_app.extensions.setdefault('search_backends', {})
+
+
+def install_search_index(engine):
+    """
+    Creates the full-text index for the engine's dialect if it is missing,
+    replacing the earlier prefix-only index, and indexes every note when it
+    is new.
+    """
+    dialect = engine.dialect.name
+
+    if dialect == 'sqlite':
+        with engine.begin() as conn:
+            state = _sqlite_index_state(conn)
+            try:
+                for statement in (_SQLITE_LEGACY_DDL if state == 'legacy' else []) + _SQLITE_DDL:
+                    conn.execute(text(statement))
+            except Exception as e:
+                # SQLite builds without FTS5 keep the substring fallback
+                print(f"FTS5 unavailable, full-text search disabled: {e}")
+                _backends()[engine] = None
+                return
+            if state != 'current':
+                _rebuild_index(conn, 'fts5')
+        _backends()[engine] = 'fts5'
+
+    elif dialect == 'postgresql':
+        with engine.begin() as conn:
+            state = _postgres_index_state(conn)
+            for statement in (_POSTGRES_LEGACY_DDL if state == 'legacy' else []) + _POSTGRES_DDL:
+                conn.execute(text(statement))
+            if state != 'current':
+                _rebuild_index(conn, 'tsvector')
+        _backends()[engine] = 'tsvector'
+
+    else:
+        _backends()[engine] = None
+
+
+def _detect_backend(engine):
+    # Workers serving a database migrated by `flask --app app init-db`; a legacy index isn't written to
+    dialect = engine.dialect.name
+    if dialect not in ('sqlite', 'postgresql'):
+        return None
+    with engine.connect() as conn:
+        if dialect == 'sqlite':
+            return 'fts5' if _sqlite_index_state(conn) == 'current' else None
+        return 'tsvector' if _postgres_index_state(conn) == 'current' else None
+
+
+def search_backend():
+    """Returns 'fts5', 'tsvector' or None for the current engine."""
+    engine = db.engine
+    backends = _backends()
+    if engine not in backends:
+        backends[engine] = _detect_backend(engine)
+    return backends[engine]
+
+
+def _write_index(conn, backend, entries, removed=()):
+    """Indexes (note id, title, full content) entries, replacing earlier ones, and drops the removed ids."""
+    values = [{'id': note_id, 'title': title, 'content': content} for note_id, title, content in entries]
+    removed = [{'id': note_id} for note_id in removed]
+
+    if backend == 'fts5':
+        if values or removed:
+            conn.execute(text(f'DELETE FROM {FTS_TABLE} WHERE rowid = :id'), values + removed)
+        if values:
+            conn.execute(text(f'INSERT INTO {FTS_TABLE}(rowid, title, content) VALUES (:id, :title, :content)'), values)
+
+    elif backend == 'tsvector':
+        if values:
+            vector = _TSVECTOR_SQL.format(title=':title', content=':content')
+            conn.execute(text(f'UPDATE notes SET {TSVECTOR_COLUMN} = {vector} WHERE id = :id'), values)
+        if removed:
+            conn.execute(text(f'UPDATE notes SET {TSVECTOR_COLUMN} = NULL WHERE id = :id'), removed)
+
+
+def _rebuild_index(conn, backend):
+    """Indexes every live note: inline bodies in one statement, blob bodies decoded in batches."""
+    if backend == 'fts5':
+        conn.execute(text(f'DELETE FROM {FTS_TABLE}'))
+        conn.execute(text(
+            f'INSERT INTO {FTS_TABLE}(rowid, title, content) '
+            f'SELECT id, title, content FROM notes WHERE content_blob IS NULL AND deleted_at IS NULL'
+        ))
+    else:
+        vector = _TSVECTOR_SQL.format(title='title', content='content')
+        conn.execute(text(f'UPDATE notes SET {TSVECTOR_COLUMN} = {vector} WHERE content_blob IS NULL'))
+
+    after_id = 0
+    while True:
+        rows = conn.execute(
+            db.select(Note.id, Note.title, NoteBlob.data)
+            .join(NoteBlob, NoteBlob.hash == Note.content_blob)
+            .where(Note.id > after_id, Note.deleted_at.is_(None))
+            .order_by(Note.id)
+            .limit(_INDEX_BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        _write_index(conn, backend, [(row.id, row.title, blob_codec.decode(row.data)) for row in rows])
+        after_id = rows[-1].id
+
+
+def rebuild_search_index():
+    """Indexes every note again, e.g. after seeding notes with statements that bypass index_notes()."""
+    backend = search_backend()
+    if backend:
+        with db.engine.begin() as conn:
+            _rebuild_index(conn, backend)
+
+
+def index_notes(entries, removed=(), session=None):
+    """
+    Writes (note id, title, full content) entries to the search index in the
+    session's transaction, and removes the ids in removed (deleted notes).
+    """
+    backend = search_backend()
+    if backend and (entries or removed):
+        _write_index((session or db.session).connection(), backend, entries, removed)
+
+
+def reindex_notes(note_ids):
+    """index_notes() for notes changed by bulk statements, reading their text (blobs decoded) back."""
+    if not note_ids or not search_backend():
+        return
+    rows = db.session.execute(
+        db.select(Note.id, Note.title, Note.content_inline, Note.deleted_at, NoteBlob.data)
+        .outerjoin(NoteBlob, NoteBlob.hash == Note.content_blob)
+        .where(Note.id.in_(note_ids))
+    ).all()
+    index_notes(
+        [(row.id, row.title, row.content_inline if row.data is None else blob_codec.decode(row.data))
+         for row in rows if row.deleted_at is None],
+        [row.id for row in rows if row.deleted_at is not None]
+    )
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _index_flushed_notes(session, flush_context):
+    """Indexes notes whose title or body a flush wrote; tombstones leave the index."""
+    entries, removed = [], []
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, Note) or not (obj in session.new or session.is_modified(obj)):
+            continue
+        if obj.deleted_at is not None:
+            removed.append(obj.id)
+        elif obj in session.new or _text_changed(obj):
+            entries.append((obj.id, obj.title, obj.content))
+    index_notes(entries, removed, session)
+
+
+def _text_changed(note):
+    state = db.inspect(note)
+    return any(state.attrs[name].history.has_changes() for name in ('title', 'content_inline', 'content_blob'))
+
+
+def parse_search_terms(q):
+    """
+    Splits a q= search string into (term, is_prefix) pairs.
+    Only word characters survive, so the result is safe to embed in
+    FTS5 MATCH and tsquery expressions.
+    """
+    return [(term.lower(), bool(star)) for term, star in _TERM_RE.findall(q)]
+
+
+def _fts_matches(match):
+    # Note ids and bm25 scores (already "lower is better"; titles weigh more than bodies)
+    return (
+        text(
+            f"SELECT rowid AS note_id, bm25({FTS_TABLE}, 10.0, 1.0) AS score "
+            f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match"
+        )
+        .bindparams(match=match)
+        .columns(note_id=Integer, score=Float)
+        .subquery('search')
+    )
+
+
+def apply_search(query, terms):
+    """
+    Restricts a Note query to notes matching every term.
+    Returns (query, score) where score is a column expression to rank by;
+    lower scores rank higher on both backends.
+    """
+    backend = search_backend()
+
+    if backend == 'fts5':
+        matches = _fts_matches(' '.join(f'"{term}"*' if prefix else f'"{term}"' for term, prefix in terms))
+        return query.join(matches, matches.c.note_id == Note.id), matches.c.score
+
+    if backend == 'tsvector':
+        tsquery = func.to_tsquery(
+            'english',
+            ' & '.join(f'{term}:*' if prefix else term for term, prefix in terms)
+        )
+        vector = literal_column(f'notes.{TSVECTOR_COLUMN}')
+        # ts_rank_cd is real; as double precision it survives the cursor's JSON round trip unchanged
+        score = -cast(func.ts_rank_cd(vector, tsquery), Float(53))
+        return query.filter(vector.op('@@')(tsquery)), score
+
+    raise RuntimeError('No full-text search backend is installed.')
+
+
+def keyword_filter(keyword):
+    """
+    Predicate for keyword=: a case-insensitive substring of the title or the
+    inline content. Blob notes keep only a prefix inline, so their full body
+    is matched through the search index instead, as a phrase of the keyword's
+    words (the last may be the start of a word). Without an index, only the
+    prefix of a blob note is searched.
+    """
+    predicate = Note.title.ilike(f'%{keyword}%') | Note.content.ilike(f'%{keyword}%')
+    words = [term for term, _ in parse_search_terms(keyword)]
+    backend = search_backend()
+    if not words or not backend:
+        return predicate
+
+    if backend == 'fts5':
+        indexed = Note.id.in_(db.select(_fts_matches('"' + ' '.join(words) + '"*').c.note_id))
+    else:
+        tsquery = func.to_tsquery('english', ' <-> '.join(words[:-1] + [f'{words[-1]}:*']))
+        indexed = literal_column(f'notes.{TSVECTOR_COLUMN}').op('@@')(tsquery)
+    return predicate | (Note.content_blob.isnot(None) & indexed)
+
+
+def substring_filter(terms):
+    """Fallback predicate matching every term as a case-insensitive substring."""
+    return db.and_(*[
+        (Note.title.ilike(f'%{term}%')) | (Note.content.ilike(f'%{term}%'))
+        for term, _ in terms
+    ])
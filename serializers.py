@@ -0,0 +1,84 @@
+import operator
+from flask import current_app, jsonify
+from sqlalchemy import DateTime
+
+try:
+    import orjson
+except ImportError:  # Optional: only used to encode note payloads faster
+    orjson = None
+
+# Precompiled serializers for API payloads.
+# A RowSerializer knows one model's public fields up front, so it can turn
+# column tuples straight into dicts (no ORM objects, no per-call schema
+# setup) with the exact values the marshmallow schemas produced: datetimes as
+# isoformat() strings, None kept as None.
+
+
+class RowSerializer:
+    """
+    Serializes rows selected with .columns (or model instances) into dicts
+    of fields. Extra trailing columns in a row are ignored. expressions maps
+    computed fields to the SQL expression that produces them; decoders maps
+    fields to (SQL expression, fn): the expression is selected after the
+    fields and fn(field value, its value) gives the serialized value.
+    """
+
+    def __init__(self, model, fields, expressions=None, decoders=None):
+        self.model = model
+        self.fields = fields
+        self.expressions = expressions or {}
+        self.decoders = decoders or {}
+        decoded = [field for field in fields if field in self.decoders]
+        self.columns = tuple(
+            self.expressions[field].label(field) if field in self.expressions else getattr(model, field)
+            for field in fields
+        ) + tuple(self.decoders[field][0].label(f'{field}_encoded') for field in decoded)
+        self._decoded = tuple(
+            (fields.index(field), len(fields) + i, self.decoders[field][1]) for i, field in enumerate(decoded)
+        )
+        self._datetimes = tuple(
+            i for i, column in enumerate(self.columns[:len(fields)]) if isinstance(column.type, DateTime)
+        )
+        attributes = operator.attrgetter(*fields)
+        self._attributes = attributes if len(fields) > 1 else lambda obj: (attributes(obj),)
+
+    def project(self, fields):
+        """Serializer for a subset of these fields; only their columns are selected."""
+        return RowSerializer(self.model, fields, self.expressions, self.decoders)
+
+    def row(self, row):
+        """Dict for one column tuple."""
+        values = list(row)
+        for i, source, decode in self._decoded:
+            values[i] = decode(values[i], values[source])
+        return self._dict(values)
+
+    def rows(self, rows):
+        """Dicts for an iterable of column tuples."""
+        return [self.row(row) for row in rows]
+
+    def dump(self, obj):
+        """Dict for a model instance (decoded fields come from its attributes)."""
+        return self._dict(list(self._attributes(obj)))
+
+    def _dict(self, values):
+        for i in self._datetimes:
+            value = values[i]
+            if value is not None:
+                values[i] = value.isoformat()
+        return dict(zip(self.fields, values))
+
+
+def json_response(payload):
+    """
+    Same response as jsonify(payload), byte for byte, encoded with orjson
+    when it is installed. Only for payloads without floats: orjson writes
+    exponents differently from the json module.
+    """
+    if orjson is None or current_app.debug:
+        return jsonify(payload)
+    body = orjson.dumps(payload, option=orjson.OPT_SORT_KEYS | orjson.OPT_APPEND_NEWLINE)
+    if not body.isascii():
+        # jsonify escapes non-ASCII characters; orjson writes them as UTF-8
+        return jsonify(payload)
+    return current_app.response_class(body, mimetype=current_app.json.mimetype)
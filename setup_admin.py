@@ -1,5 +1,6 @@
 from app import app
 from models import db, User
+from migrations import upgrade_schema
 from werkzeug.security import generate_password_hash
 
 # SAFETY CHECKS — DO NOT REMOVE
@@ -28,6 +29,7 @@ with app.app_context():
 
     # Recreate tables with updated schema
     db.create_all()
+    upgrade_schema()
     print("All tables created successfully with updated schema.")
 
     # Check if admin already exists (should be empty since we dropped all)
@@ -0,0 +1,99 @@
+"""
+Shared fixtures: every test gets its own app bound to a fresh SQLite file,
+with the schema created as `flask --app app init-db` would.
+
+Run from the repository root:
+    pip install -r requirements-dev.txt
+    python -m pytest
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('JWT_SECRET_KEY', 'test-secret-key-with-enough-length')
+os.environ.setdefault('TOMBSTONE_PURGE_INTERVAL', '0')
+os.environ.setdefault('RATELIMIT_ENABLED', 'false')
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+from app import create_app  # noqa: E402
+from config import Config  # noqa: E402
+from migrations import migrate  # noqa: E402
+from models import db, User  # noqa: E402
+
+TEST_SETTINGS = {
+    'TESTING': True,
+    'RATELIMIT_ENABLED': False,
+    'TOMBSTONE_PURGE_INTERVAL': 0,
+    'PASSWORD_HASH_WORKERS': 0,  # Hash inline; tests don't need the pool
+    'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+    'NOTE_BLOB_THRESHOLD': 1000,
+    'NOTE_BLOB_PREFIX': 300,
+    'NOTES_PREVIEW_LENGTH': 200,
+    'METRICS_ENABLED': False,
+}
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Builds an app against a new database; keyword arguments override config settings."""
+    apps = []
+
+    def make(**settings):
+        config = type('TestConfig', (Config,), {
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path}/notes-{len(apps)}.db',
+            'DATABASE_REPLICA_URLS': [],
+            **TEST_SETTINGS,
+            **settings,
+        })
+        app = create_app(config)
+        with app.app_context():
+            migrate()
+        apps.append(app)
+        return app
+
+    yield make
+    for app in apps:
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(app):
+    """Creates a user (in app, or another one) and returns headers carrying its access token."""
+    def make(username='alice', is_admin=False, app=app):
+        with app.app_context():
+            user = User(username=username, is_admin=is_admin)
+            user.set_password('secret1')
+            db.session.add(user)
+            db.session.commit()
+            token = create_access_token(identity=str(user.id))
+        return {'Authorization': f'Bearer {token}'}
+    return make
+
+
+@pytest.fixture
+def auth(make_user):
+    return make_user()
+
+
+@pytest.fixture
+def create_note(client, auth):
+    """Creates a note through the API, as auth's user unless headers say otherwise, and returns it."""
+    def create(title='Note', content='Body', headers=None):
+        response = client.post('/api/v1/notes/', json={'title': title, 'content': content}, headers=headers or auth)
+        assert response.status_code == 201, response.json
+        return response.json['note']
+    return create
@@ -0,0 +1,162 @@
+import csv
+import io
+import time
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+
+import admin as admin_module
+from models import db
+
+
+@pytest.fixture
+def admin(make_user):
+    return make_user('root', is_admin=True)
+
+
+def pages(client, admin, path, **params):
+    """Follows next_cursor through an admin listing and returns the pages' bodies."""
+    bodies, cursor = [], None
+    while True:
+        query = {**params, **({'cursor': cursor} if cursor else {})}
+        response = client.get(path, query_string=query, headers=admin)
+        assert response.status_code == 200, response.json
+        bodies.append(response.json)
+        cursor = response.json['next_cursor']
+        if cursor is None:
+            return bodies
+
+
+def test_user_listing_pages_by_id(client, admin, make_user):
+    for name in ('bob', 'carol', 'dave'):
+        make_user(name)
+
+    bodies = pages(client, admin, '/api/v1/admin/users', limit=2)
+
+    assert [[user['username'] for user in body['users']] for body in bodies] == [['root', 'bob'], ['carol', 'dave']]
+    assert set(bodies[0]['users'][0]) == {'id', 'username', 'created_at'}
+
+
+def test_note_listing_filters_and_skips_tombstones(client, auth, admin, create_note):
+    kept = [create_note('One'), create_note('Two'), create_note('Three')]
+    deleted = create_note('Gone')
+    create_note('Admin note', headers=admin)
+    client.delete(f'/api/v1/notes/{deleted["id"]}', headers=auth)
+    user_id = client.get('/api/v1/admin/users', headers=admin).json['users'][0]['id']  # alice
+
+    bodies = pages(client, admin, '/api/v1/admin/notes', user_id=user_id, limit=2)
+
+    notes = [note for body in bodies for note in body['notes']]
+    assert [note['id'] for note in notes] == [note['id'] for note in kept]
+    assert {note['user_id'] for note in notes} == {user_id}
+
+
+def test_listings_stream_in_full_with_format(client, admin, make_user):
+    for name in ('bob', 'carol'):
+        make_user(name)
+
+    response = client.get('/api/v1/admin/users?format=csv&limit=1', headers=admin)
+
+    assert response.headers['Content-Disposition'] == 'attachment; filename=users.csv'
+    rows = list(csv.DictReader(io.StringIO(response.data.decode())))
+    assert [row['username'] for row in rows] == ['root', 'bob', 'carol']
+
+
+@pytest.mark.parametrize('query', ['limit=0', 'cursor=nonsense', 'format=xml', 'user_id=bob', 'archived=maybe'])
+def test_bad_listing_parameters_are_client_errors(client, admin, query):
+    assert client.get(f'/api/v1/admin/notes?{query}', headers=admin).status_code == 400
+
+
+def test_stats_page_per_user_rows_and_count_only_live_notes(client, auth, admin, make_user, create_note):
+    bob = make_user('bob')
+    create_note('One')
+    create_note('Two', 'x' * 10)
+    gone = create_note('Gone')
+    create_note('Bob', headers=bob)
+    client.delete(f'/api/v1/notes/{gone["id"]}', headers=auth)
+
+    bodies = pages(client, admin, '/api/v1/admin/stats', limit=2)
+
+    per_user = [row for body in bodies for row in body['per_user']]
+    assert [(row['username'], row['notes']) for row in per_user] == [('alice', 2), ('root', 0), ('bob', 1)]
+    assert per_user[0]['storage_bytes'] == len('One' + 'Body' + 'Two' + 'x' * 10)
+    assert bodies[0]['totals'] == {
+        'users': 3, 'notes': 3, 'archived': 0, 'tombstones': 1, 'storage_bytes': per_user[0]['storage_bytes'] + 7,
+    }
+    # The histogram counts live notes like the totals do, not the tombstone
+    today = datetime.utcnow().date().isoformat()
+    assert bodies[0]['created_per_day'] == [{'day': today, 'notes': 3}]
+
+
+@pytest.fixture
+def doomed(client, admin, make_user, create_note):
+    """A user with five notes, and their id; alice keeps a note of her own."""
+    headers = make_user('doomed')
+    for i in range(5):
+        create_note(f'Note {i}', headers=headers)
+    create_note('Kept')
+    users = client.get('/api/v1/admin/users', headers=admin).json['users']
+    return next(user['id'] for user in users if user['username'] == 'doomed')
+
+
+def remaining(client, admin):
+    users = client.get('/api/v1/admin/users', headers=admin).json['users']
+    notes = client.get('/api/v1/admin/notes', headers=admin).json['notes']
+    return {user['username'] for user in users}, [note['title'] for note in notes]
+
+
+def poll(client, admin, status_url, timeout=5):
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get(status_url, headers=admin).json['job']
+        if job['status'] in ('done', 'failed') or time.monotonic() > deadline:
+            return job
+        time.sleep(0.05)
+
+
+def test_user_delete_runs_in_chunks(make_app, make_user):
+    app = make_app(USER_DELETE_CHUNK_SIZE=2)
+    client = app.test_client()
+    headers = make_user('doomed', app=app)
+    for i in range(5):
+        client.post('/api/v1/notes/', json={'title': f'Note {i}', 'content': 'Body'}, headers=headers)
+    admin = make_user('root', is_admin=True, app=app)
+    statements = []
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+
+    response = client.delete('/api/v1/admin/users/1', headers=admin)
+
+    assert response.status_code == 200
+    assert response.json == {'message': 'User doomed deleted'}
+    chunks = [sql for sql in statements if sql.startswith('DELETE FROM notes WHERE notes.id IN')]
+    assert len(chunks) == 3  # 2 + 2 + 1 rows
+    assert remaining(client, admin) == ({'root'}, [])
+
+
+def test_user_delete_can_run_as_a_job(client, admin, doomed):
+    response = client.delete(f'/api/v1/admin/users/{doomed}?async=true', headers=admin)
+
+    assert response.status_code == 202
+    assert response.json['job']['kind'] == 'delete_user' and response.json['job']['target_id'] == doomed
+    job = poll(client, admin, response.json['status_url'])
+    assert (job['status'], job['progress'], job['total'], job['error']) == ('done', 5, 5, None)
+    assert remaining(client, admin) == ({'alice', 'root'}, ['Kept'])
+
+
+def test_failed_jobs_report_their_error(client, admin, doomed, monkeypatch):
+    def fail(user_id, chunk_size, job=None):
+        raise RuntimeError('disk on fire')
+    monkeypatch.setattr(admin_module, '_delete_user_data', fail)
+
+    response = client.delete(f'/api/v1/admin/users/{doomed}?async=true', headers=admin)
+
+    job = poll(client, admin, response.json['status_url'])
+    assert (job['status'], job['error']) == ('failed', 'disk on fire')
+    assert 'doomed' in remaining(client, admin)[0]
+
+
+def test_unknown_users_and_jobs_are_not_found(client, admin):
+    assert client.delete('/api/v1/admin/users/999', headers=admin).status_code == 404
+    assert client.get('/api/v1/admin/jobs/999', headers=admin).status_code == 404
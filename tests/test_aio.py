@@ -0,0 +1,30 @@
+import asyncio
+
+from flask import g
+
+from aio import async_db
+from models import db, Note, User
+
+
+def test_async_session_writes_run_the_session_hooks(app, client, auth):
+    database = async_db.init_app(app)
+
+    async def write():
+        with app.test_request_context():
+            session = async_db.session
+            user_id = (await session.execute(db.select(User.id))).scalar_one()
+            note = Note(title='Written async', content='Quokka sighting', user_id=user_id)
+            session.add(note)
+            await session.commit()
+            wrote = g.get('db_wrote')
+            await async_db.remove()
+        await database.dispose()
+        return note, wrote
+
+    note, wrote = asyncio.run(write())
+
+    assert note.change_seq == 1
+    assert wrote is True
+    response = client.get('/api/v1/notes/?q=quokka', headers=auth)
+    assert [found['id'] for found in response.json['notes']] == [note.id]
+    assert [found['id'] for found in client.get('/api/v1/notes/changes', headers=auth).json['notes']] == [note.id]
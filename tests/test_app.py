@@ -0,0 +1,42 @@
+import threading
+
+from passwords import password_hasher
+from tombstones import start_compaction_job
+
+
+def compaction_threads():
+    return [t for t in threading.enumerate() if t.name == 'tombstone-compaction']
+
+
+def test_create_app_starts_no_background_job(make_app):
+    before = len(compaction_threads())
+    app = make_app(TOMBSTONE_PURGE_INTERVAL=3600)
+    assert len(compaction_threads()) == before
+
+    thread = start_compaction_job(app)
+    assert start_compaction_job(app) is thread
+    assert len(compaction_threads()) == before + 1
+
+
+def test_apps_keep_their_own_extension_state(make_app):
+    fast = make_app(PASSWORD_HASH_METHOD='pbkdf2:sha256:1000')
+    slow = make_app(PASSWORD_HASH_METHOD='pbkdf2:sha256:2000')
+
+    with fast.app_context():
+        assert password_hasher.method == 'pbkdf2:sha256:1000'
+    with slow.app_context():
+        assert password_hasher.method == 'pbkdf2:sha256:2000'
+    assert fast.extensions['password_hasher'] is not slow.extensions['password_hasher']
+
+
+def test_a_second_app_does_not_replace_the_first_apps_rate_limits(make_app):
+    limited = make_app(RATELIMIT_ENABLED=True, RATELIMIT_AUTH_PER_IP='2/minute')
+    make_app(RATELIMIT_ENABLED=False)
+    client = limited.test_client()
+
+    statuses = [
+        client.post('/api/v1/auth/login', json={'username': 'nobody', 'password': 'secret1'}).status_code
+        for _ in range(3)
+    ]
+
+    assert statuses == [401, 401, 429]
@@ -0,0 +1,40 @@
+def register(client, username='bob', password='secret1'):
+    return client.post('/api/v1/auth/register', json={'username': username, 'password': password})
+
+
+def test_register_then_login(client):
+    response = register(client)
+    assert response.status_code == 201
+    assert response.json['access_token']
+
+    response = client.post('/api/v1/auth/login', json={'username': 'bob', 'password': 'secret1'})
+    assert response.status_code == 200
+    assert response.json['access_token']
+
+
+def test_registration_errors(client):
+    register(client)
+
+    assert register(client).json == {'error': 'Username already exists'}
+    assert register(client, username='b').json['error'] == 'Validation failed'
+
+
+def test_login_rejects_a_wrong_password_or_unknown_user(client):
+    register(client)
+
+    for username, password in [('bob', 'wrong-password'), ('nobody', 'secret1')]:
+        response = client.post('/api/v1/auth/login', json={'username': username, 'password': password})
+        assert response.status_code == 401
+
+
+def test_stats_need_an_admin(client, auth, make_user, create_note):
+    assert client.get('/api/v1/admin/stats', headers=auth).status_code == 403
+
+    admin = make_user('root', is_admin=True)
+    create_note('One', headers=admin)
+    response = client.get('/api/v1/admin/stats', headers=admin)
+
+    assert response.status_code == 200
+    assert response.json['totals']['users'] == 2
+    assert response.json['totals']['notes'] == 1
+    assert client.get('/api/v1/admin/stats?days=0', headers=admin).status_code == 400
@@ -0,0 +1,94 @@
+from models import db, Note
+
+
+def batch(client, auth, operations, mode=None):
+    body = {'operations': operations}
+    if mode:
+        body['mode'] = mode
+    return client.post('/api/v1/notes/batch', json=body, headers=auth)
+
+
+def test_atomic_batch_applies_every_operation(client, auth, create_note):
+    first = create_note('First')
+    second = create_note('Second')
+    third = create_note('Third')
+
+    response = batch(client, auth, [
+        {'op': 'create', 'data': {'title': 'New', 'content': 'Fresh'}},
+        {'op': 'update', 'id': first['id'], 'data': {'content': 'Edited'}},
+        {'op': 'archive', 'id': second['id']},
+        {'op': 'delete', 'id': third['id']},
+    ])
+
+    assert response.status_code == 200
+    assert response.json['applied'] == 4
+    assert response.json['failed'] == 0
+    results = response.json['results']
+    assert [r['status'] for r in results] == [201, 200, 200, 200]
+    assert results[0]['note']['title'] == 'New'
+    assert results[1]['note']['content'] == 'Edited'
+    assert results[2]['note']['archived'] is True
+
+    listing = client.get('/api/v1/notes/', headers=auth).json['notes']
+    assert {n['title'] for n in listing} == {'First', 'Second', 'New'}
+
+
+def test_atomic_batch_rejects_everything_on_one_invalid_operation(app, client, auth, create_note):
+    note = create_note('Keep', 'Original')
+
+    response = batch(client, auth, [
+        {'op': 'create', 'data': {'title': 'New', 'content': 'Fresh'}},
+        {'op': 'update', 'id': note['id'], 'data': {'content': 'Edited'}},
+        {'op': 'delete', 'id': 999999},
+        {'op': 'update', 'id': note['id'], 'data': {}},
+    ])
+
+    assert response.status_code == 400
+    assert [(r['index'], r['status']) for r in response.json['results']] == [(2, 404), (3, 400)]
+    with app.app_context():
+        assert Note.query.count() == 1
+        assert db.session.get(Note, note['id']).content == 'Original'
+
+
+def test_partial_batch_applies_valid_operations_and_reports_the_rest(app, client, auth, make_user, create_note):
+    note = create_note('Mine', 'Original')
+    other = make_user('bob')
+    foreign = create_note('Theirs', headers=other)
+
+    response = batch(client, auth, [
+        {'op': 'update', 'id': note['id'], 'data': {'title': 'Renamed'}},
+        {'op': 'delete', 'id': foreign['id']},
+        {'op': 'archive', 'id': note['id']},
+        {'op': 'create', 'id': 5, 'data': {'title': 'x', 'content': 'y'}},
+        {'op': 'create', 'data': {'title': 'Added', 'content': 'z'}},
+    ], mode='partial')
+
+    assert response.status_code == 200
+    assert response.json['applied'] == 2
+    assert response.json['failed'] == 3
+    statuses = [r['status'] for r in response.json['results']]
+    assert statuses == [200, 404, 400, 400, 201]
+    with app.app_context():
+        assert db.session.get(Note, note['id']).title == 'Renamed'
+        assert db.session.get(Note, foreign['id']).deleted_at is None
+
+
+def test_batch_over_the_operation_limit_is_refused(make_app, make_user):
+    app = make_app(NOTES_BATCH_MAX_OPERATIONS=2)
+    auth = make_user(app=app)
+
+    response = batch(app.test_client(), auth, [{'op': 'create', 'data': {'title': 't', 'content': 'c'}}] * 3)
+
+    assert response.status_code == 413
+
+
+def test_unexpected_errors_are_logged_not_returned(app, client, auth, monkeypatch, caplog):
+    def fail(user_id, session=None):
+        raise RuntimeError('secret internal detail')
+    monkeypatch.setattr('notes.next_change_seq', fail)
+
+    response = batch(client, auth, [{'op': 'create', 'data': {'title': 'New', 'content': 'Fresh'}}])
+
+    assert response.status_code == 500
+    assert response.json == {'error': 'Internal server error'}
+    assert 'secret internal detail' in caplog.text
@@ -0,0 +1,66 @@
+from sqlalchemy import insert
+
+from models import db, Note, NoteBlob
+
+# Over the test NOTE_BLOB_THRESHOLD of 1000 characters
+LARGE = ' '.join(f'word{i}' for i in range(600))
+
+
+def test_large_note_round_trips_through_a_blob(app, client, auth, create_note):
+    note = create_note('Large', LARGE)
+    assert note['content'] == LARGE
+
+    with app.app_context():
+        row = db.session.get(Note, note['id'])
+        assert row.content_blob is not None
+        assert row.content_inline == LARGE[:300]
+        assert db.session.get(NoteBlob, row.content_blob).size < len(LARGE)
+
+    assert client.get(f'/api/v1/notes/{note["id"]}', headers=auth).json['note']['content'] == LARGE
+    assert client.get('/api/v1/notes/', headers=auth).json['notes'][0]['content'] == LARGE
+    summary = client.get('/api/v1/notes/?view=summary', headers=auth).json['notes'][0]
+    assert summary['preview'] == LARGE[:200]
+
+
+def test_identical_bodies_share_one_blob(app, client, auth, create_note):
+    create_note('One', LARGE)
+    create_note('Two', LARGE)
+
+    with app.app_context():
+        assert NoteBlob.query.count() == 1
+        assert len({n.content_blob for n in Note.query}) == 1
+
+
+def test_shrinking_a_note_moves_it_back_inline(app, client, auth, create_note):
+    note = create_note('Large', LARGE)
+
+    response = client.put(f'/api/v1/notes/{note["id"]}', json={'content': 'short'}, headers=auth)
+    assert response.json['note']['content'] == 'short'
+
+    with app.app_context():
+        row = db.session.get(Note, note['id'])
+        assert row.content_blob is None
+        assert row.content_inline == 'short'
+
+
+def test_batch_creates_large_notes_as_blobs(client, auth):
+    response = client.post('/api/v1/notes/batch', json={'operations': [
+        {'op': 'create', 'data': {'title': 'Batch', 'content': LARGE}},
+    ]}, headers=auth)
+
+    note_id = response.json['results'][0]['id']
+    assert client.get(f'/api/v1/notes/{note_id}', headers=auth).json['note']['content'] == LARGE
+
+
+def test_compress_notes_converts_existing_inline_bodies(app, client, auth):
+    with app.app_context():
+        db.session.execute(insert(Note.__table__).values(title='Old', content=LARGE, user_id=1))
+        db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['compress-notes'])
+    assert 'Compressed 1 large notes' in result.output
+
+    with app.app_context():
+        row = Note.query.one()
+        assert row.content_blob is not None
+        assert row.content == LARGE
@@ -0,0 +1,100 @@
+import time
+
+import pytest
+
+from cache import LRUCache, RedisCache, connect_redis
+
+
+def stats(app):
+    cache = app.extensions['response_cache']
+    return cache.hits, cache.misses
+
+
+def listing(client, auth):
+    response = client.get('/api/v1/notes/', headers=auth)
+    assert response.status_code == 200
+    return [(note['title'], note['content'], note['archived']) for note in response.json['notes']]
+
+
+def test_repeated_reads_are_served_from_the_cache(app, client, auth, create_note):
+    note_id = create_note('Cached')['id']
+
+    first = client.get(f'/api/v1/notes/{note_id}', headers=auth)
+    second = client.get(f'/api/v1/notes/{note_id}', headers=auth)
+
+    assert stats(app) == (1, 1)
+    assert second.data == first.data
+    assert second.headers['ETag'] == first.headers['ETag']
+
+
+@pytest.mark.parametrize('write', [
+    lambda client, auth, note_id: client.put(f'/api/v1/notes/{note_id}', json={'content': 'Changed'}, headers=auth),
+    lambda client, auth, note_id: client.patch(f'/api/v1/notes/{note_id}/archive', headers=auth),
+    lambda client, auth, note_id: client.post('/api/v1/notes/batch', json={'operations': [
+        {'op': 'update', 'id': note_id, 'data': {'content': 'Changed'}}]}, headers=auth),
+    lambda client, auth, note_id: client.post('/api/v1/notes/import', data=b'{"title": "New", "content": "x"}\n',
+                                              headers=auth),
+], ids=['update', 'archive', 'batch', 'import'])
+def test_writes_invalidate_the_writers_cached_reads(client, auth, create_note, write):
+    note_id = create_note('Cached')['id']
+    before = listing(client, auth)
+    assert listing(client, auth) == before
+
+    assert write(client, auth, note_id).status_code < 300
+
+    assert listing(client, auth) != before
+
+
+def test_a_write_leaves_other_users_cache_alone(app, client, auth, make_user, create_note):
+    other = make_user('bob')
+    create_note('Theirs', headers=other)
+    listing(client, other)
+
+    create_note('Mine')
+    listing(client, other)
+
+    assert stats(app) == (1, 1)
+
+
+def test_cache_backend_none_disables_caching(make_app, make_user):
+    app = make_app(CACHE_BACKEND='none')
+    client, auth = app.test_client(), make_user(app=app)
+
+    listing(client, auth)
+    listing(client, auth)
+
+    assert stats(app) == (0, 0)
+
+
+def test_lru_evicts_least_recently_used_entries_past_its_byte_budget():
+    cache = LRUCache(max_bytes=25, default_ttl=60)  # Two entries of 10 bytes (key and value)
+    cache.set('a', b'x' * 9)
+    cache.set('b', b'x' * 9)
+    cache.get('a')
+    cache.set('c', b'x' * 9)
+
+    assert cache.get('b') is None
+    assert cache.get('a') and cache.get('c')
+    assert cache.info() == {'entries': 2, 'bytes': 20, 'evictions': 1}
+
+
+def test_lru_entries_expire_but_generation_counters_do_not():
+    cache = LRUCache(max_bytes=1024, default_ttl=60)
+    cache.set('entry', b'value', ttl=0.01)
+    cache.incr('gen:1')
+    time.sleep(0.02)
+
+    assert cache.get('entry') is None
+    assert cache.counter('gen:1') == 1
+
+
+def test_redis_backend_keeps_entries_and_counters_under_its_prefix():
+    client = connect_redis('fake://')
+    cache = RedisCache(client, default_ttl=60)
+
+    cache.set('1:0:list', b'body')
+    assert cache.incr('gen:1') == 1
+
+    assert cache.get('1:0:list') == b'body'
+    assert cache.counter('gen:1') == 1
+    assert client.get('notes-cache:gen:1') is not None
@@ -0,0 +1,105 @@
+from datetime import datetime, timedelta
+
+from models import db, Note
+from params import encode_cursor
+
+
+def changes(client, auth, since=None, **params):
+    if since:
+        params['since'] = since
+    response = client.get('/api/v1/notes/changes', query_string=params, headers=auth)
+    assert response.status_code == 200, response.json
+    return response.json
+
+
+def test_initial_sync_returns_live_notes_and_a_token(client, auth, create_note):
+    kept = create_note('Kept')['id']
+    gone = create_note('Gone')['id']
+    client.delete(f'/api/v1/notes/{gone}', headers=auth)
+
+    page = changes(client, auth)
+
+    assert [n['id'] for n in page['notes']] == [kept]
+    assert page['deleted'] == []
+    assert page['next_token']
+    assert page['has_more'] is False
+
+
+def test_token_returns_only_later_changes_including_deletions(client, auth, create_note):
+    first = create_note('First')['id']
+    second = create_note('Second')['id']
+    token = changes(client, auth)['next_token']
+
+    assert changes(client, auth, token)['notes'] == []
+
+    client.put(f'/api/v1/notes/{first}', json={'title': 'Edited'}, headers=auth)
+    client.delete(f'/api/v1/notes/{second}', headers=auth)
+    third = create_note('Third')['id']
+
+    delta = changes(client, auth, token)
+    assert [n['id'] for n in delta['notes']] == [first, third]
+    assert delta['notes'][0]['title'] == 'Edited'
+    assert delta['deleted'] == [second]
+
+    assert changes(client, auth, delta['next_token'])['notes'] == []
+
+
+def test_pages_follow_next_token_until_has_more_is_false(client, auth, create_note):
+    ids = [create_note(f'Note {i}')['id'] for i in range(5)]
+
+    seen, token = [], None
+    while True:
+        page = changes(client, auth, token, limit=2)
+        seen += [n['id'] for n in page['notes']]
+        token = page['next_token']
+        if not page['has_more']:
+            break
+
+    assert seen == ids
+
+
+def test_malformed_and_expired_tokens(client, auth):
+    bad = client.get('/api/v1/notes/changes?since=not-a-token', headers=auth)
+    assert bad.status_code == 400
+
+    old = encode_cursor((datetime.utcnow() - timedelta(days=365)).isoformat(), 1)
+    expired = client.get('/api/v1/notes/changes', query_string={'since': old}, headers=auth)
+    assert expired.status_code == 410
+
+
+def test_change_committed_with_an_older_timestamp_is_not_skipped(app, client, auth, create_note):
+    late = create_note('Late')['id']
+    create_note('Early')
+    token = changes(client, auth)['next_token']
+
+    # A writer that stamped updated_at before the token's change but committed after it
+    with app.app_context():
+        note = db.session.get(Note, late)
+        note.title = 'Committed late'
+        note.updated_at = datetime.utcnow() - timedelta(minutes=5)
+        db.session.commit()
+
+    delta = changes(client, auth, token)
+    assert [(n['id'], n['title']) for n in delta['notes']] == [(late, 'Committed late')]
+
+
+def test_batch_changes_share_one_sequence_number(app, client, auth, create_note):
+    first = create_note('First')['id']
+    token = changes(client, auth)['next_token']
+
+    response = client.post('/api/v1/notes/batch', json={'operations': [
+        {'op': 'update', 'id': first, 'data': {'title': 'Edited'}},
+        {'op': 'create', 'data': {'title': 'Second', 'content': 'Body'}},
+    ]}, headers=auth)
+    second = response.json['results'][1]['id']
+
+    with app.app_context():
+        assert {n.change_seq for n in Note.query} == {2}
+    assert [n['id'] for n in changes(client, auth, token)['notes']] == [first, second]
+
+
+def test_token_from_before_sequence_numbers_resends_every_change(client, auth, create_note):
+    ids = [create_note(f'Note {i}')['id'] for i in range(2)]
+
+    legacy = encode_cursor(datetime.utcnow().isoformat(), ids[-1])
+    assert [n['id'] for n in changes(client, auth, legacy)['notes']] == ids
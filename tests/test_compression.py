@@ -0,0 +1,87 @@
+import gzip
+import json
+
+import pytest
+
+from compression import Compressor
+
+GZIP = {'Accept-Encoding': 'gzip'}
+
+
+@pytest.fixture
+def listing(create_note):
+    """Enough notes for the listing to pass COMPRESS_MIN_SIZE."""
+    for i in range(10):
+        create_note(f'Note {i}', 'Some repetitive note body text. ' * 10)
+    return '/api/v1/notes/'
+
+
+def test_large_responses_are_compressed_for_clients_that_accept_it(client, auth, listing):
+    plain = client.get(listing, headers=auth)
+    compressed = client.get(listing, headers={**auth, **GZIP})
+
+    assert 'Content-Encoding' not in plain.headers
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(compressed.data) == plain.data
+    assert len(compressed.data) < len(plain.data)
+    assert compressed.headers['ETag'] == plain.headers['ETag'][:-1] + '-gzip"'
+    assert 'Accept-Encoding' in plain.headers['Vary'] and 'Accept-Encoding' in compressed.headers['Vary']
+
+
+@pytest.mark.parametrize('accept', ['identity', 'gzip;q=0', 'br'])
+def test_unacceptable_encodings_are_not_used(client, auth, listing, accept):
+    assert 'Content-Encoding' not in client.get(listing, headers={**auth, 'Accept-Encoding': accept}).headers
+
+
+def test_small_responses_are_sent_as_is(client, auth, create_note):
+    create_note()
+    assert 'Content-Encoding' not in client.get('/api/v1/notes/', headers={**auth, **GZIP}).headers
+
+
+def test_compressed_etags_revalidate(client, auth, listing):
+    etag = client.get(listing, headers={**auth, **GZIP}).headers['ETag']
+
+    response = client.get(listing, headers={**auth, **GZIP, 'If-None-Match': etag})
+
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+
+
+def test_cached_listings_keep_their_compressed_body(app, client, auth, listing, monkeypatch):
+    calls = []
+    original = Compressor.compress
+
+    def compress(self, data, encoding):
+        calls.append(encoding)
+        return original(self, data, encoding)
+    monkeypatch.setattr(Compressor, 'compress', compress)
+
+    first = client.get(listing, headers={**auth, **GZIP})
+    second = client.get(listing, headers={**auth, **GZIP})
+
+    assert calls == ['gzip']  # The second response came precompressed from the cache
+    assert second.data == first.data and second.headers['Content-Encoding'] == 'gzip'
+    assert second.headers['ETag'] == first.headers['ETag']
+    assert app.extensions['response_cache'].hits == 1
+    assert len(json.loads(gzip.decompress(second.data))['notes']) == 10
+
+
+def test_uninstalled_encodings_fall_through_to_the_next(make_app, make_user):
+    app = make_app(COMPRESS_ENCODINGS=['br', 'zstd', 'gzip'], COMPRESS_MIN_SIZE=0)
+    client, auth = app.test_client(), make_user(app=app)
+    client.post('/api/v1/notes/', json={'title': 'Note', 'content': 'Body ' * 100}, headers=auth)
+    supported = app.extensions['compression'].encodings
+
+    response = client.get('/api/v1/notes/', headers={**auth, 'Accept-Encoding': ', '.join(supported)})
+
+    assert 'gzip' in supported
+    assert response.headers['Content-Encoding'] == supported[0]
+
+
+def test_compression_settings(make_app, make_user):
+    with pytest.raises(RuntimeError, match='Unknown compression encoding'):
+        make_app(COMPRESS_ENCODINGS=['lzma'])
+
+    app = make_app(COMPRESS_ENABLED=False, COMPRESS_MIN_SIZE=0)
+    response = app.test_client().get('/api/v1/notes/', headers={**make_user(app=app), **GZIP})
+    assert 'Content-Encoding' not in response.headers
@@ -0,0 +1,46 @@
+def test_note_etag_revalidates_with_304(client, auth):
+    created = client.post('/api/v1/notes/', json={'title': 'Note', 'content': 'Body'}, headers=auth)
+    note_id = created.json['note']['id']
+
+    first = client.get(f'/api/v1/notes/{note_id}', headers=auth)
+    assert first.status_code == 200
+    assert first.headers['ETag'] == created.headers['ETag']
+
+    repeat = client.get(f'/api/v1/notes/{note_id}', headers={**auth, 'If-None-Match': first.headers['ETag']})
+    assert repeat.status_code == 304
+    assert repeat.data == b''
+    assert repeat.headers['ETag'] == first.headers['ETag']
+
+    client.put(f'/api/v1/notes/{note_id}', json={'content': 'Changed'}, headers=auth)
+    changed = client.get(f'/api/v1/notes/{note_id}', headers={**auth, 'If-None-Match': first.headers['ETag']})
+    assert changed.status_code == 200
+    assert changed.json['note']['content'] == 'Changed'
+
+
+def test_listing_etag_changes_with_writes_and_query(client, auth, create_note):
+    note_id = create_note()['id']
+
+    listing = client.get('/api/v1/notes/', headers=auth)
+    etag = listing.headers['ETag']
+    assert client.get('/api/v1/notes/', headers={**auth, 'If-None-Match': etag}).status_code == 304
+    assert client.get('/api/v1/notes/?limit=5', headers={**auth, 'If-None-Match': etag}).status_code == 200
+
+    client.delete(f'/api/v1/notes/{note_id}', headers=auth)
+    after_delete = client.get('/api/v1/notes/', headers={**auth, 'If-None-Match': etag})
+    assert after_delete.status_code == 200
+    assert after_delete.json['notes'] == []
+
+
+def test_update_with_stale_if_match_is_refused_with_412(client, auth):
+    created = client.post('/api/v1/notes/', json={'title': 'Note', 'content': 'Body'}, headers=auth)
+    note_id = created.json['note']['id']
+    etag = created.headers['ETag']
+
+    updated = client.put(f'/api/v1/notes/{note_id}', json={'title': 'Mine'}, headers={**auth, 'If-Match': etag})
+    assert updated.status_code == 200
+    assert updated.headers['ETag'] != etag
+
+    stale = client.put(f'/api/v1/notes/{note_id}', json={'title': 'Theirs'}, headers={**auth, 'If-Match': etag})
+    assert stale.status_code == 412
+    assert stale.headers['ETag'] == updated.headers['ETag']
+    assert client.get(f'/api/v1/notes/{note_id}', headers=auth).json['note']['title'] == 'Mine'
@@ -0,0 +1,72 @@
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from config import Config
+from database import TimedQueuePool, async_engine_options, async_engine_url, engine_options
+from models import db
+
+SETTINGS = {
+    'DB_POOL_SIZE': 3, 'DB_MAX_OVERFLOW': 2, 'DB_POOL_TIMEOUT': 7, 'DB_POOL_PRE_PING': True,
+    'DB_POOL_RECYCLE': 600, 'DB_STATEMENT_TIMEOUT_MS': 1500,
+}
+
+
+def pragmas(app, *names):
+    with app.app_context():
+        return tuple(db.session.execute(db.text(f'PRAGMA {name}')).scalar() for name in names)
+
+
+def test_sqlite_connections_get_the_default_pragmas(app):
+    names = ('journal_mode', 'synchronous', 'foreign_keys', 'busy_timeout', 'mmap_size')
+    assert pragmas(app, *names) == ('wal', 1, 1, Config.SQLITE_BUSY_TIMEOUT_MS, Config.SQLITE_MMAP_SIZE)
+
+
+def test_sqlite_pragmas_follow_the_config(make_app):
+    app = make_app(SQLITE_JOURNAL_MODE='delete', SQLITE_SYNCHRONOUS='full', SQLITE_FOREIGN_KEYS=False,
+                   SQLITE_BUSY_TIMEOUT_MS=250)
+
+    assert pragmas(app, 'journal_mode', 'synchronous', 'foreign_keys', 'busy_timeout') == ('delete', 2, 0, 250)
+
+
+@pytest.mark.parametrize('setting', [{'SQLITE_JOURNAL_MODE': 'fast'}, {'SQLITE_SYNCHRONOUS': 'sometimes'}])
+def test_unknown_pragma_values_fail_at_startup(make_app, setting):
+    with pytest.raises(RuntimeError, match='Unknown SQLITE_'):
+        make_app(**setting)
+
+
+def test_sqlite_statements_are_interrupted_after_the_timeout(make_app):
+    app = make_app(DB_STATEMENT_TIMEOUT_MS=50)
+    endless = 'WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT count(*) FROM n'
+    with app.app_context():
+        with pytest.raises(OperationalError, match='interrupted'):
+            db.session.execute(db.text(endless))
+        db.session.rollback()
+        # The deadline is cleared with the error, so the connection stays usable
+        assert db.session.execute(db.text('SELECT 1')).scalar() == 1
+
+
+def test_the_app_engine_uses_the_timed_pool(app):
+    with app.app_context():
+        assert isinstance(db.engine.pool, TimedQueuePool)
+        assert db.engine.pool.size() == Config.DB_POOL_SIZE
+
+
+def test_engine_options_per_backend():
+    assert engine_options(SETTINGS, 'sqlite://') == {}
+    assert engine_options(SETTINGS, 'sqlite:////tmp/notes.db') == {
+        'poolclass': TimedQueuePool, 'pool_size': 3, 'max_overflow': 2, 'pool_timeout': 7,
+    }
+    postgres = engine_options(SETTINGS, 'postgresql://localhost/notes')
+    assert (postgres['pool_pre_ping'], postgres['pool_recycle']) == (True, 600)
+    assert postgres['connect_args'] == {'options': '-c statement_timeout=1500'}
+    assert async_engine_options(SETTINGS, 'postgresql://localhost/notes')['connect_args'] == {
+        'server_settings': {'statement_timeout': '1500'},
+    }
+
+
+def test_async_engine_urls():
+    assert async_engine_url('sqlite:////tmp/notes.db').drivername == 'sqlite+aiosqlite'
+    assert async_engine_url('postgresql://localhost/notes').drivername == 'postgresql+asyncpg'
+    for url in ('sqlite://', 'mysql://localhost/notes'):
+        with pytest.raises(RuntimeError):
+            async_engine_url(url)
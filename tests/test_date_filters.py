@@ -0,0 +1,49 @@
+from datetime import datetime
+
+import pytest
+
+from models import db, Note
+
+
+@pytest.fixture
+def dated(app, create_note):
+    """Notes created at 23:59 on Jan 1, midnight on Jan 2 and noon on Jan 3 (2024), by title."""
+    created = {
+        'late': datetime(2024, 1, 1, 23, 59),
+        'midnight': datetime(2024, 1, 2),
+        'noon': datetime(2024, 1, 3, 12),
+    }
+    ids = {title: create_note(title)['id'] for title in created}
+    with app.app_context():
+        for title, created_at in created.items():
+            db.session.get(Note, ids[title]).created_at = created_at
+        db.session.commit()
+
+
+def titles(client, auth, **params):
+    response = client.get('/api/v1/notes/', query_string=params, headers=auth)
+    assert response.status_code == 200, response.json
+    return sorted(note['title'] for note in response.json['notes'])
+
+
+def test_date_matches_the_whole_day(client, auth, dated):
+    assert titles(client, auth, date='2024-01-01') == ['late']
+    assert titles(client, auth, date='2024-01-02') == ['midnight']
+    assert titles(client, auth, date='2024-01-04') == []
+
+
+def test_range_includes_from_and_excludes_to(client, auth, dated):
+    assert titles(client, auth, **{'from': '2024-01-02'}) == ['midnight', 'noon']
+    assert titles(client, auth, to='2024-01-02') == ['late']
+    assert titles(client, auth, **{'from': '2024-01-01T23:00:00', 'to': '2024-01-03T12:00:00'}) == ['late', 'midnight']
+    # Aware datetimes are compared in UTC
+    assert titles(client, auth, **{'from': '2024-01-03T13:00:00+01:00'}) == ['noon']
+
+
+@pytest.mark.parametrize('params', [
+    {'date': '01/02/2024'},
+    {'from': 'yesterday'},
+    {'from': '2024-01-03', 'to': '2024-01-02'},
+])
+def test_invalid_dates_are_client_errors(client, auth, params):
+    assert client.get('/api/v1/notes/', query_string=params, headers=auth).status_code == 400
@@ -0,0 +1,63 @@
+import csv
+import gzip
+import io
+import json
+
+import pytest
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app(NOTES_EXPORT_BATCH_SIZE=2)  # Several chunks for a few notes
+
+
+@pytest.fixture
+def notes(create_note):
+    """Three notes, oldest first; one body spans lines and quotes."""
+    return [create_note('First'), create_note('Second', 'Line one\nsaid "two", three'), create_note('Third')]
+
+
+def export(client, auth, **params):
+    response = client.get('/api/v1/notes/export', query_string=params, headers=auth)
+    assert response.status_code == 200, response.data
+    return response
+
+
+def test_ndjson_export_streams_one_note_per_line_newest_first(client, auth, notes):
+    response = export(client, auth)
+
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.headers['Content-Disposition'] == 'attachment; filename=notes.ndjson'
+    assert [json.loads(line) for line in response.data.decode().splitlines()] == notes[::-1]
+
+
+def test_csv_export_has_a_header_and_keeps_multiline_bodies(client, auth, notes):
+    rows = list(csv.DictReader(io.StringIO(export(client, auth, format='csv').data.decode())))
+
+    assert [row['title'] for row in rows] == ['Third', 'Second', 'First']
+    assert rows[1]['content'] == 'Line one\nsaid "two", three'
+    assert list(rows[0]) == ['id', 'title', 'content', 'created_at', 'updated_at', 'archived']
+
+
+def test_json_export_is_one_document(client, auth, notes):
+    assert json.loads(export(client, auth, format='json').data) == {'notes': notes[::-1]}
+
+
+def test_export_applies_the_listing_filters(client, auth, notes):
+    client.patch(f'/api/v1/notes/{notes[0]["id"]}/archive', headers=auth)
+
+    lines = export(client, auth, archived='true').data.decode().splitlines()
+
+    assert [json.loads(line)['title'] for line in lines] == ['First']
+
+
+def test_export_is_compressed_when_the_client_accepts_it(client, auth, notes):
+    response = client.get('/api/v1/notes/export', headers={**auth, 'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert len(gzip.decompress(response.data).decode().splitlines()) == 3
+
+
+@pytest.mark.parametrize('params', [{'format': 'xml'}, {'date': 'yesterday'}])
+def test_invalid_export_requests_are_client_errors(client, auth, params):
+    assert client.get('/api/v1/notes/export', query_string=params, headers=auth).status_code == 400
@@ -0,0 +1,57 @@
+import pytest
+from sqlalchemy import event
+
+from models import db
+
+
+@pytest.fixture
+def notes(create_note):
+    """A short note and a long one whose body is kept in a blob."""
+    return [create_note('Short', 'Hello'), create_note('Long', 'abcdefghij' * 200)]
+
+
+def listing(client, auth, **params):
+    response = client.get('/api/v1/notes/', query_string=params, headers=auth)
+    assert response.status_code == 200, response.json
+    return response.json['notes']
+
+
+def test_summary_view_replaces_content_with_a_preview(client, auth, notes):
+    summary = listing(client, auth, view='summary')
+
+    assert [set(note) for note in summary] == [{'id', 'title', 'preview', 'created_at', 'updated_at', 'archived'}] * 2
+    assert summary[0]['preview'] == ('abcdefghij' * 200)[:200]
+    assert summary[1]['preview'] == 'Hello'
+
+
+def test_fields_keeps_only_the_requested_fields(client, auth, notes):
+    assert listing(client, auth, fields='title, id,title') == [
+        {'title': 'Long', 'id': notes[1]['id']}, {'title': 'Short', 'id': notes[0]['id']},
+    ]
+    assert listing(client, auth, view='summary', fields='preview') == [{'preview': ('abcdefghij' * 200)[:200]}, {'preview': 'Hello'}]
+
+
+def test_pages_follow_the_cursor_whatever_the_fields(client, auth, notes):
+    first = client.get('/api/v1/notes/?fields=title&limit=1', headers=auth).json
+    second = client.get(f'/api/v1/notes/?fields=title&limit=1&cursor={first["next_cursor"]}', headers=auth).json
+
+    assert first['notes'] + second['notes'] == [{'title': 'Long'}, {'title': 'Short'}]
+    assert second['next_cursor'] is None
+
+
+def test_unrequested_bodies_are_not_selected(app, client, auth, notes):
+    statements = []
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+
+    listing(client, auth, fields='id,title')
+
+    selects = [sql for sql in statements if 'FROM notes' in sql and 'notes.title' in sql]
+    assert selects and not any('content' in sql or 'note_blobs' in sql for sql in selects)
+
+
+@pytest.mark.parametrize('params', [
+    {'view': 'tiny'}, {'fields': ''}, {'fields': 'id,bogus'}, {'view': 'summary', 'fields': 'content'},
+])
+def test_unknown_views_and_fields_are_client_errors(client, auth, params):
+    assert client.get('/api/v1/notes/', query_string=params, headers=auth).status_code == 400
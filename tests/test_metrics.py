@@ -0,0 +1,69 @@
+import re
+
+from models import db
+from metrics import Histogram
+
+
+def sample(text, name, **labels):
+    """The value of one series in a Prometheus text exposition, or None."""
+    pattern = re.escape(name) + r'\{([^}]*)\} (\S+)$'
+    for match in re.finditer(pattern, text, re.MULTILINE):
+        found = dict(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', match.group(1)))
+        if found == {key: str(value) for key, value in labels.items()}:
+            return float(match.group(2))
+    return None
+
+
+def test_metrics_are_off_unless_enabled(client):
+    assert client.get('/metrics').status_code == 404
+
+
+def test_requests_and_their_queries_are_measured(make_app, make_user):
+    app = make_app(METRICS_ENABLED=True)
+    client = app.test_client()
+    auth = make_user(app=app)
+    for _ in range(3):
+        client.get('/api/v1/notes/', headers=auth)
+
+    response = client.get('/metrics')
+
+    assert response.mimetype == 'text/plain'
+    text = response.data.decode()
+    labels = {'method': 'GET', 'endpoint': 'notes.get_notes', 'status': 200}
+    assert sample(text, 'http_request_duration_seconds_count', **labels) == 3
+    assert sample(text, 'http_request_duration_seconds_bucket', **labels, le='+Inf') == 3
+    assert sample(text, 'db_queries_per_request_count', endpoint='notes.get_notes') == 3
+    assert sample(text, 'db_queries_per_request_sum', endpoint='notes.get_notes') > 0
+    assert sample(text, 'db_pool_connections', pool='primary', state='capacity') > 0
+
+
+def test_slow_and_repeated_statements_are_counted(make_app, capsys):
+    app = make_app(METRICS_ENABLED=True, SLOW_QUERY_MS=0, N_PLUS_ONE_THRESHOLD=3)
+
+    @app.route('/loop')
+    def loop():
+        for _ in range(5):
+            db.session.execute(db.text('SELECT 1'))
+        return 'ok'
+
+    client = app.test_client()
+    client.get('/loop')
+    text = client.get('/metrics').data.decode()
+
+    assert sample(text, 'db_slow_queries_total', endpoint='loop') == 5
+    assert sample(text, 'db_n_plus_one_total', endpoint='loop') == 1  # Flagged once per request
+    assert 'Possible N+1 in loop: statement ran 3 times' in capsys.readouterr().out
+
+
+def test_histogram_buckets_are_cumulative_and_labels_escaped():
+    histogram = Histogram('t', 'Test.', ('path',), (1, 5))
+    for value in (0.5, 3, 3, 10):
+        histogram.observe(value, 'a"b')
+
+    assert histogram.render()[2:] == [
+        't_bucket{path="a\\"b",le="1"} 1',
+        't_bucket{path="a\\"b",le="5"} 3',
+        't_bucket{path="a\\"b",le="+Inf"} 4',
+        't_sum{path="a\\"b"} 16.5',
+        't_count{path="a\\"b"} 4',
+    ]
@@ -0,0 +1,44 @@
+from datetime import datetime
+
+from models import db, Note
+
+
+def pages(client, auth, **params):
+    """Follows next_cursor from the first page; returns the id lists of every page."""
+    result, cursor = [], None
+    while True:
+        response = client.get('/api/v1/notes/', query_string={**params, **({'cursor': cursor} if cursor else {})},
+                              headers=auth)
+        assert response.status_code == 200, response.json
+        result.append([note['id'] for note in response.json['notes']])
+        cursor = response.json['next_cursor']
+        if cursor is None:
+            return result
+
+
+def test_cursor_pages_cover_every_note_once_newest_first(client, auth, create_note):
+    newest = [create_note(f'Note {i}')['id'] for i in range(5)][::-1]
+
+    assert pages(client, auth, limit=2) == [newest[:2], newest[2:4], newest[4:]]
+
+
+def test_notes_created_at_the_same_instant_are_ordered_by_id(app, client, auth, create_note):
+    ids = [create_note(f'Note {i}')['id'] for i in range(4)]
+    with app.app_context():
+        db.session.execute(db.update(Note).values(created_at=datetime(2024, 1, 1)))
+        db.session.commit()
+
+    assert sum(pages(client, auth, limit=3), []) == ids[::-1]
+
+
+def test_last_full_page_has_no_next_cursor(client, auth, create_note):
+    create_note()
+    create_note()
+
+    assert pages(client, auth, limit=2) == [[2, 1]]
+
+
+def test_invalid_cursor_or_limit_is_a_client_error(client, auth):
+    for params in ({'cursor': 'not-a-cursor'}, {'limit': 0}, {'limit': 'ten'}, {'limit': 10_000}):
+        response = client.get('/api/v1/notes/', query_string=params, headers=auth)
+        assert response.status_code == 400, params
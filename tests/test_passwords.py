@@ -0,0 +1,45 @@
+import asyncio
+import os
+import signal
+import time
+
+import pytest
+from werkzeug.security import check_password_hash
+
+from passwords import HashingBusy, password_hasher
+
+
+def test_broken_pool_is_replaced_and_the_job_retried(make_app):
+    app = make_app(PASSWORD_HASH_WORKERS=1)
+    with app.app_context():
+        first = password_hasher.hash('secret1')
+        broken = password_hasher._pool()
+        for process in list(broken._processes.values()):
+            os.kill(process.pid, signal.SIGKILL)
+            process.join()
+
+        second = password_hasher.hash('secret1')
+
+        assert password_hasher._pool() is not broken
+        assert check_password_hash(first, 'secret1') and check_password_hash(second, 'secret1')
+        assert password_hasher.verify(second, 'secret1')
+        password_hasher._pool().shutdown()
+
+
+def test_a_timed_out_job_keeps_its_slot_until_it_finishes(make_app):
+    app = make_app(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_QUEUE_DEPTH=0, PASSWORD_HASH_TIMEOUT=0.2)
+    with app.app_context():
+        hasher = password_hasher._get_current_object()
+        with pytest.raises(HashingBusy, match='timed out'):
+            hasher._run(time.sleep, 1.5)
+        # The sleep still occupies the only worker, so nothing else is let in
+        with pytest.raises(HashingBusy, match='queue is full'):
+            hasher.hash('secret1')
+        with pytest.raises(HashingBusy, match='queue is full'):
+            asyncio.run(hasher.hash_async('secret1'))
+
+        time.sleep(2)
+        hasher.timeout = 30
+        assert check_password_hash(hasher.hash('secret1'), 'secret1')
+        assert check_password_hash(asyncio.run(hasher.hash_async('secret1')), 'secret1')
+        hasher._pool().shutdown()
@@ -0,0 +1,58 @@
+from models import db, User
+from principals import principal_cache
+
+
+def set_admin(app, username, is_admin, orm=True):
+    """Flips a user's role through the ORM (which invalidates) or a bulk UPDATE (which doesn't)."""
+    with app.app_context():
+        if orm:
+            db.session.execute(db.select(User).filter_by(username=username)).scalar_one().is_admin = is_admin
+        else:
+            db.session.execute(db.update(User).where(User.username == username).values(is_admin=is_admin))
+        db.session.commit()
+
+
+def admin_status(client, headers):
+    return client.get('/api/v1/admin/users', headers=headers).status_code
+
+
+def test_principal_is_cached_until_the_user_row_changes(app, client, make_user):
+    root = make_user('root', is_admin=True)
+    assert admin_status(client, root) == 200
+
+    # Writes that skip the ORM aren't seen until the entry expires
+    set_admin(app, 'root', False, orm=False)
+    assert admin_status(client, root) == 200
+
+    set_admin(app, 'root', False)
+    assert admin_status(client, root) == 403
+
+
+def test_deleting_a_user_drops_their_principal(app, client, make_user):
+    root = make_user('root', is_admin=True)
+    victim = make_user('victim', is_admin=True)
+    assert admin_status(client, victim) == 200
+
+    with app.app_context():
+        victim_id = db.session.execute(db.select(User.id).filter_by(username='victim')).scalar_one()
+    assert client.delete(f'/api/v1/admin/users/{victim_id}', headers=root).status_code == 200
+
+    assert admin_status(client, victim) == 403
+
+
+def test_unknown_users_are_not_cached(app, make_user):
+    with app.app_context():
+        assert principal_cache.load('999') is None
+        make_user('bob')
+        bob_id = db.session.execute(db.select(User.id).filter_by(username='bob')).scalar_one()
+        assert principal_cache.load(str(bob_id)) == (bob_id, 'bob', False)
+
+
+def test_zero_ttl_disables_the_cache(make_app, make_user):
+    app = make_app(PRINCIPAL_CACHE_TTL=0)
+    client = app.test_client()
+    root = make_user('root', is_admin=True, app=app)
+    assert admin_status(client, root) == 200
+
+    set_admin(app, 'root', False, orm=False)
+    assert admin_status(client, root) == 403
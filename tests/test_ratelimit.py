@@ -0,0 +1,84 @@
+import pytest
+
+import ratelimit
+from ratelimit import MemoryBuckets, parse_rate
+
+LIMITED = {'RATELIMIT_ENABLED': True, 'RATELIMIT_NOTES_PER_IP': '3/minute', 'RATELIMIT_NOTES_PER_USER': 'none'}
+
+
+def headers_of(response):
+    return {name: response.headers.get(name) for name in ('RateLimit-Limit', 'RateLimit-Remaining', 'Retry-After')}
+
+
+@pytest.mark.parametrize('backend', [{}, {'RATELIMIT_BACKEND': 'redis', 'RATELIMIT_REDIS_URL': 'fake://'}])
+def test_responses_count_down_then_answer_429(make_app, make_user, backend):
+    app = make_app(**LIMITED, **backend)
+    client, auth = app.test_client(), make_user(app=app)
+
+    responses = [client.get('/api/v1/notes/', headers=auth) for _ in range(4)]
+
+    assert [response.status_code for response in responses] == [200, 200, 200, 429]
+    assert [headers_of(response) for response in responses] == [
+        {'RateLimit-Limit': '3', 'RateLimit-Remaining': '2', 'Retry-After': None},
+        {'RateLimit-Limit': '3', 'RateLimit-Remaining': '1', 'Retry-After': None},
+        {'RateLimit-Limit': '3', 'RateLimit-Remaining': '0', 'Retry-After': None},
+        {'RateLimit-Limit': '3', 'RateLimit-Remaining': '0', 'Retry-After': '20'},  # One token per 20 s
+    ]
+    assert responses[-1].json == {'error': 'Too many requests'}
+
+
+def test_users_have_their_own_budgets(make_app, make_user):
+    app = make_app(RATELIMIT_ENABLED=True, RATELIMIT_NOTES_PER_IP='100/minute', RATELIMIT_NOTES_PER_USER='2/minute')
+    client = app.test_client()
+    alice, bob = make_user(app=app), make_user('bob', app=app)
+
+    statuses = [client.get('/api/v1/notes/', headers=alice).status_code for _ in range(3)]
+    response = client.get('/api/v1/notes/', headers=bob)
+
+    assert statuses == [200, 200, 429]
+    # The user's bucket is the tighter one, so it is the one reported
+    assert (response.status_code, headers_of(response)['RateLimit-Limit']) == (200, '2')
+
+
+def test_transfer_routes_share_the_notes_budget(make_app, make_user):
+    app = make_app(**LIMITED)
+    client, auth = app.test_client(), make_user(app=app)
+
+    statuses = [client.get(path, headers=auth).status_code
+                for path in ('/api/v1/notes/', '/api/v1/notes/export', '/api/v1/notes/', '/api/v1/notes/export')]
+
+    assert statuses == [200, 200, 200, 429]
+
+
+def test_an_unreachable_store_lets_requests_through(make_app, make_user, monkeypatch):
+    app = make_app(**LIMITED)
+    client, auth = app.test_client(), make_user(app=app)
+
+    def unreachable(self, key, capacity, rate):
+        raise ConnectionError('store down')
+    monkeypatch.setattr(MemoryBuckets, 'take', unreachable)
+
+    response = client.get('/api/v1/notes/', headers=auth)
+    assert response.status_code == 200
+    assert 'RateLimit-Limit' not in response.headers
+
+
+def test_buckets_refill_over_time(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ratelimit.time, 'monotonic', lambda: now[0])
+    buckets = MemoryBuckets(max_keys=10)
+    capacity, rate = parse_rate('2/second')
+
+    assert [buckets.take('k', capacity, rate)[0] for _ in range(3)] == [True, True, False]
+    now[0] += 0.5
+    assert buckets.take('k', capacity, rate) == (True, 0.0)
+
+
+def test_rates_are_parsed_and_checked(make_app):
+    assert parse_rate('20/minute') == (20, 20 / 60)
+    assert parse_rate('none') is None
+    for bad in ('many/minute', '5/fortnight', '0/second'):
+        with pytest.raises(RuntimeError, match='Invalid rate limit'):
+            parse_rate(bad)
+    with pytest.raises(RuntimeError, match='Invalid rate limit'):
+        make_app(RATELIMIT_ENABLED=True, RATELIMIT_ADMIN_PER_IP='lots')
@@ -0,0 +1,54 @@
+import pytest
+
+from models import db
+from replicas import copy_sqlite_replicas, replica_router
+
+
+@pytest.fixture
+def replicated(make_app, make_user, tmp_path):
+    """An app reading from a SQLite replica that is only refreshed by sync()."""
+    app = make_app(DATABASE_REPLICA_URLS=[f'sqlite:///{tmp_path}/replica.db'], CACHE_BACKEND='none')
+    auth = make_user(app=app)
+
+    def sync():
+        with app.app_context():
+            copy_sqlite_replicas(db.engine.url, [engine.url for engine in replica_router.replicas])
+
+    sync()
+    return app.test_client(), auth, sync
+
+
+def titles(client, auth):
+    return [n['title'] for n in client.get('/api/v1/notes/', headers=auth).json['notes']]
+
+
+def test_reads_use_the_replica_until_it_catches_up(replicated, make_user):
+    client, auth, sync = replicated
+    other = make_user('bob', app=client.application)
+    client.post('/api/v1/notes/', json={'title': 'Theirs', 'content': 'x'}, headers=other)
+
+    # bob wrote, alice didn't: alice still reads the stale replica
+    sync()
+    client.post('/api/v1/notes/', json={'title': 'Later', 'content': 'x'}, headers=other)
+    assert titles(client, other) == ['Later', 'Theirs']
+    assert titles(client, auth) == []
+
+
+def test_batch_pins_the_writer_to_the_primary(replicated):
+    client, auth, sync = replicated
+
+    response = client.post('/api/v1/notes/batch', json={'operations': [
+        {'op': 'create', 'data': {'title': 'Batched', 'content': 'x'}},
+    ]}, headers=auth)
+    assert response.status_code == 200
+
+    assert titles(client, auth) == ['Batched']
+
+
+def test_import_pins_the_writer_to_the_primary(replicated):
+    client, auth, sync = replicated
+
+    response = client.post('/api/v1/notes/import', data=b'{"title": "Imported", "content": "x"}\n', headers=auth)
+    assert response.json['imported'] == 1
+
+    assert titles(client, auth) == ['Imported']
@@ -0,0 +1,132 @@
+import json
+
+import pytest
+from sqlalchemy import text
+
+import search
+from migrations import migrate
+from models import db
+
+# Over the test NOTE_BLOB_THRESHOLD of 1000 characters, with its last words
+# past the 300 characters kept inline
+LARGE = ' '.join(f'filler{i}' for i in range(150)) + ' zebra crossing'
+
+
+def found(client, auth, **params):
+    response = client.get('/api/v1/notes/', query_string=params, headers=auth)
+    assert response.status_code == 200
+    return [note['id'] for note in response.json['notes']]
+
+
+def test_search_sees_the_whole_body_of_a_blob_note(client, auth, create_note):
+    note_id = create_note('Large', LARGE)['id']
+
+    assert found(client, auth, q='zebra') == [note_id]
+    assert found(client, auth, q='cross*') == [note_id]
+    assert found(client, auth, keyword='zebra cross') == [note_id]
+    assert found(client, auth, keyword='zebra') == [note_id]
+
+
+def test_updates_and_deletions_reach_the_index(client, auth, create_note):
+    note_id = create_note('Large', LARGE)['id']
+
+    client.put(f'/api/v1/notes/{note_id}', json={'content': LARGE.replace('zebra', 'okapi')}, headers=auth)
+    assert found(client, auth, q='zebra') == []
+    assert found(client, auth, q='okapi') == [note_id]
+
+    client.put(f'/api/v1/notes/{note_id}', json={'title': 'Renamed'}, headers=auth)
+    assert found(client, auth, q='renamed okapi') == [note_id]
+
+    client.delete(f'/api/v1/notes/{note_id}', headers=auth)
+    assert found(client, auth, q='okapi') == []
+
+
+def test_batch_and_import_index_whole_bodies(client, auth):
+    response = client.post('/api/v1/notes/batch', json={'operations': [
+        {'op': 'create', 'data': {'title': 'Batch', 'content': LARGE}},
+    ]}, headers=auth)
+    batch_id = response.json['results'][0]['id']
+
+    record = json.dumps({'title': 'Imported', 'content': LARGE.replace('zebra', 'okapi')})
+    assert client.post('/api/v1/notes/import', data=record + '\n', headers=auth).json['imported'] == 1
+
+    assert found(client, auth, q='zebra') == [batch_id]
+    assert len(found(client, auth, q='okapi')) == 1
+
+
+def test_keyword_matches_past_the_inline_prefix_by_words_only(client, auth, create_note):
+    note_id = create_note('Large', LARGE)['id']
+
+    assert found(client, auth, keyword='iller1') == [note_id]  # Any substring of the inline prefix
+    assert found(client, auth, keyword='ebra') == []  # Past it, the index matches words and word starts
+
+
+@pytest.fixture
+def legacy_index(app, create_note):
+    """A note indexed by the earlier external-content FTS5 table, which saw only the inline prefix."""
+    note_id = create_note('Large', LARGE)['id']
+    with app.app_context(), db.engine.begin() as conn:
+        conn.execute(text('DROP TRIGGER notes_fts_ad'))
+        conn.execute(text('DROP TABLE notes_fts'))
+        conn.execute(text(
+            "CREATE VIRTUAL TABLE notes_fts USING fts5(title, content, content='notes', content_rowid='id')"
+        ))
+        conn.execute(text(
+            "CREATE TRIGGER notes_fts_ai AFTER INSERT ON notes BEGIN "
+            "INSERT INTO notes_fts(rowid, title, content) VALUES (new.id, new.title, new.content); END"
+        ))
+        conn.execute(text("INSERT INTO notes_fts(notes_fts) VALUES ('rebuild')"))
+    app.extensions['search_backends'].clear()
+    return note_id
+
+
+def test_legacy_index_is_not_used_until_migrated(app, client, auth, legacy_index):
+    with app.app_context():
+        assert search.search_backend() is None
+
+        migrate()
+        assert search.search_backend() == 'fts5'
+
+    app.extensions['search_backends'].clear()  # As in a worker that didn't run the migration
+    assert found(client, auth, q='zebra') == [legacy_index]
+
+
+def test_apps_on_one_database_detect_the_backend_for_themselves(make_app, app, legacy_index):
+    with app.app_context():
+        assert search.search_backend() is None
+
+    # A second app on the same URL migrates it; each app answers from what it installed or detected itself
+    other = make_app(SQLALCHEMY_DATABASE_URI=app.config['SQLALCHEMY_DATABASE_URI'])
+    with other.app_context():
+        assert search.search_backend() == 'fts5'
+    with app.app_context():
+        assert search.search_backend() is None
+
+
+def test_ranked_pages_with_tied_scores_cover_every_match_once(client, auth, create_note):
+    ids = {create_note(f'Note {i}', 'budget review')['id'] for i in range(5)}
+
+    seen, cursor = [], None
+    while True:
+        params = {'q': 'budget', 'limit': 2, **({'cursor': cursor} if cursor else {})}
+        response = client.get('/api/v1/notes/', query_string=params, headers=auth)
+        seen += [note['id'] for note in response.json['notes']]
+        cursor = response.json['next_cursor']
+        if cursor is None:
+            break
+
+    assert sorted(seen) == sorted(ids)
+
+
+def test_postgres_rank_is_ordered_and_compared_as_double_precision(app, monkeypatch):
+    from sqlalchemy.dialects import postgresql
+    from models import Note
+
+    monkeypatch.setattr(search, 'search_backend', lambda: 'tsvector')
+    with app.app_context():
+        query, score = search.apply_search(Note.query, [('budget', False)])
+        sql = str(db.select(Note.id).where(db.tuple_(score, Note.id) > (0.5, 1)).order_by(score)
+                  .compile(dialect=postgresql.dialect()))
+
+    assert sql.count('CAST(ts_rank_cd(notes.search_vector, to_tsquery(') == 2
+    assert sql.count('AS FLOAT(53))') == 2  # double precision
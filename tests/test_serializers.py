@@ -0,0 +1,52 @@
+from datetime import datetime
+
+import pytest
+from flask import jsonify
+
+from models import db, Note, User, note_serializer
+from notes import NoteSchema
+from serializers import json_response
+
+
+@pytest.fixture
+def notes(app, make_user):
+    """Notes covering the awkward cases: whole-second and missing timestamps, non-ASCII text, a blob body."""
+    make_user()
+    with app.app_context():
+        user = db.session.execute(db.select(User)).scalar_one()
+        db.session.add_all([
+            Note(title='Plain', content='Body', user_id=user.id, created_at=datetime(2024, 1, 2, 3, 4, 5, 6)),
+            Note(title='Whole second', content='Body', user_id=user.id, created_at=datetime(2024, 1, 2),
+                 updated_at=None, archived=True),
+            Note(title='Ünïcødé ✓', content='«quotes» and   separators', user_id=user.id),
+            Note(title='Large', content='x' * 5000, user_id=user.id),
+        ])
+        db.session.commit()
+    return app
+
+
+def test_serializer_matches_note_schema(notes):
+    with notes.app_context():
+        objects = db.session.execute(db.select(Note).order_by(Note.id)).scalars().all()
+        rows = db.session.execute(db.select(*note_serializer.columns).order_by(Note.id)).all()
+        expected = NoteSchema(many=True).dump(objects)
+
+        assert objects[3].content_blob is not None  # Decoded from its blob row, not the inline prefix
+        assert note_serializer.rows(rows) == expected
+        assert [note_serializer.dump(obj) for obj in objects] == expected
+
+
+def test_json_response_is_byte_identical_to_jsonify(notes):
+    with notes.app_context(), notes.test_request_context():
+        objects = db.session.execute(db.select(Note).order_by(Note.id)).scalars().all()
+        # ASCII-only notes go through orjson; the rest fall back to jsonify
+        for payload in ({'notes': NoteSchema(many=True).dump(objects[:2])}, {'notes': NoteSchema(many=True).dump(objects)}):
+            assert json_response(payload).data == jsonify(payload).data
+            assert json_response(payload).mimetype == 'application/json'
+
+
+def test_projected_serializers_select_only_their_columns():
+    projected = note_serializer.project(('id', 'title'))
+
+    assert [column.key for column in projected.columns] == ['id', 'title']
+    assert projected.row((1, 'Title')) == {'id': 1, 'title': 'Title'}
@@ -0,0 +1,100 @@
+import pytest
+
+from events import note_events
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app(SSE_MAX_STREAMS=1, SSE_MAX_SECONDS=1, SSE_HEARTBEAT_SECONDS=0.1)
+
+
+def ticket(client, auth):
+    response = client.post('/api/v1/notes/stream/ticket', headers=auth)
+    assert response.status_code == 200
+    return response.json['ticket']
+
+
+def open_stream(client, **params):
+    return client.get('/api/v1/notes/stream', query_string=params, buffered=False)
+
+
+def test_ticket_opens_the_stream(client, auth):
+    response = open_stream(client, ticket=ticket(client, auth))
+    try:
+        assert response.status_code == 200
+        assert response.mimetype == 'text/event-stream'
+        assert next(response.response).startswith(b'retry: ')
+    finally:
+        response.close()
+
+
+def test_authorization_header_opens_the_stream(client, auth):
+    response = client.get('/api/v1/notes/stream', headers=auth, buffered=False)
+    assert response.status_code == 200
+    response.close()
+
+
+def test_stream_refuses_bad_tickets_and_url_tokens(client, auth):
+    assert open_stream(client, ticket='forged').status_code == 401
+    assert open_stream(client).status_code == 401
+
+    # Access tokens are not accepted in the URL
+    token = auth['Authorization'].split(' ', 1)[1]
+    assert open_stream(client, jwt=token).status_code == 401
+
+
+def test_expired_ticket_is_refused(make_app, make_user):
+    app = make_app(SSE_TICKET_SECONDS=-1)
+    client = app.test_client()
+
+    response = open_stream(client, ticket=ticket(client, make_user(app=app)))
+
+    assert response.status_code == 401
+    assert response.json['error'] == 'Invalid or expired stream ticket.'
+
+
+def test_streams_past_the_cap_get_503_until_one_closes(app, client, auth):
+    first = open_stream(client, ticket=ticket(client, auth))
+    assert first.status_code == 200
+
+    busy = open_stream(client, ticket=ticket(client, auth))
+    assert busy.status_code == 503
+    assert busy.headers['Retry-After'] == '30'
+
+    first.close()
+    with app.app_context():
+        assert note_events._streams == 0
+    second = open_stream(client, ticket=ticket(client, auth))
+    assert second.status_code == 200
+    second.close()
+
+
+def frames(response):
+    """The stream's text until the server ends it (after SSE_MAX_SECONDS)."""
+    try:
+        return b''.join(response.response).decode()
+    finally:
+        response.close()
+
+
+def test_stream_replays_changes_after_the_token(client, auth, create_note):
+    create_note('Seen')
+    token = client.get('/api/v1/notes/changes', headers=auth).json['next_token']
+    note_id = create_note('Missed')['id']
+
+    body = frames(open_stream(client, ticket=ticket(client, auth), since=token))
+
+    assert body.count('event: updated') == 1
+    assert f'"id":{note_id}' in body and 'Missed' in body
+
+
+def test_stream_delivers_live_events(client, auth, create_note):
+    response = open_stream(client, ticket=ticket(client, auth))
+    chunks = iter(response.response)
+    assert next(chunks).startswith(b'retry: ')
+
+    note_id = create_note('Live')['id']
+    body = b''.join(chunks).decode()
+    response.close()
+
+    assert 'event: created' in body and f'"id":{note_id}' in body
@@ -0,0 +1,31 @@
+import gzip
+import json
+
+import pytest
+
+
+def ndjson(*titles):
+    return ''.join(json.dumps({'title': t, 'content': 'Body'}) + '\n' for t in titles).encode()
+
+
+def upload(client, auth, body, **headers):
+    return client.post('/api/v1/notes/import', data=body, headers={**auth, **headers})
+
+
+def test_gzip_upload_is_imported(client, auth):
+    response = upload(client, auth, gzip.compress(ndjson('One', 'Two')), **{'Content-Encoding': 'gzip'})
+
+    assert response.status_code == 200
+    assert response.json['imported'] == 2
+
+
+@pytest.mark.parametrize('body', [
+    gzip.compress(ndjson('One', 'Two'))[:-12],  # Truncated: no trailer
+    b'\x1f\x8b\x08\x00' + b'\x00' * 6 + b'not deflate data',  # Corrupt deflate stream
+    b'plain text, not gzip',
+], ids=['truncated', 'corrupt', 'not-gzip'])
+def test_broken_gzip_upload_is_a_client_error(client, auth, body):
+    response = upload(client, auth, body, **{'Content-Encoding': 'gzip'})
+
+    assert response.status_code == 400
+    assert response.json['error'] == 'Malformed upload'
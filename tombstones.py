@@ -0,0 +1,98 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from models import db, Note, NoteBlob
+
+# Compaction of deleted-note tombstones.
+# Tombstones only need to live as long as a change token stays valid
+# (TOMBSTONE_RETENTION_DAYS); after that they are purged in small batches
+# so no single transaction holds locks for long. Note blobs no longer
+# referenced by any note (edited, deleted or purged) go in the same pass.
+
+# Blobs stored or reused this recently may belong to a note not committed yet
+BLOB_GRACE_PERIOD = timedelta(hours=1)
+
+
+def purge_tombstones(retention_days, batch_size):
+    """Deletes tombstones older than the retention window. Returns the count."""
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    purged = 0
+
+    while True:
+        ids = db.session.scalars(
+            db.select(Note.id)
+            .where(Note.deleted_at.is_not(None), Note.deleted_at < cutoff)
+            .limit(batch_size)
+        ).all()
+        if not ids:
+            break
+        db.session.execute(
+            db.delete(Note)
+            .where(Note.id.in_(ids))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        purged += len(ids)
+
+    return purged
+
+
+def purge_orphan_blobs(batch_size):
+    """Deletes note blobs that no note references any more. Returns the count."""
+    cutoff = datetime.utcnow() - BLOB_GRACE_PERIOD
+    orphaned = (NoteBlob.stored_at < cutoff) & ~db.select(Note.id).where(Note.content_blob == NoteBlob.hash).exists()
+    purged = 0
+
+    while True:
+        hashes = db.session.scalars(db.select(NoteBlob.hash).where(orphaned).limit(batch_size)).all()
+        if not hashes:
+            break
+        # Checked again on delete, in case a note started using a blob meanwhile
+        result = db.session.execute(
+            db.delete(NoteBlob)
+            .where(NoteBlob.hash.in_(hashes), orphaned)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        purged += result.rowcount
+
+    return purged
+
+
+def start_compaction_job(app):
+    """
+    Runs purge_tombstones and purge_orphan_blobs every
+    TOMBSTONE_PURGE_INTERVAL seconds in a daemon thread, once per app.
+    Server processes start it (gunicorn.conf.py, the ASGI lifespan, the
+    development server); each gunicorn worker runs its own, and purges are
+    idempotent. Returns the thread, or None when the job is disabled.
+    """
+    interval = app.config['TOMBSTONE_PURGE_INTERVAL']
+    if interval <= 0:
+        return None
+    if 'compaction_job' in app.extensions:
+        return app.extensions['compaction_job']
+
+    def run():
+        while True:
+            time.sleep(interval)
+            with app.app_context():
+                try:
+                    purged = purge_tombstones(
+                        app.config['TOMBSTONE_RETENTION_DAYS'],
+                        app.config['TOMBSTONE_PURGE_BATCH_SIZE']
+                    )
+                    if purged:
+                        print(f"Purged {purged} note tombstones")
+                    blobs = purge_orphan_blobs(app.config['TOMBSTONE_PURGE_BATCH_SIZE'])
+                    if blobs:
+                        print(f"Purged {blobs} unreferenced note blobs")
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Error during tombstone compaction: {e}")
+                finally:
+                    db.session.remove()
+
+    thread = app.extensions['compaction_job'] = threading.Thread(target=run, name='tombstone-compaction', daemon=True)
+    thread.start()
+    return thread
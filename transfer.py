@@ -0,0 +1,244 @@
+import csv
+import gzip
+import io
+import json
+import zlib
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from marshmallow import EXCLUDE, ValidationError
+from sqlalchemy import insert
+from models import db, Note, next_change_seq, note_serializer
+from cache import response_cache
+from compression import compression
+from notes import NoteSchema, filtered_notes_query
+from search import index_notes
+
+# Blueprint for bulk export/import of a user's notes, mounted under /api/v1/notes
+transfer_bp = Blueprint('transfer', __name__)
+
+# Columns in export order; also the CSV header
+EXPORT_FIELDS = note_serializer.fields
+
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', 'notes.ndjson'),
+    'csv': ('text/csv', 'notes.csv'),
+    'json': ('application/json', 'notes.json'),
+}
+
+
+
+# Export helpers
+
+def render_chunks(records, fields, export_format, chunk_rows, root='notes'):
+    """
+    Yields records (dicts) as an NDJSON, CSV or JSON document in text chunks
+    of about chunk_rows records each. JSON documents wrap the list in {root: [...]}.
+    """
+    if export_format == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(fields)
+        for count, record in enumerate(records, 1):
+            writer.writerow([record[field] for field in fields])
+            if count % chunk_rows == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+        return
+
+    if export_format == 'json':
+        yield '{' + json.dumps(root) + ':['
+    lines = []
+    for count, record in enumerate(records):
+        line = json.dumps(record, sort_keys=True, separators=(',', ':'))
+        if export_format == 'ndjson':
+            lines.append(line + '\n')
+        else:
+            lines.append(',' + line if count else line)
+        if len(lines) >= chunk_rows:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+    if export_format == 'json':
+        yield ']}'
+
+
+def stream_rows(query, batch_size):
+    """
+    Yields the query's rows from a server-side cursor, batch_size at a time.
+    The rows are read through the session of the streaming context: the
+    view's own session is removed as soon as the view returns, and a query
+    still bound to it would keep its connection checked out after the stream.
+    """
+    yield from db.session.execute(query.statement.execution_options(yield_per=batch_size))
+
+
+def streaming_response(chunks, export_format, filename):
+    """
+    Wraps text chunks in a streaming download, compressed on the fly with
+    the best encoding the client accepts. The request context stays
+    available while streaming.
+    """
+    mimetype = EXPORT_FORMATS[export_format][0]
+    headers = {'Content-Disposition': f'attachment; filename={filename}', 'Vary': 'Accept-Encoding'}
+
+    body = (chunk.encode() for chunk in chunks)
+    encoding = compression.negotiate()
+    if encoding:
+        body = compression.stream(body, encoding)
+        headers['Content-Encoding'] = encoding
+
+    return Response(stream_with_context(body), mimetype=mimetype, headers=headers)
+
+
+
+# Export Notes
+
+@transfer_bp.route('/export', methods=['GET'])
+@jwt_required()
+def export_notes():
+    """
+    Stream the current user's notes as NDJSON (default), CSV or JSON.
+    Accepts the same filters as GET /api/v1/notes. Rows are read through a
+    server-side cursor in batches, so memory use does not grow with the
+    notebook. The stream is compressed per Accept-Encoding (gzip, br or zstd).
+    """
+    current_user_id = get_jwt_identity()
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': 'Invalid format. Use ndjson, csv or json.'}), 400
+
+    try:
+        query, _ = filtered_notes_query(current_user_id, request.args)
+    except ValueError as err:
+        return jsonify({'error': str(err)}), 400
+
+    batch_size = current_app.config['NOTES_EXPORT_BATCH_SIZE']
+    rows = stream_rows(
+        query.with_entities(*note_serializer.columns)
+        .order_by(Note.created_at.desc(), Note.id.desc()),
+        batch_size
+    )
+
+    records = (note_serializer.row(row) for row in rows)
+    chunks = render_chunks(records, EXPORT_FIELDS, export_format, batch_size)
+    return streaming_response(chunks, export_format, EXPORT_FORMATS[export_format][1])
+
+
+
+# Import helpers
+
+IMPORT_FORMATS = ('ndjson', 'csv')
+
+
+def _upload_lines():
+    """
+    Wraps the raw request body as a text stream without reading it all,
+    transparently gunzipping uploads sent with Content-Encoding: gzip.
+    """
+    stream = io.BufferedReader(request.stream)
+    if request.headers.get('Content-Encoding') == 'gzip':
+        stream = gzip.GzipFile(fileobj=stream)
+    return io.TextIOWrapper(stream, encoding='utf-8', newline='')
+
+
+def _import_records(text, import_format):
+    """Yields (line_number, record_or_error) pairs parsed incrementally from the upload."""
+    if import_format == 'csv':
+        reader = csv.DictReader(text)
+        for record in reader:
+            yield reader.line_num, record
+        return
+
+    for line_number, line in enumerate(text, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as err:
+            yield line_number, ValueError(f'Invalid JSON: {err.msg}')
+            continue
+        if not isinstance(record, dict):
+            yield line_number, ValueError('Each line must be a JSON object')
+            continue
+        yield line_number, record
+
+
+
+# Import Notes
+
+@transfer_bp.route('/import', methods=['POST'])
+@jwt_required()
+def import_notes():
+    """
+    Import notes from an NDJSON (default) or CSV upload for the current user.
+    The body is parsed incrementally; each record is validated with
+    NoteSchema (fields other than title/content, e.g. from an export, are
+    ignored) and valid records are bulk inserted in batches of
+    NOTES_IMPORT_BATCH_SIZE, one transaction per batch. Invalid records are
+    reported by line without aborting the import.
+    """
+    current_user_id = int(get_jwt_identity())
+    import_format = request.args.get('format')
+    if import_format is None:
+        import_format = 'csv' if request.mimetype == 'text/csv' else 'ndjson'
+    if import_format not in IMPORT_FORMATS:
+        return jsonify({'error': 'Invalid format. Use ndjson or csv.'}), 400
+
+    batch_size = current_app.config['NOTES_IMPORT_BATCH_SIZE']
+    max_errors = current_app.config['NOTES_IMPORT_MAX_ERRORS']
+    schema = NoteSchema(unknown=EXCLUDE)
+    batch, errors = [], []
+    imported = failed = 0
+
+    def flush():
+        # One multi-row INSERT and one commit per batch, sharing one change sequence number
+        change_seq = next_change_seq(current_user_id)
+        note_ids = db.session.scalars(
+            insert(Note).returning(Note.id, sort_by_parameter_order=True),
+            [{**record, 'change_seq': change_seq} for record in batch]
+        ).all()
+        index_notes([(note_id, record['title'], record['content']) for note_id, record in zip(note_ids, batch)])
+        db.session.commit()
+        response_cache.invalidate_user(current_user_id)
+
+    try:
+        for line_number, record in _import_records(_upload_lines(), import_format):
+            try:
+                if isinstance(record, ValueError):
+                    raise ValidationError(str(record))
+                data = schema.load(record)
+            except ValidationError as err:
+                failed += 1
+                if len(errors) < max_errors:
+                    errors.append({'line': line_number, 'messages': err.messages})
+                continue
+
+            batch.append({'title': data['title'], 'content': data['content'], 'user_id': current_user_id})
+            if len(batch) >= batch_size:
+                flush()
+                imported += len(batch)
+                batch = []
+
+        if batch:
+            flush()
+            imported += len(batch)
+
+    except (UnicodeDecodeError, csv.Error, OSError, EOFError, zlib.error) as e:
+        # Undecodable, truncated or corrupt (gzip) upload; batches already committed are kept
+        db.session.rollback()
+        return jsonify({
+            'error': 'Malformed upload',
+            'message': str(e),
+            'imported': imported
+        }), 400
+
+    return jsonify({
+        'message': 'Import finished',
+        'imported': imported,
+        'failed': failed,
+        'errors': errors,
+        'errors_truncated': failed > len(errors)
+    }), 200